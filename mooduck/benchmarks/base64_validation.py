@@ -0,0 +1,78 @@
+import asyncio
+import base64
+from time import perf_counter
+from typing import Annotated
+
+import httpx
+from fastapi import Query
+from pydantic import TypeAdapter
+
+from main import app
+from storage.validators import Base64Image
+
+
+LEGACY_PATTERN = r'^data:image/(png|jpeg|jpg);base64,.+$'
+SIZES = (1, 10, 50)
+ROUNDS = 5
+
+legacy = TypeAdapter(Annotated[str, Query(pattern=LEGACY_PATTERN)])
+incremental = TypeAdapter(Base64Image)
+
+
+def get_payload(megabytes: int, valid: bool = True) -> str:
+    data = b'\xff\xd8\xff' if valid else b'GIF89a'
+    data += b'\0' * (megabytes * 1024 * 1024 - len(data))
+    return 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+
+
+def measure(name: str, validate, payload: str) -> None:
+    start = perf_counter()
+    for _ in range(ROUNDS):
+        try:
+            validate(payload)
+        except ValueError:
+            pass
+    elapsed = (perf_counter() - start) / ROUNDS * 1000
+    print(f'{name}: {elapsed:.3f} ms')
+
+
+async def measure_request(megabytes: int) -> None:
+    body = b'{"name": "moodboard", "cover": "%s"}' % get_payload(
+        megabytes
+    ).encode()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url='http://bench'
+    ) as client:
+        start = perf_counter()
+        response = await client.post(
+            '/user',
+            content=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        elapsed = (perf_counter() - start) * 1000
+    print(
+        f'{megabytes} MB body on a capped route: '
+        f'{response.status_code} in {elapsed:.3f} ms'
+    )
+
+
+def main():
+    for megabytes in SIZES:
+        valid = get_payload(megabytes)
+        invalid = get_payload(megabytes, valid=False)
+        print(f'--- {megabytes} MB')
+        measure('regex, valid', legacy.validate_python, valid)
+        measure('incremental, valid', incremental.validate_python, valid)
+        measure('regex, wrong type', legacy.validate_python, invalid)
+        measure(
+            'incremental, wrong type',
+            incremental.validate_python,
+            invalid
+        )
+        asyncio.run(measure_request(megabytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import tracemalloc
+from time import perf_counter
+
+from tortoise import Tortoise, run_async
+
+from items.models import Item, ItemMedia
+from items.services import get_all_items
+from items.utils import (
+    get_item_response,
+    get_item_record_response,
+    fill_items_media,
+    ItemRecord
+)
+from extra.services import paginate_queryset
+from users.models import User
+
+
+PAGE_SIZE = 100
+ROUNDS = 50
+
+
+async def hydrate_models() -> list:
+    items = await paginate_queryset(
+        get_all_items().prefetch_related('item_media__media'), PAGE_SIZE
+    )
+    return [get_item_response(item) for item in items]
+
+
+async def project_records() -> list:
+    records = await paginate_queryset(
+        get_all_items(), PAGE_SIZE, record=ItemRecord
+    )
+    return await fill_items_media(
+        [get_item_record_response(record) for record in records]
+    )
+
+
+async def measure(name: str, load_page) -> None:
+    await load_page()
+    start = perf_counter()
+    for _ in range(ROUNDS):
+        await load_page()
+    elapsed = (perf_counter() - start) / ROUNDS * 1000
+
+    tracemalloc.start()
+    await load_page()
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    print(
+        f'{name}: {elapsed:.2f} ms/page, '
+        f'peak {peak / 1024:.0f} KiB, {blocks} live blocks'
+    )
+
+
+async def main():
+    await Tortoise.init(
+        db_url='sqlite://:memory:',
+        modules={
+            'models': [
+                'users.models',
+                'moodboards.models',
+                'items.models',
+                'reactions.models'
+            ]
+        }
+    )
+    await Tortoise.generate_schemas()
+    author = await User.create(
+        username='bench',
+        password='bench',
+        email='bench@bench.com'
+    )
+    await Item.bulk_create([
+        Item(
+            author=author,
+            name=f'item {index}',
+            description='description ' * 10,
+            item_type='anime',
+            link='https://example.com'
+        ) for index in range(PAGE_SIZE)
+    ])
+    await ItemMedia.bulk_create([
+        ItemMedia(
+            item_id=item_id,
+            position=position,
+            url=f'https://example.com/{position}.png'
+        )
+        for item_id in await Item.all().values_list('id', flat=True)
+        for position in range(2)
+    ])
+
+    await measure('models + model_validate', hydrate_models)
+    await measure('values_list + records', project_records)
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    run_async(main())
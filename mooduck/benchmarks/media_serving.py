@@ -0,0 +1,81 @@
+import asyncio
+import os
+from hashlib import sha256
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI
+from starlette.staticfiles import StaticFiles
+
+from config import MEDIA_ROOT
+from storage.routers import router as storage_router
+
+
+FILE_SIZE = 1024 * 1024
+ROUNDS = 200
+
+
+async def measure(
+    name: str,
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict[str, str] | None = None
+) -> None:
+    await client.get(url, headers=headers)
+    received = 0
+    start = perf_counter()
+    for _ in range(ROUNDS):
+        response = await client.get(url, headers=headers)
+        received += len(response.content)
+    elapsed = perf_counter() - start
+    print(
+        f'{name}: {ROUNDS / elapsed:.0f} req/s, '
+        f'{received / elapsed / 1024 / 1024:.0f} MiB/s '
+        f'(status {response.status_code})'
+    )
+
+
+async def main():
+    data = os.urandom(FILE_SIZE)
+    hash = sha256(data).hexdigest()
+    filename = f'{hash}.jpeg'
+    path = MEDIA_ROOT / filename
+    path.write_bytes(data)
+
+    app = FastAPI()
+    app.include_router(storage_router)
+    app.mount('/static', StaticFiles(directory=MEDIA_ROOT))
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url='http://bench'
+        ) as client:
+            await measure('static full', client, f'/static/{filename}')
+            await measure('media full', client, f'/media/{filename}')
+            await measure(
+                'static revalidate',
+                client,
+                f'/static/{filename}',
+                {'If-None-Match': (
+                    await client.get(f'/static/{filename}')
+                ).headers['etag']}
+            )
+            await measure(
+                'media revalidate',
+                client,
+                f'/media/{filename}',
+                {'If-None-Match': f'"{hash}"'}
+            )
+            await measure(
+                'media range 64 KiB',
+                client,
+                f'/media/{filename}',
+                {'Range': f'bytes={FILE_SIZE // 2}-{FILE_SIZE // 2 + 65535}'}
+            )
+    finally:
+        path.unlink()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+from time import perf_counter
+import sys
+
+from tortoise import Tortoise, run_async
+from tortoise.contrib.postgres.functions import Random
+
+from config import RANDOM_POOL_BATCH_SIZE
+from items.models import Item, ITEM_TYPES
+from extra.sampling import RandomPool
+
+
+SIZES = [
+    int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else (
+        '1000000,10000000'
+    )).split(',')
+]
+ROUNDS = 20
+TYPES = list(ITEM_TYPES)
+
+
+async def fill(size: int) -> None:
+    connection = Tortoise.get_connection('default')
+    await connection.execute_query('DELETE FROM "item"')
+    await connection.execute_query(
+        'INSERT OR IGNORE INTO "user" '
+        '("id", "username", "email", "password", "role") '
+        "VALUES (1, 'bench', 'bench@bench.com', 'bench', 'user')"
+    )
+    for start in range(0, size, RANDOM_POOL_BATCH_SIZE):
+        await connection.execute_many(
+            'INSERT INTO "item" ("id", "author_id", "name", "item_type", '
+            '"is_private", "created_at") '
+            "VALUES (?, 1, 'item', ?, ?, CURRENT_TIMESTAMP)",
+            [
+                [id, TYPES[id % len(TYPES)], id % 10 == 0]
+                for id in range(
+                    start + 1,
+                    min(start + RANDOM_POOL_BATCH_SIZE, size) + 1
+                )
+            ]
+        )
+
+
+async def order_by_random(item_type: str | None) -> Item:
+    queryset = Item.filter(is_private=False)
+    if item_type:
+        queryset = queryset.filter(item_type=item_type)
+    return await queryset.annotate(
+        order=Random()
+    ).order_by('order').first()
+
+
+async def measure(name: str, get_item) -> None:
+    for item_type in (None, 'anime'):
+        start = perf_counter()
+        for _ in range(ROUNDS):
+            assert await get_item(item_type)
+        elapsed = (perf_counter() - start) / ROUNDS * 1000
+        print(f'  {name} [{item_type or "any"}]: {elapsed:.2f} ms/call')
+
+
+async def main():
+    await Tortoise.init(
+        db_url='sqlite://:memory:',
+        modules={
+            'models': [
+                'users.models',
+                'moodboards.models',
+                'items.models',
+                'reactions.models',
+                'storage.models'
+            ]
+        }
+    )
+    await Tortoise.generate_schemas()
+    for size in SIZES:
+        await fill(size)
+        print(f'{size} items:')
+        pool = RandomPool(Item, 'item_type')
+        start = perf_counter()
+        await pool.refresh()
+        print(f'  pool load: {perf_counter() - start:.2f} s')
+        await measure('ORDER BY random()', order_by_random)
+        await measure('id pool', lambda item_type: pool.get(
+            lambda id: Item.filter(is_private=False).get_or_none(id=id),
+            item_type
+        ))
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    run_async(main())
@@ -0,0 +1,80 @@
+from time import perf_counter
+
+from tortoise import Tortoise, run_async
+
+from config import (
+    TEST_POSTGRES_USER,
+    TEST_POSTGRES_PASSWORD,
+    TEST_POSTGRES_HOST,
+    TEST_POSTGRES_PORT,
+    TEST_POSTGRES_DB,
+)
+from users.services import get_all_users
+from users.utils import UserRecord
+from extra.search import get_search_record
+
+
+USERS = 1_000_000
+PAGE_SIZE = 30
+ROUNDS = 20
+SEARCHES = ['user_512345', 'usr_51234', 'User 77777', 'user_9']
+
+
+async def seed() -> None:
+    connection = Tortoise.get_connection('default')
+    await connection.execute_script(f'''
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        TRUNCATE "user" CASCADE;
+        INSERT INTO "user" ("username", "password", "email", "name", "role")
+            SELECT 'user_' || id, 'bench', 'user_' || id || '@bench.com',
+                'User ' || id, 'user'
+            FROM generate_series(1, {USERS}) AS id;
+        CREATE INDEX IF NOT EXISTS "idx_user_usernam_9987ab"
+            ON "user" USING GIN ("username" gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS "idx_user_name_76f409"
+            ON "user" USING GIN ("name" gin_trgm_ops);
+        ANALYZE "user";
+    ''')
+
+
+async def measure(name: str, fuzzy: bool) -> None:
+    for search in SEARCHES:
+        queryset = get_all_users(search, fuzzy)
+        record = get_search_record(queryset, UserRecord)
+        start = perf_counter()
+        for _ in range(ROUNDS):
+            rows = await queryset.limit(PAGE_SIZE).values_list(
+                *record._fields
+            )
+        elapsed = (perf_counter() - start) / ROUNDS * 1000
+        print(
+            f'{name} {search!r}: {elapsed:.2f} ms/page, '
+            f'first {rows[0][1] if rows else None!r}'
+        )
+
+
+async def main():
+    await Tortoise.init(
+        db_url=(
+            f'postgres://{TEST_POSTGRES_USER}:{TEST_POSTGRES_PASSWORD}'
+            f'@{TEST_POSTGRES_HOST}:{TEST_POSTGRES_PORT}/{TEST_POSTGRES_DB}'
+        ),
+        modules={
+            'models': [
+                'users.models',
+                'moodboards.models',
+                'items.models',
+                'reactions.models',
+                'storage.models'
+            ]
+        }
+    )
+    await Tortoise.generate_schemas(safe=True)
+    await seed()
+    await measure('icontains', False)
+    await measure('trigram', True)
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    run_async(main())
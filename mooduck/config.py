@@ -27,7 +27,6 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # REGEX_PATTERNS
 SLUG_PATTERN: str = r'^[-_a-z0-9]*$'
 EMAIL_PATTERN: str = r'[^@ \t\r\n]+@[^@ \t\r\n]+\.[^@ \t\r\n]+'
-BASE64_PATTERN: str = r'^data:image/(png|jpeg|jpg);base64,.+$'
 HEX_PATTERN: str = r'^#[a-z0-9]{6}$'
 PHONE_NUMBER: str = r'^((8|\+7)[\- ]?)?(\(?\d{3}\)?[\- ]?)?[\d\- ]{7,10}$'
 ROLE_CHOICES_PATTERN: str = r'^(admin|moder|user)$'
@@ -37,10 +36,126 @@ ACCESS_TOKEN_EXPIRE_DAYS = 7
 ALGORITHM = "HS256"
 TOKEN_TYPE: str = 'Bearer'
 
+# PASSWORDS
+PASSWORD_HASH_ROUNDS: int = int(os.getenv('PASSWORD_HASH_ROUNDS', 12))
+PASSWORD_HASH_EXECUTOR: str = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS: int = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING: int = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+
+# AUTH CACHE
+AUTH_CACHE_SIZE: int = int(os.getenv('AUTH_CACHE_SIZE', 10000))
+# kept short since QuerySet.update() skips the invalidation signals
+AUTH_CACHE_TTL: int = int(os.getenv('AUTH_CACHE_TTL', 30))
+
+# SQL
+SQL_MAX_PARAMETERS: int = 32000
+
+# ITEM BATCH
+ITEM_BATCH_MAX_OPERATIONS: int = int(
+    os.getenv('ITEM_BATCH_MAX_OPERATIONS', 100)
+)
+ITEM_BATCH_MAX_ITEMS: int = int(os.getenv('ITEM_BATCH_MAX_ITEMS', 1000))
+
+# LINKS
+LINK_TRACKING_PARAMS: tuple[str, ...] = (
+    'utm_', 'fbclid', 'gclid', 'yclid', 'mc_cid', 'mc_eid', 'igshid'
+)
+
+# SEARCH
+SEARCH_CONFIG: str = 'mooduck_search'
+SEARCH_HEADLINE_OPTIONS: str = 'MaxFragments=2, MaxWords=20, MinWords=5'
+# must not be lower than pg_trgm.similarity_threshold (0.3 by default)
+USER_SEARCH_MIN_SIMILARITY: float = float(
+    os.getenv('USER_SEARCH_MIN_SIMILARITY', 0.3)
+)
+
+# RANDOM SAMPLING
+RANDOM_POOL_REFRESH: int = int(os.getenv('RANDOM_POOL_REFRESH', 5))
+RANDOM_POOL_RELOAD: int = int(os.getenv('RANDOM_POOL_RELOAD', 600))
+RANDOM_POOL_BATCH_SIZE: int = int(os.getenv('RANDOM_POOL_BATCH_SIZE', 50000))
+RANDOM_POOL_ATTEMPTS: int = 5
+
+# LIKES
+LIKE_WRITE_BEHIND: bool = (
+    os.getenv('LIKE_WRITE_BEHIND', 'false').lower() == 'true'
+)
+LIKE_FLUSH_INTERVAL: float = float(os.getenv('LIKE_FLUSH_INTERVAL', 1))
+# seconds without likes or removals before a board's count is reconciled,
+# longer than a flush and at most TRENDING_SETTLE_MARGIN, since removals
+# are only kept that long
+LIKE_RECONCILE_QUIET: int = int(os.getenv('LIKE_RECONCILE_QUIET', 30))
+
+# TRENDING
+TRENDING_JOB: bool = os.getenv('TRENDING_JOB', 'true').lower() == 'true'
+TRENDING_REFRESH: int = int(os.getenv('TRENDING_REFRESH', 60))
+# reactions are counted once their created_at is older than this, so
+# transactions committing up to this late are not missed
+TRENDING_SETTLE_MARGIN: int = int(os.getenv('TRENDING_SETTLE_MARGIN', 60))
+# seconds after which an interaction counts half as much
+TRENDING_HALF_LIFE: int = int(os.getenv('TRENDING_HALF_LIFE', 24 * 60 * 60))
+# half-lives before scores are rescaled towards a new landmark
+TRENDING_RESCALE_AFTER: int = 32
+TRENDING_MIN_SCORE: float = 0.01
+TRENDING_LIKE_WEIGHT: float = 1
+TRENDING_COMMENT_WEIGHT: float = 2
+TRENDING_FAVORITE_WEIGHT: float = 3
+
+# PAGINATION
+COUNT_CAP: int = int(os.getenv('COUNT_CAP', 1000))
+COUNT_CACHE_SIZE: int = int(os.getenv('COUNT_CACHE_SIZE', 1024))
+COUNT_CACHE_TTL: int = int(os.getenv('COUNT_CACHE_TTL', 15))
+MOODBOARD_ITEMS_WINDOW: int = int(os.getenv('MOODBOARD_ITEMS_WINDOW', 30))
+FACET_CACHE_TTL: int = int(os.getenv('FACET_CACHE_TTL', 300))
+
 # DIRS
 BASE_DIR: Path = Path(__file__).resolve().parent
 MEDIA_URL: str = 'media'
 MEDIA_ROOT: Path = BASE_DIR / MEDIA_URL
 
+# MEDIA
+MEDIA_CHUNK_SIZE: int = 64 * 1024
+MEDIA_MAX_SIZE: int = int(os.getenv('MEDIA_MAX_SIZE', 20 * 1024 * 1024))
+MEDIA_MAX_PER_REQUEST: int = int(os.getenv('MEDIA_MAX_PER_REQUEST', 50))
+MEDIA_MAX_REQUEST_SIZE: int = int(
+    os.getenv('MEDIA_MAX_REQUEST_SIZE', 100 * 1024 * 1024)
+)
+MEDIA_WORKERS: int = int(os.getenv('MEDIA_WORKERS', 4))
+MEDIA_REQUEST_CONCURRENCY: int = int(os.getenv('MEDIA_REQUEST_CONCURRENCY', 4))
+MEDIA_GC_GRACE_HOURS: int = int(os.getenv('MEDIA_GC_GRACE_HOURS', 24))
+MEDIA_GC_BATCH_SIZE: int = int(os.getenv('MEDIA_GC_BATCH_SIZE', 500))
+MEDIA_DERIVATIVE_WIDTHS: tuple[int, ...] = tuple(
+    int(width) for width in os.getenv(
+        'MEDIA_DERIVATIVE_WIDTHS', '320,640,1280'
+    ).split(',')
+)
+MEDIA_DERIVATIVE_FORMAT: str = 'webp'
+MEDIA_DERIVATIVE_QUALITY: int = int(os.getenv('MEDIA_DERIVATIVE_QUALITY', 80))
+MEDIA_CACHE_CONTROL: str = 'public, max-age=31536000, immutable'
+MEDIA_BASE64_HEADER_LENGTH: int = 16
+
+# REQUEST LIMITS
+REQUEST_MAX_SIZE: int = int(os.getenv('REQUEST_MAX_SIZE', 1024 * 1024))
+MEDIA_REQUEST_BODY_SIZE: int = (
+    MEDIA_MAX_REQUEST_SIZE * 4 // 3 + REQUEST_MAX_SIZE
+)
+MEDIA_UPLOAD_BODY_SIZE: int = MEDIA_MAX_SIZE + REQUEST_MAX_SIZE
+
+# MEDIA STORAGE
+MEDIA_STORAGE: str = os.getenv('MEDIA_STORAGE', 'local')
+MEDIA_S3_ENDPOINT: str | None = os.getenv('MEDIA_S3_ENDPOINT')
+MEDIA_S3_BUCKET: str | None = os.getenv('MEDIA_S3_BUCKET')
+MEDIA_S3_ACCESS_KEY: str | None = os.getenv('MEDIA_S3_ACCESS_KEY')
+MEDIA_S3_SECRET_KEY: str | None = os.getenv('MEDIA_S3_SECRET_KEY')
+MEDIA_S3_REGION: str = os.getenv('MEDIA_S3_REGION', 'us-east-1')
+MEDIA_S3_PART_SIZE: int = int(
+    os.getenv('MEDIA_S3_PART_SIZE', 8 * 1024 * 1024)
+)
+MEDIA_S3_CONCURRENCY: int = int(os.getenv('MEDIA_S3_CONCURRENCY', 4))
+MEDIA_S3_CONNECTIONS: int = int(os.getenv('MEDIA_S3_CONNECTIONS', 32))
+
 # URL
 BASE_URL: str = 'http://127.0.0.1:8000'
+MEDIA_BASE_URL: str = os.getenv('MEDIA_BASE_URL') or (
+    f'{MEDIA_S3_ENDPOINT}/{MEDIA_S3_BUCKET}'
+    if MEDIA_STORAGE == 's3' else f'{BASE_URL}/{MEDIA_URL}'
+)
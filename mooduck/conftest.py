@@ -1,10 +1,16 @@
 import pytest
 from tortoise import Tortoise
 
+from extra.cache import principal_cache, count_cache, facet_cache
+from items.services import item_pool
+from moodboards.services import moodboard_pool
+from reactions.services import like_buffer
+
 from tests.conftest_utils.users_conf import *
 from tests.conftest_utils.moodboards_conf import *
 from tests.conftest_utils.items_conf import *
 from tests.conftest_utils.reactions_conf import *
+from tests.conftest_utils.storage_conf import *
 
 
 # SETUP
@@ -21,7 +27,8 @@ async def init_db(
                 'users.models',
                 'moodboards.models',
                 'items.models',
-                'reactions.models'
+                'reactions.models',
+                'storage.models'
             ]
         },
         _create_db=create_db
@@ -40,6 +47,12 @@ async def initialize_tests():
     await init()
     yield
     await Tortoise._drop_databases()
+    principal_cache.clear()
+    count_cache.clear()
+    facet_cache.clear()
+    item_pool.clear()
+    moodboard_pool.clear()
+    like_buffer.clear()
 
 
 @pytest.fixture()
@@ -14,7 +14,7 @@ TORTOISE_ORM = {
     },
     'apps': {
         'models': {
-            'models': ['users.models', 'moodboards.models', 'reactions.models', 'aerich.models', 'items.models'],
+            'models': ['users.models', 'moodboards.models', 'reactions.models', 'aerich.models', 'items.models', 'storage.models'],
             'default_connection': 'default',
         },
     },
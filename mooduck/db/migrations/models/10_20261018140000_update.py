@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX "idx_user_usernam_9987ab" ON "user" USING GIN ("username" gin_trgm_ops);
+        CREATE INDEX "idx_user_name_76f409" ON "user" USING GIN ("name" gin_trgm_ops);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_user_name_76f409";
+        DROP INDEX "idx_user_usernam_9987ab";"""
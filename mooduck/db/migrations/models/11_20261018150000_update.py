@@ -0,0 +1,19 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "canonicallink" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "url" VARCHAR(1024) NOT NULL UNIQUE,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+        ALTER TABLE "item" ADD "canonical_id" BIGINT REFERENCES "canonicallink" ("id") ON DELETE SET NULL;
+        CREATE INDEX "idx_item_canonic_e8c2f5" ON "item" ("canonical_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_item_canonic_e8c2f5";
+        ALTER TABLE "item" DROP COLUMN "canonical_id";
+        DROP TABLE IF EXISTS "canonicallink";"""
@@ -0,0 +1,20 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "like" AS "duplicate"
+            USING "like" AS "original"
+            WHERE "duplicate"."author_id" = "original"."author_id"
+                AND "duplicate"."moodboard_id" = "original"."moodboard_id"
+                AND "duplicate"."id" > "original"."id";
+        CREATE UNIQUE INDEX "uid_like_author__23f6d0" ON "like" ("author_id", "moodboard_id");
+        UPDATE "moodboard" SET "likes" = (
+            SELECT COUNT(*) FROM "like"
+                WHERE "like"."moodboard_id" = "moodboard"."id"
+        );"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "uid_like_author__23f6d0";"""
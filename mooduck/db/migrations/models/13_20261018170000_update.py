@@ -0,0 +1,25 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "moodboardscore" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "score" DOUBLE PRECISION NOT NULL  DEFAULT 0,
+    "moodboard_id" BIGINT NOT NULL UNIQUE REFERENCES "moodboard" ("id") ON DELETE CASCADE
+);
+        CREATE INDEX "idx_moodboardsc_score_372354" ON "moodboardscore" ("score");
+        CREATE TABLE IF NOT EXISTS "trendingstate" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "landmark" TIMESTAMPTZ NOT NULL,
+    "last_like_id" BIGINT NOT NULL  DEFAULT 0,
+    "last_comment_id" BIGINT NOT NULL  DEFAULT 0,
+    "last_favorite_id" BIGINT NOT NULL  DEFAULT 0
+);
+        INSERT INTO "trendingstate" ("id", "landmark") VALUES (1, CURRENT_TIMESTAMP);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "trendingstate";
+        DROP TABLE IF EXISTS "moodboardscore";"""
@@ -0,0 +1,42 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "like" ADD "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        CREATE INDEX "idx_like_created_e38107" ON "like" ("created_at");
+        ALTER TABLE "favmoodboard" ADD "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        CREATE INDEX "idx_favmoodboar_created_7e0b6c" ON "favmoodboard" ("created_at");
+        CREATE INDEX "idx_comment_created_061f12" ON "comment" ("created_at");
+        CREATE TABLE IF NOT EXISTS "reactionremoval" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "weight" DOUBLE PRECISION NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL,
+    "removed_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "moodboard_id" BIGINT NOT NULL REFERENCES "moodboard" ("id") ON DELETE CASCADE
+);
+        CREATE INDEX "idx_reactionrem_created_1f8315" ON "reactionremoval" ("created_at");
+        CREATE INDEX "idx_reactionrem_removed_a9c169" ON "reactionremoval" ("removed_at");
+        ALTER TABLE "trendingstate" DROP COLUMN "last_like_id";
+        ALTER TABLE "trendingstate" DROP COLUMN "last_comment_id";
+        ALTER TABLE "trendingstate" DROP COLUMN "last_favorite_id";
+        ALTER TABLE "trendingstate" ADD "watermark" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE "trendingstate" ALTER COLUMN "watermark" DROP DEFAULT;
+        DELETE FROM "moodboardscore";
+        UPDATE "trendingstate" SET
+            "landmark" = CURRENT_TIMESTAMP,
+            "watermark" = CURRENT_TIMESTAMP - INTERVAL '32 days';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "trendingstate" DROP COLUMN "watermark";
+        ALTER TABLE "trendingstate" ADD "last_like_id" BIGINT NOT NULL  DEFAULT 0;
+        ALTER TABLE "trendingstate" ADD "last_comment_id" BIGINT NOT NULL  DEFAULT 0;
+        ALTER TABLE "trendingstate" ADD "last_favorite_id" BIGINT NOT NULL  DEFAULT 0;
+        DROP TABLE IF EXISTS "reactionremoval";
+        DROP INDEX "idx_comment_created_061f12";
+        DROP INDEX "idx_favmoodboar_created_7e0b6c";
+        ALTER TABLE "favmoodboard" DROP COLUMN "created_at";
+        DROP INDEX "idx_like_created_e38107";
+        ALTER TABLE "like" DROP COLUMN "created_at";"""
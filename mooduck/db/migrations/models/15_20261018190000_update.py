@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_moodboardsc_score_372354";
+        CREATE INDEX "idx_moodboardsc_score_f0b7f5" ON "moodboardscore" ("score" DESC, "moodboard_id" DESC);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_moodboardsc_score_f0b7f5";
+        CREATE INDEX "idx_moodboardsc_score_372354" ON "moodboardscore" ("score");"""
@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "itemmedia" ADD "media_id" BIGINT REFERENCES "media" ("id") ON DELETE RESTRICT;
+        ALTER TABLE "itemmedia" ALTER COLUMN "url" DROP NOT NULL;
+        UPDATE "itemmedia" SET "media_id" = "media"."id", "url" = NULL FROM "media" WHERE "media"."hash" = "itemmedia"."hash";
+        CREATE INDEX "idx_itemmedia_media_i_8a5ef8" ON "itemmedia" ("media_id");
+        ALTER TABLE "moodboard" ADD "cover_media_id" BIGINT REFERENCES "media" ("id") ON DELETE RESTRICT;
+        UPDATE "moodboard" SET "cover_media_id" = "media"."id", "cover" = NULL FROM "media" WHERE "media"."hash" = substring("moodboard"."cover" FROM '([0-9a-f]{64})\\.[a-z0-9]+$');
+        CREATE INDEX "idx_moodboard_cover_m_a5b563" ON "moodboard" ("cover_media_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_moodboard_cover_m_a5b563";
+        UPDATE "moodboard" SET "cover" = '/media/' || "media"."hash" || '.' || "media"."ext" FROM "media" WHERE "media"."id" = "moodboard"."cover_media_id";
+        ALTER TABLE "moodboard" DROP COLUMN "cover_media_id";
+        DROP INDEX "idx_itemmedia_media_i_8a5ef8";
+        UPDATE "itemmedia" SET "url" = '/media/' || "media"."hash" || '.' || "media"."ext" FROM "media" WHERE "media"."id" = "itemmedia"."media_id";
+        DELETE FROM "itemmedia" WHERE "url" IS NULL;
+        ALTER TABLE "itemmedia" ALTER COLUMN "url" SET NOT NULL;
+        ALTER TABLE "itemmedia" DROP COLUMN "media_id";"""
@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "media" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "hash" VARCHAR(64) NOT NULL UNIQUE,
+    "ext" VARCHAR(8) NOT NULL,
+    "size" BIGINT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "author_id" BIGINT REFERENCES "user" ("id") ON DELETE SET NULL
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "media";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "media" ADD "ref_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "media" ADD "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP;
+        CREATE INDEX "idx_media_ref_cou_11fe77" ON "media" ("ref_count", "updated_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_media_ref_cou_11fe77";
+        ALTER TABLE "media" DROP COLUMN "ref_count";
+        ALTER TABLE "media" DROP COLUMN "updated_at";"""
@@ -0,0 +1,56 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "media" ADD "width" INT;
+        ALTER TABLE "media" ADD "height" INT;
+        CREATE TABLE IF NOT EXISTS "itemmedia" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "position" SMALLINT NOT NULL,
+    "url" VARCHAR(1024) NOT NULL,
+    "hash" VARCHAR(64),
+    "mime_type" VARCHAR(64),
+    "size" BIGINT,
+    "width" INT,
+    "height" INT,
+    "item_id" BIGINT NOT NULL REFERENCES "item" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_itemmedia_item_id_56ca8a" UNIQUE ("item_id", "position")
+);
+        CREATE INDEX "idx_itemmedia_hash_c8ee53" ON "itemmedia" ("hash");
+        INSERT INTO "itemmedia" (
+            "item_id", "position", "url", "hash", "mime_type", "size"
+        )
+        SELECT
+            "item"."id",
+            "entry"."position" - 1,
+            "entry"."url",
+            "media"."hash",
+            CASE WHEN "media"."ext" = 'jpg' THEN 'image/jpeg'
+                ELSE 'image/' || "media"."ext" END,
+            "media"."size"
+        FROM "item"
+        CROSS JOIN LATERAL unnest(
+            regexp_split_to_array(btrim("item"."media"), '\\s+')
+        ) WITH ORDINALITY AS "entry" ("url", "position")
+        LEFT JOIN "media" ON "media"."hash" = substring(
+            "entry"."url" FROM '([0-9a-f]{64})\\.[a-z0-9]+$'
+        )
+        WHERE "entry"."url" <> '';
+        ALTER TABLE "item" DROP COLUMN "media";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "item" ADD "media" TEXT;
+        UPDATE "item" SET "media" = "entry"."media"
+        FROM (
+            SELECT "item_id", string_agg("url", ' ' ORDER BY "position")
+                AS "media"
+            FROM "itemmedia"
+            GROUP BY "item_id"
+        ) AS "entry"
+        WHERE "item"."id" = "entry"."item_id";
+        DROP TABLE IF EXISTS "itemmedia";
+        ALTER TABLE "media" DROP COLUMN "height";
+        ALTER TABLE "media" DROP COLUMN "width";"""
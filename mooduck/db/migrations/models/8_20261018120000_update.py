@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "itemmoodboard" AS "duplicate"
+            USING "itemmoodboard" AS "original"
+            WHERE "duplicate"."item_id" = "original"."item_id"
+                AND "duplicate"."moodboard_id" = "original"."moodboard_id"
+                AND "duplicate"."id" > "original"."id";
+        CREATE UNIQUE INDEX "uid_itemmoodboa_item_id_e19442" ON "itemmoodboard" ("item_id", "moodboard_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "uid_itemmoodboa_item_id_e19442";"""
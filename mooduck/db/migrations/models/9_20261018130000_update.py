@@ -0,0 +1,28 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TEXT SEARCH CONFIGURATION "mooduck_search" (COPY = russian);
+        ALTER TEXT SEARCH CONFIGURATION "mooduck_search"
+            ALTER MAPPING FOR asciiword, asciihword, hword_asciipart
+            WITH english_stem;
+        ALTER TABLE "item" ADD "search_vector" TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('mooduck_search'::regconfig, coalesce("name", '')), 'A')
+            || setweight(to_tsvector('mooduck_search'::regconfig, coalesce("description", '')), 'B')
+        ) STORED;
+        CREATE INDEX "idx_item_search__8575ab" ON "item" USING GIN ("search_vector");
+        ALTER TABLE "moodboard" ADD "search_vector" TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('mooduck_search'::regconfig, coalesce("name", '')), 'A')
+            || setweight(to_tsvector('mooduck_search'::regconfig, coalesce("description", '')), 'B')
+        ) STORED;
+        CREATE INDEX "idx_moodboard_search__c9baa8" ON "moodboard" USING GIN ("search_vector");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_moodboard_search__c9baa8";
+        ALTER TABLE "moodboard" DROP COLUMN "search_vector";
+        DROP INDEX "idx_item_search__8575ab";
+        ALTER TABLE "item" DROP COLUMN "search_vector";
+        DROP TEXT SEARCH CONFIGURATION "mooduck_search";"""
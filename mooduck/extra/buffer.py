@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from tortoise.expressions import F
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from config import SQL_MAX_PARAMETERS
+from extra.tasks import PeriodicTask
+
+
+class DeltaBuffer:
+    """Counter deltas merged in memory and written behind in batches."""
+
+    def __init__(
+        self,
+        model: type[Model],
+        field: str,
+        interval: float = 1
+    ) -> None:
+        self.model = model
+        self.field = field
+        self.task = PeriodicTask(self.flush, interval)
+        self.clear()
+
+    def add(self, pk: int, delta: int = 1) -> None:
+        self.deltas[pk] += delta
+
+    def get(self, pk: int) -> int:
+        return self.deltas.get(pk, 0)
+
+    def clear(self) -> None:
+        self.deltas: defaultdict[int, int] = defaultdict(int)
+
+    async def flush(self) -> int:
+        deltas, self.deltas = self.deltas, defaultdict(int)
+        groups = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                groups[delta].append(pk)
+        try:
+            async with in_transaction() as connection:
+                for delta, pks in groups.items():
+                    for start in range(0, len(pks), SQL_MAX_PARAMETERS):
+                        await self.model.filter(
+                            pk__in=pks[start:start + SQL_MAX_PARAMETERS]
+                        ).using_db(connection).update(
+                            **{self.field: F(self.field) + delta}
+                        )
+        except Exception:
+            for pk, delta in deltas.items():
+                self.deltas[pk] += delta
+            raise
+        return sum(len(pks) for pks in groups.values())
+
+    async def start(self) -> None:
+        await self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+        await self.flush()
@@ -0,0 +1,88 @@
+from collections import Counter, OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable
+
+from config import (
+    AUTH_CACHE_SIZE,
+    AUTH_CACHE_TTL,
+    COUNT_CACHE_SIZE,
+    COUNT_CACHE_TTL,
+    FACET_CACHE_TTL,
+)
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after their own TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def invalidate(self, predicate: Callable[[Any], bool]) -> int:
+        keys = [
+            key for key, (_, value) in self._data.items() if predicate(value)
+        ]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class CounterCache:
+    """Counts loaded on demand and adjusted in place until they expire."""
+
+    def __init__(self, ttl: float = 60) -> None:
+        self.ttl = ttl
+        self.clear()
+
+    async def get(
+        self,
+        load: Callable[[], Awaitable[dict[Hashable, int]]]
+    ) -> dict[Hashable, int]:
+        if self._counts is None or self._expires_at <= monotonic():
+            self._counts = Counter(await load())
+            self._expires_at = monotonic() + self.ttl
+        return dict(self._counts)
+
+    def add(self, key: Hashable, delta: int = 1) -> None:
+        if self._counts is not None:
+            self._counts[key] += delta
+
+    def clear(self) -> None:
+        self._counts: Counter | None = None
+        self._expires_at = 0.0
+
+
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+count_cache = TTLCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+facet_cache = CounterCache(ttl=FACET_CACHE_TTL)
@@ -1,3 +1,4 @@
+from time import time
 from typing import Annotated, Callable
 
 from fastapi.security import OAuth2PasswordBearer
@@ -8,16 +9,28 @@ from tortoise import Model
 from pydantic import BaseModel
 
 from config import SECRET_KEY, ALGORITHM
-from extra.services import get_instance_or_404, paginate_queryset
+from extra.services import (
+    paginate_queryset,
+    paginate_queryset_by_cursor,
+    get_keyset_ordering,
+    get_keyset_cursor,
+    order_by_keyset,
+    count_queryset,
+)
+from extra.utils import decode_cursor
 from extra.schemas import Pagination
-from extra.exceptions import UnAuthorized
-from users.models import User
+from extra.exceptions import UnAuthorized, NotFound
+from extra.cache import principal_cache
+from users.models import User, Principal
 
 
 oauth = OAuth2PasswordBearer(tokenUrl='token')
 
 
 async def is_authenticated(token: Annotated[str, Depends(oauth)]) -> User:
+    principal: Principal | None = principal_cache.get(token)
+    if principal:
+        return principal.to_user()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get('sub')
@@ -25,42 +38,83 @@ async def is_authenticated(token: Annotated[str, Depends(oauth)]) -> User:
             raise UnAuthorized
     except JWTError:
         raise UnAuthorized
-    return await get_instance_or_404(User, username=username)
+    # the password hash is only loaded where it is checked
+    user: User | None = await User.filter(
+        username=username
+    ).only(*Principal._fields).get_or_none()
+    if not user:
+        raise NotFound
+    expires_at = payload.get('exp')
+    principal_cache.set(
+        token,
+        Principal.from_user(user),
+        ttl=expires_at - time() if expires_at else None
+    )
+    return user
 
 
 async def pagination(
     request: Request,
     limit: Annotated[int, Query(ge=1)] = 30,
     page: Annotated[int, Query(ge=1)] = 1,
+    cursor: str | None = None,
+    with_total: Annotated[
+        str | None, Query(pattern=r'^(exact|estimate|capped)$')
+    ] = None,
 ) -> Callable[
     [QuerySet, BaseModel, Callable[[Model], BaseModel]],
     Pagination
 ]:
     base_url = str(request.base_url)[:-1]
     path = str(request.url.path)
-    query = str(request.url.remove_query_params(('limit', 'page')).query)
+    query = str(
+        request.url.remove_query_params(('limit', 'page', 'cursor')).query
+    )
 
     url = f'{base_url}{path}'
 
     async def get_paginated_response(
         queryset: QuerySet,
         schema: BaseModel,
-        func_to_validate: Callable[[Model], BaseModel] = None
+        func_to_validate: Callable[[Model], BaseModel] = None,
+        record: type[tuple] | None = None
     ):
+        orderings = get_keyset_ordering(queryset)
+        queryset = order_by_keyset(queryset, orderings)
+
         prev_page = f'{url}?limit={limit}&page={page - 1}&{query}'
-        if page == 1:
+        if page == 1 or cursor:
             prev_page = None
         next_page = None
+        next_cursor = None
+        total, total_relation = None, None
+        if with_total:
+            total, total_relation = await count_queryset(queryset, with_total)
 
-        items = await paginate_queryset(
-            queryset=queryset,
-            limit=limit + 1,
-            offset=((page - 1) * limit)
-        )
+        if cursor:
+            items = await paginate_queryset_by_cursor(
+                queryset=queryset,
+                orderings=orderings,
+                raw_values=decode_cursor(cursor),
+                limit=limit + 1,
+                record=record
+            )
+        else:
+            items = await paginate_queryset(
+                queryset=queryset,
+                limit=limit + 1,
+                offset=((page - 1) * limit),
+                record=record
+            )
 
         if len(items) > limit:
-            next_page = f'{url}?limit={limit}&page={page + 1}&{query}'
             items = items[:-1]
+            next_cursor = get_keyset_cursor(items[-1], orderings)
+            next_page = f'{url}?limit={limit}&page={page + 1}&{query}'
+            if cursor:
+                next_page = (
+                    f'{url}?limit={limit}&cursor={next_cursor}&{query}'
+                )
 
         if func_to_validate:
             return Pagination(
@@ -68,7 +122,10 @@ async def pagination(
                 limit=limit,
                 prev_page=prev_page,
                 next_page=next_page,
+                next_cursor=next_cursor,
                 amount=len(items),
+                total=total,
+                total_relation=total_relation,
                 items=[func_to_validate(item) for item in items]
             )
 
@@ -77,7 +134,10 @@ async def pagination(
             limit=limit,
             prev_page=prev_page,
             next_page=next_page,
+            next_cursor=next_cursor,
             amount=len(items),
+            total=total,
+            total_relation=total_relation,
             items=[schema.model_validate(item) for item in items]
         )
     return get_paginated_response
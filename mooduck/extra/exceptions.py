@@ -17,3 +17,13 @@ AlreadyExists = HTTPException(
     status_code=status.HTTP_400_BAD_REQUEST,
     detail='Already exists'
 )
+
+Overloaded = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail='Server is busy, try again later'
+)
+
+RequestTooLarge = HTTPException(
+    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    detail='Request body is too large'
+)
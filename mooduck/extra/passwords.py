@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+
+from config import (
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+)
+from extra.exceptions import Overloaded
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded pool so it never blocks the event loop."""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        rounds: int = PASSWORD_HASH_ROUNDS,
+        executor: str = PASSWORD_HASH_EXECUTOR,
+    ) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.executor_type = executor
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_pending_seen = 0
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers,
+                    thread_name_prefix='bcrypt'
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        acquired = False
+        try:
+            async with self._get_semaphore():
+                acquired = True
+                self.pending -= 1
+                self.running += 1
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(
+                        self._get_executor(), func, *args
+                    )
+                finally:
+                    self.running -= 1
+                    self.completed += 1
+        finally:
+            if not acquired:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password.encode(), self.rounds)
+        return hashed.decode()
+
+    async def check(self, password: str, hashed: str) -> bool:
+        return await self._run(_check, password.encode(), hashed.encode())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'running': self.running,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'max_pending_seen': self.max_pending_seen,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
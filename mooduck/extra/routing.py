@@ -0,0 +1,42 @@
+from typing import AsyncGenerator, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from config import REQUEST_MAX_SIZE
+from extra.exceptions import RequestTooLarge
+
+
+def max_body_size(size: int) -> Callable:
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.max_body_size = size
+        return endpoint
+    return decorator
+
+
+class LimitedRequest(Request):
+    max_body_size: int = REQUEST_MAX_SIZE
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        received = 0
+        async for chunk in super().stream():
+            received += len(chunk)
+            if received > self.max_body_size:
+                raise RequestTooLarge
+            yield chunk
+
+
+class LimitedRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        limit = getattr(self.endpoint, 'max_body_size', REQUEST_MAX_SIZE)
+
+        async def limited_handler(request: Request) -> Response:
+            content_length = request.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) > limit:
+                raise RequestTooLarge
+            request = LimitedRequest(request.scope, request.receive)
+            request.max_body_size = limit
+            return await handler(request)
+
+        return limited_handler
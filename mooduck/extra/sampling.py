@@ -0,0 +1,121 @@
+from array import array
+from collections import defaultdict
+from random import randrange
+from time import monotonic
+from typing import Awaitable, Callable, Hashable
+import asyncio
+
+from tortoise import Model
+from tortoise.queryset import QuerySet
+
+from extra.tasks import PeriodicTask
+
+from config import (
+    RANDOM_POOL_REFRESH,
+    RANDOM_POOL_RELOAD,
+    RANDOM_POOL_BATCH_SIZE,
+    RANDOM_POOL_ATTEMPTS,
+)
+
+
+class RandomPool:
+    """In-memory pool of public ids, optionally grouped by a key field.
+
+    New rows are appended by id on every refresh; rows that stopped
+    matching are dropped when drawn. The whole pool is rebuilt by a
+    background task on the reload interval to pick up everything else,
+    only the first load happens on the request path.
+    """
+
+    def __init__(
+        self,
+        model: type[Model],
+        key_field: str | None = None,
+        refresh_interval: float = RANDOM_POOL_REFRESH,
+        reload_interval: float = RANDOM_POOL_RELOAD,
+        batch_size: int = RANDOM_POOL_BATCH_SIZE,
+    ) -> None:
+        self.model = model
+        self.key_field = key_field
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.lock = asyncio.Lock()
+        self.task = PeriodicTask(self.reload, reload_interval)
+        self.clear()
+
+    def clear(self) -> None:
+        self.ids: defaultdict[Hashable, array] = defaultdict(
+            lambda: array('q')
+        )
+        self.last_id = 0
+        self.loaded = False
+        self.refreshed_at = float('-inf')
+
+    def get_queryset(self) -> QuerySet:
+        return self.model.filter(is_private=False)
+
+    async def load(
+        self,
+        ids: defaultdict[Hashable, array],
+        last_id: int
+    ) -> int:
+        fields = ['id', self.key_field] if self.key_field else ['id']
+        while True:
+            rows = await self.get_queryset().filter(
+                id__gt=last_id
+            ).order_by('id').limit(self.batch_size).values_list(*fields)
+            for id, *key in rows:
+                ids[None].append(id)
+                if key:
+                    ids[key[0]].append(id)
+            if rows:
+                last_id = rows[-1][0]
+            if len(rows) < self.batch_size:
+                return last_id
+
+    async def refresh(self) -> None:
+        if monotonic() - self.refreshed_at < self.refresh_interval:
+            return
+        async with self.lock:
+            now = monotonic()
+            if now - self.refreshed_at < self.refresh_interval:
+                return
+            self.last_id = await self.load(self.ids, self.last_id)
+            self.loaded = True
+            self.refreshed_at = now
+
+    async def reload(self) -> None:
+        if not self.loaded:
+            return
+        ids = defaultdict(lambda: array('q'))
+        last_id = await self.load(ids, 0)
+        async with self.lock:
+            # rows past last_id are appended again by the next refresh
+            self.ids, self.last_id = ids, last_id
+
+    async def start(self) -> None:
+        await self.task.start()
+
+    async def stop(self) -> None:
+        await self.task.stop()
+
+    async def get(
+        self,
+        fetch: Callable[[int], Awaitable[Model | None]],
+        key: Hashable = None
+    ) -> Model | None:
+        await self.refresh()
+        ids = self.ids.get(key)
+        for _ in range(RANDOM_POOL_ATTEMPTS):
+            if not ids:
+                return None
+            index = randrange(len(ids))
+            id = ids[index]
+            instance = await fetch(id)
+            if instance is not None:
+                return instance
+            # a concurrent draw may have moved or removed the slot meanwhile
+            if index < len(ids) and ids[index] == id:
+                ids[index] = ids[-1]
+                ids.pop()
+        return None
@@ -6,5 +6,8 @@ class Pagination(BaseModel):
     limit: int = 30
     prev_page: str | None
     next_page: str | None
+    next_cursor: str | None = None
     amount: int
+    total: int | None = None
+    total_relation: str | None = None
     items: list[BaseModel] = []
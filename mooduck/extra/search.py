@@ -0,0 +1,151 @@
+from functools import cache
+from typing import NamedTuple
+
+from pypika import Order
+from pypika.enums import Comparator
+from pypika.terms import (
+    BasicCriterion,
+    Bracket,
+    Case,
+    Criterion,
+    Field,
+    Function,
+    Term,
+    ValueWrapper,
+)
+from tortoise.contrib.postgres.search import Comp
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+from config import (
+    SEARCH_CONFIG,
+    SEARCH_HEADLINE_OPTIONS,
+    USER_SEARCH_MIN_SIMILARITY,
+)
+from extra.services import get_keyset_ordering, order_by_keyset
+
+
+class TrigramComp(Comparator):
+    similar = ' % '
+
+
+def is_full_text_search_supported(queryset: QuerySet) -> bool:
+    return queryset.model._meta.db.capabilities.dialect == 'postgres'
+
+
+def get_search_query(search: str) -> Term:
+    return Function(
+        'websearch_to_tsquery',
+        ValueWrapper(SEARCH_CONFIG),
+        ValueWrapper(search)
+    )
+
+
+def search_queryset(
+    queryset: QuerySet,
+    search: str,
+    headline: bool = False,
+    ranked: bool = True
+) -> QuerySet:
+    # search_vector is a generated column kept outside the models, see
+    # the migration that adds it; other dialects fall back to ILIKE.
+    if not is_full_text_search_supported(queryset):
+        return queryset.filter(
+            Q(name__icontains=search) | Q(description__icontains=search)
+        )
+    table = queryset.model._meta.basetable
+    vector = Field('search_vector', table=table)
+    query = get_search_query(search)
+    queryset = queryset.annotate(
+        search_match=BasicCriterion(Comp.search, vector, query)
+    ).filter(search_match=True)
+    if headline:
+        queryset = queryset.annotate(search_headline=Function(
+            'ts_headline',
+            ValueWrapper(SEARCH_CONFIG),
+            Function(
+                'concat_ws',
+                ValueWrapper(' '),
+                Field('name', table=table),
+                Field('description', table=table)
+            ),
+            query,
+            ValueWrapper(SEARCH_HEADLINE_OPTIONS)
+        ))
+    if not ranked:
+        return queryset
+    queryset = queryset.annotate(
+        search_rank=Function('ts_rank_cd', vector, query)
+    )
+    return order_by_rank(queryset)
+
+
+def order_by_rank(queryset: QuerySet) -> QuerySet:
+    return order_by_keyset(queryset, [
+        ('search_rank', Order.desc),
+        *get_keyset_ordering(queryset)
+    ])
+
+
+def escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def fuzzy_search_queryset(
+    queryset: QuerySet,
+    search: str,
+    fields: tuple[str, ...],
+    min_similarity: float = USER_SEARCH_MIN_SIMILARITY
+) -> QuerySet:
+    # Exact matches rank above prefix matches, which rank above the
+    # rest; similarity orders within each group.
+    if not is_full_text_search_supported(queryset):
+        return queryset.filter(Q(
+            *[Q(**{f'{field}__icontains': search}) for field in fields],
+            join_type=Q.OR
+        ))
+    table = queryset.model._meta.basetable
+    columns = [Field(field, table=table) for field in fields]
+    pattern = escape_like(search)
+    exact = Criterion.any([column.ilike(pattern) for column in columns])
+    prefix = Criterion.any([column.ilike(f'{pattern}%') for column in columns])
+    similarity = Function('greatest', *[
+        Function('similarity', column, ValueWrapper(search))
+        for column in columns
+    ])
+    similar = Criterion.any([
+        BasicCriterion(TrigramComp.similar, column, ValueWrapper(search))
+        for column in columns
+    ])
+    return order_by_rank(queryset.annotate(
+        search_match=Bracket(
+            (similar & (similarity >= min_similarity)) | prefix
+        ),
+        search_rank=Case().when(exact, 2).when(prefix, 1).else_(0)
+        + similarity,
+    ).filter(search_match=True))
+
+
+@cache
+def extend_record(
+    record: type[tuple],
+    ranked: bool,
+    headline: bool
+) -> type[tuple]:
+    fields = [*record.__annotations__.items()]
+    if ranked:
+        fields.append(('search_rank', float))
+    if headline:
+        fields.append(('search_headline', str | None))
+    return NamedTuple(f'Search{record.__name__}', fields)
+
+
+def get_search_record(
+    queryset: QuerySet,
+    record: type[tuple]
+) -> type[tuple]:
+    ranked = 'search_rank' in queryset._annotations
+    headline = 'search_headline' in queryset._annotations
+    if not ranked and not headline:
+        return record
+    return extend_record(record, ranked, headline)
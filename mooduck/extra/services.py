@@ -1,8 +1,18 @@
+from typing import Any
+import json
+import re
+
+from pypika import Order
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import Q
 from tortoise.queryset import QuerySetSingle, QuerySet
 from tortoise import Model
 from tortoise.exceptions import IntegrityError
 
-from extra.exceptions import NotFound, AlreadyExists
+from config import COUNT_CAP, SQL_MAX_PARAMETERS
+from extra.cache import count_cache
+from extra.exceptions import NotFound, AlreadyExists, BadRequest
+from extra.utils import encode_cursor
 
 
 async def get_instance_or_404(
@@ -23,9 +33,250 @@ async def create_instance_by_kwargs(model: Model, **kwargs) -> QuerySetSingle:
         raise AlreadyExists
 
 
+async def fetch_records(
+    queryset: QuerySet,
+    record: type[tuple] | None = None
+) -> list[Model | tuple]:
+    if not record:
+        return await queryset
+    return [
+        record._make(row)
+        for row in await queryset.values_list(*record._fields)
+    ]
+
+
 async def paginate_queryset(
     queryset: QuerySet,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    record: type[tuple] | None = None
+) -> list[Model | tuple]:
+    return await fetch_records(queryset.limit(limit).offset(offset), record)
+
+
+def get_keyset_ordering(queryset: QuerySet) -> list[tuple[str, Order]]:
+    orderings = list(queryset._orderings or queryset.model._meta.ordering)
+    meta = queryset.model._meta
+    if not any(
+        field == meta.pk_attr or (
+            field in meta.fields_map
+            and meta.fields_map[field].unique
+            and not meta.fields_map[field].null
+        )
+        for field, _ in orderings
+    ):
+        orderings.append((meta.pk_attr, Order.asc))
+    return orderings
+
+
+def order_by_keyset(
+    queryset: QuerySet,
+    orderings: list[tuple[str, Order]]
+) -> QuerySet:
+    return queryset.order_by(*[
+        f'-{field}' if order == Order.desc else field
+        for field, order in orderings
+    ])
+
+
+def get_keyset_cursor(
+    instance: Model | tuple,
+    orderings: list[tuple[str, Order]]
+) -> str:
+    return encode_cursor([getattr(instance, field) for field, _ in orderings])
+
+
+def get_keyset_values(
+    queryset: QuerySet,
+    orderings: list[tuple[str, Order]],
+    raw_values: list[Any]
+) -> list[Any]:
+    if len(raw_values) != len(orderings):
+        raise BadRequest
+    values = []
+    for (field, _), value in zip(orderings, raw_values):
+        field_object = queryset.model._meta.fields_map.get(field)
+        if value is None:
+            if not (field_object and field_object.null):
+                raise BadRequest
+        elif field_object:
+            try:
+                value = field_object.to_python_value(value)
+            except Exception:
+                raise BadRequest
+        values.append(value)
+    return values
+
+
+async def paginate_queryset_by_cursor(
+    queryset: QuerySet,
+    orderings: list[tuple[str, Order]],
+    raw_values: list[Any],
+    limit: int = 50,
+    record: type[tuple] | None = None
+) -> list[Model | tuple]:
+    values = get_keyset_values(queryset, orderings, raw_values)
+    conditions = []
+    for index, (field, order) in enumerate(orderings):
+        lookup = 'lt' if order == Order.desc else 'gt'
+        filters = {
+            prev_field: prev_value for (prev_field, _), prev_value
+            in zip(orderings[:index], values[:index])
+        }
+        filters[f'{field}__{lookup}'] = values[index]
+        conditions.append(Q(**filters))
+    return await fetch_records(
+        queryset.filter(Q(*conditions, join_type=Q.OR)).limit(limit),
+        record
+    )
+
+
+def get_sql_placeholders(count: int, start: int = 1) -> str:
+    return ', '.join(f'${index}' for index in range(start, start + count))
+
+
+def get_returned_ids(
+    ids: list[int],
+    rows: list[dict],
+    column: str
+) -> list[int]:
+    returned = {row[column] for row in rows}
+    return [id for id in ids if id in returned]
+
+
+async def execute_sql(
+    connection: BaseDBAsyncClient,
+    sql: str,
+    values: list[Any] | None = None
+) -> list[dict]:
+    if connection.capabilities.dialect == 'sqlite':
+        sql = re.sub(r'\$(\d+)', r'?\1', sql)
+    return await connection.execute_query_dict(sql, values)
+
+
+async def allocate_pks(
+    connection: BaseDBAsyncClient,
+    model: type[Model],
+    count: int
+) -> list[int]:
+    meta = model._meta
+    if connection.capabilities.dialect == 'sqlite':
+        rows = await execute_sql(
+            connection,
+            f'SELECT COALESCE(MAX("{meta.db_pk_column}"), 0) AS "pk" '
+            f'FROM "{meta.db_table}"'
+        )
+        return list(range(rows[0]['pk'] + 1, rows[0]['pk'] + count + 1))
+    rows = await execute_sql(
+        connection,
+        'SELECT nextval(pg_get_serial_sequence($1, $2)) AS "pk" '
+        'FROM generate_series(1, $3)',
+        [meta.db_table, meta.db_pk_column, count]
+    )
+    return [row['pk'] for row in rows]
+
+
+async def bulk_insert_returning(
+    instances: list[Model],
+    connection: BaseDBAsyncClient
 ) -> list[Model]:
-    return await queryset.limit(limit).offset(offset)
+    if not instances:
+        return instances
+    model = type(instances[0])
+    meta = model._meta
+    executor = connection.executor_class(model=model, db=connection)
+    # RETURNING order is not guaranteed, so pks are taken from the
+    # sequence up front and returned rows are matched by them
+    for instance, pk in zip(
+        instances,
+        await allocate_pks(connection, model, len(instances))
+    ):
+        instance.pk = pk
+    columns = executor.regular_columns_all
+    batch_size = SQL_MAX_PARAMETERS // len(columns)
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        values = [
+            executor.column_map[column](getattr(instance, column), instance)
+            for instance in batch
+            for column in columns
+        ]
+        rows = ', '.join(
+            f'({get_sql_placeholders(len(columns), index * len(columns) + 1)})'
+            for index in range(len(batch))
+        )
+        result = await execute_sql(
+            connection,
+            f'INSERT INTO "{meta.db_table}" ('
+            + ', '.join(
+                f'"{meta.fields_db_projection[column]}"'
+                for column in columns
+            )
+            + f') VALUES {rows} RETURNING "{meta.db_pk_column}"',
+            values
+        )
+        inserted = {row[meta.db_pk_column] for row in result}
+        for instance in batch:
+            instance._saved_in_db = instance.pk in inserted
+    return instances
+
+
+async def get_exact_count(queryset: QuerySet) -> tuple[int, str]:
+    return await queryset.count(), 'eq'
+
+
+async def get_capped_count(
+    queryset: QuerySet,
+    cap: int = COUNT_CAP
+) -> tuple[int, str]:
+    db = queryset.model._meta.db
+    subquery = queryset.limit(cap + 1).values_list('id', flat=True).sql()
+    _, rows = await db.execute_query(
+        f'SELECT COUNT(*) AS "count" FROM ({subquery}) AS "capped"'
+    )
+    count = rows[0]['count']
+    if count > cap:
+        return cap, 'gte'
+    return count, 'eq'
+
+
+async def get_estimated_count(queryset: QuerySet) -> tuple[int, str]:
+    db = queryset.model._meta.db
+    if db.capabilities.dialect != 'postgres':
+        return await get_exact_count(queryset)
+
+    if not queryset._q_objects:
+        _, rows = await db.execute_query(
+            'SELECT reltuples::bigint AS "count" FROM pg_class '
+            'WHERE oid = $1::regclass',
+            [queryset.model._meta.db_table]
+        )
+        estimate = rows[0]['count'] if rows else -1
+    else:
+        _, rows = await db.execute_query(
+            f'EXPLAIN (FORMAT JSON) {queryset.all().sql()}'
+        )
+        plan = rows[0]['QUERY PLAN']
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    if estimate < COUNT_CAP:
+        return await get_exact_count(queryset)
+    return estimate, 'approx'
+
+
+COUNT_STRATEGIES = {
+    'exact': get_exact_count,
+    'estimate': get_estimated_count,
+    'capped': get_capped_count,
+}
+
+
+async def count_queryset(queryset: QuerySet, mode: str) -> tuple[int, str]:
+    key = (mode, queryset.all().sql())
+    result = count_cache.get(key)
+    if result is None:
+        result = await COUNT_STRATEGIES[mode](queryset)
+        count_cache.set(key, result)
+    return result
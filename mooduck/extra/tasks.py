@@ -0,0 +1,34 @@
+from typing import Awaitable, Callable
+import asyncio
+
+
+class PeriodicTask:
+    def __init__(
+        self,
+        func: Callable[[], Awaitable],
+        interval: float
+    ) -> None:
+        self.func = func
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+            except Exception as ex:
+                print(ex)
+
+    async def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
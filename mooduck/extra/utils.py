@@ -1,6 +1,8 @@
 from datetime import timedelta, datetime
-from hashlib import sha256
+from typing import Any
 import base64
+import binascii
+import json
 
 from jose import jwt
 import bcrypt
@@ -9,14 +11,17 @@ from config import (
     SECRET_KEY,
     ALGORITHM,
     ACCESS_TOKEN_EXPIRE_DAYS,
-    MEDIA_URL,
-    MEDIA_ROOT,
-    BASE_URL
+    PASSWORD_HASH_ROUNDS,
+    MEDIA_BASE_URL
 )
+from extra.exceptions import BadRequest
 
 
 def get_password_hash(password: str) -> bytes:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return bcrypt.hashpw(
+        password.encode(),
+        bcrypt.gensalt(PASSWORD_HASH_ROUNDS)
+    )
 
 
 def create_access_token(
@@ -31,17 +36,27 @@ def create_access_token(
     return encoded_jwt
 
 
-def save_image_from_base64(base64_data: str) -> str:
-    if not base64_data:
-        return ''
-    format, imgstr = base64_data.split(';base64,')
-    ext = format.split('/')[-1]
-    img_name = sha256(imgstr.encode()).hexdigest()
-    image_url = f'{BASE_URL}/{MEDIA_URL}/{img_name}.{ext}'
-    with open(MEDIA_ROOT / f'{img_name}.{ext}', 'wb') as file:
-        try:
-            file.write(base64.b64decode(imgstr))
-        except Exception as ex:
-            print(ex)
-            return ''
-    return image_url
+def get_media_url(filename: str) -> str:
+    return f'{MEDIA_BASE_URL}/{filename}'
+
+
+def _default_json(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values: list[Any]) -> str:
+    data = json.dumps(values, default=_default_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (binascii.Error, ValueError):
+        raise BadRequest
+    if not isinstance(values, list):
+        raise BadRequest
+    return values
@@ -0,0 +1,43 @@
+from tortoise import Tortoise, run_async
+from tortoise.transactions import in_transaction
+
+from db.db import TORTOISE_ORM
+from items.models import Item
+from items.services import get_canonical_links
+
+
+async def link_canonical_items(batch_size: int = 1000) -> int:
+    linked = 0
+    last_id = 0
+    while True:
+        rows = await Item.filter(
+            id__gt=last_id,
+            canonical_id=None,
+            link__isnull=False
+        ).order_by('id').limit(batch_size).values_list('id', 'link')
+        if not rows:
+            return linked
+        last_id = rows[-1][0]
+        async with in_transaction() as connection:
+            canonical = await get_canonical_links(
+                [link for _, link in rows], connection
+            )
+            item_ids = {}
+            for (item_id, _), canonical_link in zip(rows, canonical):
+                if canonical_link is not None:
+                    item_ids.setdefault(canonical_link.id, []).append(item_id)
+            for canonical_id, ids in item_ids.items():
+                await Item.filter(id__in=ids).using_db(connection).update(
+                    canonical_id=canonical_id
+                )
+                linked += len(ids)
+
+
+async def main():
+    await Tortoise.init(TORTOISE_ORM)
+    linked = await link_canonical_items()
+    print(f'Linked {linked} items to canonical links')
+
+
+if __name__ == '__main__':
+    run_async(main())
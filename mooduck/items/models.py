@@ -32,6 +32,15 @@ class ItemMoodboard(Model):
         related_name='item_moodboard'
     )
 
+    class Meta:
+        unique_together = (('item', 'moodboard'),)
+
+
+class CanonicalLink(Model):
+    id = fields.BigIntField(pk=True)
+    url = fields.CharField(max_length=1024, unique=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
 
 class Item(Model):
     id = fields.BigIntField(pk=True)
@@ -43,9 +52,44 @@ class Item(Model):
         validators=[ChoicesValidator(ITEM_TYPES.keys())]
     )
     link = fields.CharField(max_length=1024, null=True)
-    media = fields.TextField(null=True)
+    canonical = fields.ForeignKeyField(
+        'models.CanonicalLink',
+        related_name='items',
+        null=True,
+        index=True,
+        on_delete=fields.SET_NULL
+    )
     created_at = fields.DatetimeField(auto_now_add=True)
     is_private = fields.BooleanField(default=False)
 
     class Meta:
         ordering = ['-created_at', 'name']
+
+
+class ItemMedia(Model):
+    id = fields.BigIntField(pk=True)
+    item = fields.ForeignKeyField(
+        'models.Item',
+        related_name='item_media',
+        on_delete=fields.CASCADE
+    )
+    position = fields.SmallIntField()
+    # set for uploaded media, the url is built from it when serializing;
+    # url is only kept for external media
+    media = fields.ForeignKeyField(
+        'models.Media',
+        related_name='item_media',
+        null=True,
+        index=True,
+        on_delete=fields.RESTRICT
+    )
+    url = fields.CharField(max_length=1024, null=True)
+    hash = fields.CharField(max_length=64, null=True, index=True)
+    mime_type = fields.CharField(max_length=64, null=True)
+    size = fields.BigIntField(null=True)
+    width = fields.IntField(null=True)
+    height = fields.IntField(null=True)
+
+    class Meta:
+        unique_together = (('item', 'position'),)
+        ordering = ['position']
@@ -2,27 +2,42 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, status, Response
 
+from config import MEDIA_REQUEST_BODY_SIZE
 from users.models import User
 from extra.dependencies import is_authenticated, pagination
+from extra.routing import LimitedRoute, max_body_size
+from extra.search import get_search_record
 from items.models import Item, ITEM_TYPES
 from items.schemas import (
     AddItemsToMoodboard,
+    BatchItemOperations,
+    ItemOperationResult,
     PatchItem,
     GetItem,
-    PaginatedItem
+    PaginatedItem,
+    FacetedPaginatedItem
 )
 from items.services import (
     bulk_create_items,
     add_existing_items_to_moodboard,
-    get_moodboard_items,
+    apply_item_operations,
+    get_moodboard_items_queryset,
     delete_item_from_moodboard as delete_item_from_moodboard_db,
     update_item,
     get_item_check_authorization,
     get_random_item,
-    get_all_items
+    get_all_items,
+    get_item_facets,
+    get_items_by_link_queryset
 )
 from items.dependencies import is_item_author
-from items.utils import get_item_response, get_item_list_response
+from items.utils import (
+    get_item_response,
+    get_item_list_response,
+    get_item_record_response,
+    fill_items_media,
+    ItemRecord
+)
 from items.exceptions import ItemError
 from moodboards.schemas import GetMoodboard
 from moodboards.services import (
@@ -33,10 +48,11 @@ from moodboards.dependencies import is_moodboard_author
 from moodboards.models import Moodboard
 
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedRoute)
 
 
 @router.post('/chaotic')
+@max_body_size(MEDIA_REQUEST_BODY_SIZE)
 async def add_items_to_chaotic(
     user: Annotated[User, Depends(is_authenticated)],
     data: AddItemsToMoodboard
@@ -48,32 +64,34 @@ async def add_items_to_chaotic(
     if data.existing_items:
         items.extend(
             await add_existing_items_to_moodboard(
+                user,
                 data.existing_items,
                 moodboard
             )
         )
     if not items:
         raise ItemError
-    return get_item_list_response(
-        await get_moodboard_items(moodboard),
-    )
+    return get_item_list_response(items)
 
 
 @router.delete('/chaotic/{item_id}')
 async def delete_item_from_chaotic(
     user: Annotated[User, Depends(is_authenticated)],
     item_id: int,
+    delete_item: bool = False,
 ) -> GetMoodboard:
     moodboard = await get_chaotic(user)
     await delete_item_from_moodboard_db(
         user=user,
         moodboard=moodboard,
         item_id=item_id,
+        delete_item=delete_item,
     )
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post('/moodboard/{moodboard_id}/item')
+@max_body_size(MEDIA_REQUEST_BODY_SIZE)
 async def add_items_to_moodboard(
     user_moodboard: Annotated[
         tuple[User, Moodboard],
@@ -88,6 +106,7 @@ async def add_items_to_moodboard(
     if data.existing_items:
         items.extend(
             await add_existing_items_to_moodboard(
+                user,
                 data.existing_items,
                 moodboard
             )
@@ -100,10 +119,18 @@ async def add_items_to_moodboard(
 @router.get('/moodboard/{moodboard_id}/item')
 async def list_moodboard_items(
     moodboard_id: int,
-    user: Annotated[User, Depends(is_authenticated)]
-) -> list[GetItem]:
+    user: Annotated[User, Depends(is_authenticated)],
+    paginator=Depends(pagination)
+) -> PaginatedItem:
     moodboard = await get_moodboard_check_authorization(moodboard_id, user)
-    return get_item_list_response(await get_moodboard_items(moodboard))
+    page = await paginator(
+        get_moodboard_items_queryset(moodboard),
+        GetItem,
+        get_item_record_response,
+        ItemRecord
+    )
+    await fill_items_media(page.items)
+    return page
 
 
 @router.delete('/moodboard/{moodboard_id}/item/{item_id}')
@@ -113,21 +140,55 @@ async def delete_item_from_moodboard(
         tuple[User, Moodboard],
         Depends(is_moodboard_author)
     ],
+    delete_item: bool = False,
 ):
     user, moodboard = user_moodboard
     await delete_item_from_moodboard_db(
         user=user,
         moodboard=moodboard,
         item_id=item_id,
+        delete_item=delete_item,
     )
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.post('/item/batch')
+async def batch_item_operations(
+    user: Annotated[User, Depends(is_authenticated)],
+    data: BatchItemOperations
+) -> list[ItemOperationResult]:
+    return await apply_item_operations(user, data.operations)
+
+
 @router.get('/item/types')
 async def list_item_types() -> dict[str, str]:
     return ITEM_TYPES
 
 
+@router.get('/item/facets')
+async def list_item_facets(
+    user: Annotated[User, Depends(is_authenticated)],
+    search: str | None = None
+) -> dict[str, int]:
+    return await get_item_facets(search)
+
+
+@router.get('/item/lookup')
+async def lookup_items_by_link(
+    user: Annotated[User, Depends(is_authenticated)],
+    link: str,
+    paginator=Depends(pagination)
+) -> PaginatedItem:
+    page = await paginator(
+        get_items_by_link_queryset(link),
+        GetItem,
+        get_item_record_response,
+        ItemRecord
+    )
+    await fill_items_media(page.items)
+    return page
+
+
 @router.get('/item/{item_id}')
 async def retrieve_moodboard_item(
     user: Annotated[User, Depends(is_authenticated)],
@@ -139,6 +200,7 @@ async def retrieve_moodboard_item(
 
 
 @router.patch('/item/{item_id}')
+@max_body_size(MEDIA_REQUEST_BODY_SIZE)
 async def patch_item(
     user_item: Annotated[
         tuple[User, Item],
@@ -157,12 +219,23 @@ async def list_items(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination),
     search: str | None = None,
-    item_type: str | None = None
-) -> PaginatedItem:
-    return await paginator(
-        get_all_items(search, item_type),
+    item_type: str | None = None,
+    headline: bool = False,
+    facets: bool = False
+) -> FacetedPaginatedItem:
+    queryset = get_all_items(search, item_type, headline)
+    page = await paginator(
+        queryset,
         GetItem,
-        get_item_response
+        get_item_record_response,
+        get_search_record(queryset, ItemRecord)
+    )
+    await fill_items_media(page.items)
+    if not facets:
+        return page
+    return FacetedPaginatedItem.model_construct(
+        **dict(page),
+        facets=await get_item_facets(search)
     )
 
 
@@ -1,13 +1,15 @@
 from datetime import datetime
-from typing import Annotated
+from typing import Literal
 
-from pydantic import BaseModel, field_validator
-from fastapi import Query
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from config import ITEM_BATCH_MAX_OPERATIONS, ITEM_BATCH_MAX_ITEMS
 
 from items.models import ITEM_TYPES
 from users.schemas import UserGet
-from config import BASE64_PATTERN
 from extra.schemas import Pagination
+from storage.schemas import MediaSet
+from storage.validators import Base64Image
 
 
 class CreateItem(BaseModel):
@@ -16,10 +18,8 @@ class CreateItem(BaseModel):
     item_type: str
     link: str | None = None
     is_private: bool = False
-    media: Annotated[
-        list[str] | None,
-        list[Query(pattern=BASE64_PATTERN)]
-    ] = None
+    media: list[Base64Image] | None = None
+    media_ids: list[int] | None = None
 
     @field_validator('item_type')
     @classmethod
@@ -38,7 +38,8 @@ class PatchItem(BaseModel):
     item_type: str | None = None
     link: str | None = None
     is_private: bool | None = None
-    media: list[str] | None = None
+    media: list[Base64Image] | None = None
+    media_ids: list[int] | None = None
 
     @field_validator('item_type')
     @classmethod
@@ -60,7 +61,9 @@ class GetItem(BaseModel):
     link: str | None = None
     is_private: bool = False
     media: list[str] | None = None
+    media_srcset: list[MediaSet] | None = None
     created_at: datetime
+    headline: str | None = None
 
     class Config:
         from_attributes = True
@@ -71,5 +74,40 @@ class AddItemsToMoodboard(BaseModel):
     existing_items: list[int] | None = None
 
 
+class ItemOperation(BaseModel):
+    action: Literal['move', 'copy', 'remove']
+    item_ids: list[int] = Field(min_length=1, max_length=ITEM_BATCH_MAX_ITEMS)
+    source: int | None = None
+    target: int | None = None
+    delete_item: bool = False
+
+    @model_validator(mode='after')
+    def moodboards_validator(self):
+        if self.action != 'copy' and self.source is None:
+            raise ValueError(f'Action {self.action} requires source')
+        if self.action != 'remove' and self.target is None:
+            raise ValueError(f'Action {self.action} requires target')
+        if self.source is not None and self.source == self.target:
+            raise ValueError('Source and target must differ')
+        return self
+
+
+class BatchItemOperations(BaseModel):
+    operations: list[ItemOperation] = Field(
+        min_length=1,
+        max_length=ITEM_BATCH_MAX_OPERATIONS
+    )
+
+
+class ItemOperationResult(BaseModel):
+    action: str
+    items: list[int]
+    deleted: list[int] = []
+
+
 class PaginatedItem(Pagination):
     items: list[GetItem]
+
+
+class FacetedPaginatedItem(PaginatedItem):
+    facets: dict[str, int] | None = None
@@ -1,48 +1,242 @@
+from tortoise.backends.base.client import BaseDBAsyncClient
 from tortoise.contrib.postgres.functions import Random
-from tortoise.expressions import Q
+from tortoise.functions import Count
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
+from config import MOODBOARD_ITEMS_WINDOW
 from moodboards.models import Moodboard
-from items.schemas import CreateItem
-from items.utils import get_media_from_base64_list
-from items.models import Item, ItemMoodboard, ITEM_TYPES
+from items.schemas import CreateItem, ItemOperation, ItemOperationResult
+from items.utils import (
+    get_item_media,
+    get_items_media,
+    get_item_media_rows,
+    normalize_link,
+    prefetch_item_media,
+)
+from storage.services import acquire_media, release_media
+from items.models import (
+    CanonicalLink,
+    Item,
+    ItemMoodboard,
+    ItemMedia,
+    ITEM_TYPES
+)
 from users.models import User
-from extra.exceptions import NotFound, UnAuthorized
+from extra.cache import facet_cache
+from extra.exceptions import BadRequest, NotFound, UnAuthorized
+from extra.sampling import RandomPool
+from extra.search import search_queryset
+from extra.services import (
+    bulk_insert_returning,
+    execute_sql,
+    get_keyset_cursor,
+    get_keyset_ordering,
+    order_by_keyset,
+    get_returned_ids,
+    get_sql_placeholders,
+)
+
+
+item_pool = RandomPool(Item, 'item_type')
+
+
+async def copy_items(
+    connection: BaseDBAsyncClient,
+    user: User,
+    item_ids: list[int],
+    moodboard_id: int
+) -> list[int]:
+    rows = await execute_sql(
+        connection,
+        'INSERT INTO "itemmoodboard" ("item_id", "moodboard_id") '
+        'SELECT "id", $1 FROM "item" '
+        f'WHERE "id" IN ({get_sql_placeholders(len(item_ids), 3)}) '
+        'AND (NOT "is_private" OR "author_id" = $2) '
+        'ON CONFLICT ("item_id", "moodboard_id") DO NOTHING '
+        'RETURNING "item_id"',
+        [moodboard_id, user.id, *item_ids]
+    )
+    return get_returned_ids(item_ids, rows, 'item_id')
+
+
+async def move_items(
+    connection: BaseDBAsyncClient,
+    item_ids: list[int],
+    source: int,
+    target: int
+) -> list[int]:
+    placeholders = get_sql_placeholders(len(item_ids), 3)
+    await execute_sql(
+        connection,
+        'INSERT INTO "itemmoodboard" ("item_id", "moodboard_id") '
+        'SELECT "item_id", $2 FROM "itemmoodboard" '
+        f'WHERE "moodboard_id" = $1 AND "item_id" IN ({placeholders}) '
+        'ON CONFLICT ("item_id", "moodboard_id") DO NOTHING',
+        [source, target, *item_ids]
+    )
+    return await unlink_items(connection, item_ids, source)
+
+
+async def unlink_items(
+    connection: BaseDBAsyncClient,
+    item_ids: list[int],
+    moodboard_id: int
+) -> list[int]:
+    rows = await execute_sql(
+        connection,
+        'DELETE FROM "itemmoodboard" WHERE "moodboard_id" = $1 '
+        f'AND "item_id" IN ({get_sql_placeholders(len(item_ids), 2)}) '
+        'RETURNING "item_id"',
+        [moodboard_id, *item_ids]
+    )
+    return get_returned_ids(item_ids, rows, 'item_id')
+
+
+async def delete_orphan_items(
+    connection: BaseDBAsyncClient,
+    user: User,
+    item_ids: list[int]
+) -> tuple[list[int], list[tuple[str, bool]]]:
+    rows = await execute_sql(
+        connection,
+        'SELECT "id", "item_type", "is_private" FROM "item" '
+        f'WHERE "id" IN ({get_sql_placeholders(len(item_ids), 2)}) '
+        'AND "author_id" = $1 AND NOT EXISTS ('
+        'SELECT 1 FROM "itemmoodboard" '
+        'WHERE "itemmoodboard"."item_id" = "item"."id")',
+        [user.id, *item_ids]
+    )
+    orphan_ids = get_returned_ids(item_ids, rows, 'id')
+    if not orphan_ids:
+        return orphan_ids, []
+    media_ids = await ItemMedia.filter(
+        item_id__in=orphan_ids
+    ).using_db(connection).values_list('media_id', flat=True)
+    await Item.filter(id__in=orphan_ids).using_db(connection).delete()
+    await release_media(media_ids, connection)
+    return orphan_ids, [
+        (row['item_type'], bool(row['is_private'])) for row in rows
+    ]
+
+
+async def remove_items(
+    connection: BaseDBAsyncClient,
+    user: User,
+    item_ids: list[int],
+    moodboard_id: int,
+    delete_item: bool = False
+) -> tuple[list[int], list[int], list[tuple[str, bool]]]:
+    removed = await unlink_items(connection, item_ids, moodboard_id)
+    deleted, facets = [], []
+    if delete_item and removed:
+        deleted, facets = await delete_orphan_items(
+            connection, user, removed
+        )
+    return removed, deleted, facets
+
+
+async def check_moodboards_author(user: User, ids: set[int]) -> None:
+    authors = dict(
+        await Moodboard.filter(id__in=ids).values_list('id', 'author_id')
+    )
+    if len(authors) != len(ids):
+        raise NotFound
+    if any(author_id != user.id for author_id in authors.values()):
+        raise UnAuthorized
+
+
+async def apply_item_operations(
+    user: User,
+    operations: list[ItemOperation]
+) -> list[ItemOperationResult]:
+    await check_moodboards_author(user, {
+        id
+        for operation in operations
+        for id in (operation.source, operation.target)
+        if id is not None
+    })
+    results, deleted_facets = [], []
+    async with in_transaction() as connection:
+        for operation in operations:
+            item_ids = list(dict.fromkeys(operation.item_ids))
+            deleted = []
+            if operation.action == 'copy':
+                items = await copy_items(
+                    connection, user, item_ids, operation.target
+                )
+            elif operation.action == 'move':
+                items = await move_items(
+                    connection, item_ids, operation.source, operation.target
+                )
+            else:
+                items, deleted, facets = await remove_items(
+                    connection,
+                    user,
+                    item_ids,
+                    operation.source,
+                    operation.delete_item
+                )
+                deleted_facets.extend(facets)
+            results.append(ItemOperationResult(
+                action=operation.action,
+                items=items,
+                deleted=deleted
+            ))
+    for item_type, is_private in deleted_facets:
+        update_item_facets(item_type, is_private, -1)
+    return results
 
 
 async def add_existing_items_to_moodboard(
+    user: User,
     id_list: list[int],
     moodboard: Moodboard
 ) -> list[Item]:
-    moodboard_items_ids = await Item.all(
-    ).select_related(
-        'item_moodboard'
-    ).filter(
-        item_moodboard__moodboard=moodboard
-    ).values_list('id', flat=True)
-    diff = set(id_list).difference(set(moodboard_items_ids))
-    if not diff:
+    id_list = list(dict.fromkeys(id_list))
+    if not id_list:
         return []
-
-    items = await Item.filter(id__in=diff).select_related('author')
-
-    await ItemMoodboard.bulk_create(
-        [ItemMoodboard(
-            item=item, moodboard=moodboard
-            ) for item in items])
-    return items
+    async with in_transaction() as connection:
+        added = await copy_items(connection, user, id_list, moodboard.id)
+    if not added:
+        return []
+    items = {
+        item.id: item for item in await Item.filter(
+            id__in=added
+        ).select_related(
+            'author'
+        ).prefetch_related(
+            'item_media__media'
+        )
+    }
+    return [items[id] for id in added]
 
 
-async def get_moodboard_items(moodboard: Moodboard) -> list[Item]:
-    return await Item.all(
-    ).select_related(
-        'item_moodboard'
+def get_moodboard_items_queryset(moodboard: Moodboard) -> QuerySet[Item]:
+    return Item.filter(
+        item_moodboard__moodboard=moodboard
     ).select_related(
         'author'
-    ).filter(
-        item_moodboard__moodboard=moodboard
     )
 
 
+async def get_moodboard_items(
+    moodboard: Moodboard,
+    limit: int = MOODBOARD_ITEMS_WINDOW
+) -> tuple[list[Item], str | None]:
+    queryset = get_moodboard_items_queryset(moodboard)
+    orderings = get_keyset_ordering(queryset)
+    items = await order_by_keyset(
+        queryset, orderings
+    ).prefetch_related(
+        'item_media__media'
+    ).limit(limit + 1)
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, get_keyset_cursor(items[-1], orderings)
+
+
 async def create_item(
     author: User,
     item: CreateItem,
@@ -50,35 +244,83 @@ async def create_item(
 ) -> Item:
     if not moodboard:
         moodboard = await Moodboard.get(author=author, is_chaotic=True)
-    created_item = await Item.create(
-        name=item.name,
-        item_type=item.item_type,
-        description=item.description,
-        link=item.link,
-        is_private=item.is_private,
-        media=get_media_from_base64_list(item.media),
-        author=author,
-    )
-    await ItemMoodboard.create(
-        item=created_item,
-        moodboard=moodboard,
-    )
-    return created_item
+    return (await bulk_create_items(author, moodboard, [item]))[0]
 
 
 async def get_item(item_id: int) -> Item:
-    item = await Item.all().select_related('author').get_or_none(id=item_id)
+    item = await Item.all(
+    ).select_related(
+        'author'
+    ).prefetch_related(
+        'item_media__media'
+    ).get_or_none(id=item_id)
     if not item:
         raise NotFound
     return item
 
 
+async def get_canonical_links(
+    links: list[str | None],
+    connection: BaseDBAsyncClient | None = None
+) -> list[CanonicalLink | None]:
+    urls = [normalize_link(link) for link in links]
+    unique_urls = {url for url in urls if url}
+    if not unique_urls:
+        return [None] * len(urls)
+    await CanonicalLink.bulk_create(
+        [CanonicalLink(url=url) for url in sorted(unique_urls)],
+        ignore_conflicts=True,
+        using_db=connection
+    )
+    canonical = {
+        entry.url: entry for entry in await CanonicalLink.filter(
+            url__in=unique_urls
+        ).using_db(connection)
+    }
+    return [canonical.get(url) for url in urls]
+
+
+def get_items_by_link_queryset(link: str) -> QuerySet[Item]:
+    url = normalize_link(link)
+    if url is None:
+        raise BadRequest
+    return Item.filter(
+        canonical__url=url,
+        is_private=False
+    ).select_related('author')
+
+
 async def update_item(item: Item, data: dict) -> Item:
-    if data.get('media', None):
-        data['media'] = get_media_from_base64_list(data.get('media'))
+    media = None
+    if 'media' in data or 'media_ids' in data:
+        media = await get_item_media(
+            data.pop('media', None),
+            data.pop('media_ids', None)
+        )
     try:
+        item_type, is_private = item.item_type, item.is_private
         item.update_from_dict(data)
+        if 'link' in data:
+            item.canonical, = await get_canonical_links([item.link])
         await item.save()
+        update_item_facets(item_type, is_private, -1)
+        update_item_facets(item.item_type, item.is_private, 1)
+        if media is not None:
+            item_media = get_item_media_rows(item, media)
+            async with in_transaction() as connection:
+                old_media = await ItemMedia.filter(
+                    item=item
+                ).using_db(connection).values_list('media_id', flat=True)
+                await ItemMedia.filter(
+                    item=item
+                ).using_db(connection).delete()
+                if item_media:
+                    await ItemMedia.bulk_create(
+                        item_media,
+                        using_db=connection
+                    )
+            await release_media(old_media)
+            await acquire_media([entry.media_id for entry in item_media])
         return item
     except Exception as ex:
         print(ex)
@@ -91,8 +333,40 @@ async def bulk_create_items(
     moodboard: Moodboard,
     items: list[CreateItem],
 ) -> list[Item]:
-    return [
-        await create_item(user, item, moodboard) for item in items]
+    media = await get_items_media(items)
+    async with in_transaction() as connection:
+        canonical = await get_canonical_links(
+            [item.link for item in items], connection
+        )
+        created_items = await bulk_insert_returning([
+            Item(
+                name=item.name,
+                item_type=item.item_type,
+                description=item.description,
+                link=item.link,
+                canonical=canonical_link,
+                is_private=item.is_private,
+                author=user,
+            ) for item, canonical_link in zip(items, canonical)
+        ], connection)
+        await ItemMoodboard.bulk_create([
+            ItemMoodboard(item=item, moodboard=moodboard)
+            for item in created_items
+        ], using_db=connection)
+        item_media = [
+            entry
+            for item, item_media in zip(created_items, media)
+            for entry in get_item_media_rows(item, item_media)
+        ]
+        if item_media:
+            await ItemMedia.bulk_create(item_media, using_db=connection)
+            await acquire_media(
+                [entry.media_id for entry in item_media],
+                connection
+            )
+    for item in created_items:
+        update_item_facets(item.item_type, item.is_private, 1)
+    return await prefetch_item_media(created_items)
 
 
 async def delete_item_from_moodboard(
@@ -101,20 +375,14 @@ async def delete_item_from_moodboard(
     item_id: int,
     delete_item: bool = False,
 ) -> None:
-    moodboard_items_ids = await ItemMoodboard.all(
-    ).filter(
-        moodboard=moodboard
-    ).values_list('item_id', flat=True)
-
-    if item_id not in moodboard_items_ids:
+    async with in_transaction() as connection:
+        removed, _, facets = await remove_items(
+            connection, user, [item_id], moodboard.id, delete_item
+        )
+    if not removed:
         raise NotFound
-
-    await ItemMoodboard.filter(
-        moodboard=moodboard,
-        item_id=item_id
-    ).delete()
-    if delete_item:
-        pass
+    for item_type, is_private in facets:
+        update_item_facets(item_type, is_private, -1)
 
 
 async def get_item_check_authorization(user: User, item_id: int) -> Item:
@@ -125,43 +393,66 @@ async def get_item_check_authorization(user: User, item_id: int) -> Item:
 
 
 async def get_random_item(item_type: str | None = None) -> Item:
-    if not item_type:
-        return await Item.filter(
-            is_private=False
-        ).select_related(
-            'author'
-        ).annotate(
-            order=Random()
-        ).order_by(
-            'order'
-        ).first()
-
-    if item_type not in ITEM_TYPES.keys():
+    if item_type and item_type not in ITEM_TYPES.keys():
         raise NotFound
 
-    return await Item.filter(
+    queryset = Item.filter(
         is_private=False
-    ).filter(
-        item_type=item_type
     ).select_related(
         'author'
-    ).annotate(
+    ).prefetch_related(
+        'item_media__media'
+    )
+    if item_type:
+        queryset = queryset.filter(item_type=item_type)
+
+    item = await item_pool.get(
+        lambda id: queryset.get_or_none(id=id),
+        item_type
+    )
+    if item:
+        return item
+    return await queryset.annotate(
         order=Random()
     ).order_by(
         'order'
     ).first()
 
 
+def update_item_facets(item_type: str, is_private: bool, delta: int) -> None:
+    if not is_private:
+        facet_cache.add(item_type, delta)
+
+
+async def count_item_types(search: str | None = None) -> dict[str, int]:
+    items = Item.filter(is_private=False)
+    if search:
+        items = search_queryset(items, search, ranked=False)
+    return dict(await items.group_by(
+        'item_type'
+    ).annotate(
+        count=Count('id')
+    ).values_list('item_type', 'count'))
+
+
+async def get_item_facets(search: str | None = None) -> dict[str, int]:
+    if search:
+        counts = await count_item_types(search)
+    else:
+        counts = await facet_cache.get(count_item_types)
+    return {item_type: counts.get(item_type, 0) for item_type in ITEM_TYPES}
+
+
 def get_all_items(
     search: str | None = None,
-    item_type: str | None = None
+    item_type: str | None = None,
+    headline: bool = False
 ) -> list[Item]:
     items = Item.filter(
         is_private=False
     ).select_related('author')
     if search:
-        items = items.filter(
-            Q(name__icontains=search) | Q(description__icontains=search))
+        items = search_queryset(items, search, headline)
 
     if not item_type:
         return items
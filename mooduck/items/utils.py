@@ -1,17 +1,88 @@
-from items.models import Item
-from items.schemas import GetItem
+from collections import defaultdict
+from datetime import datetime
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import re
+
+from config import LINK_TRACKING_PARAMS
+from items.models import Item, ItemMedia
+from items.schemas import GetItem, CreateItem
 from users.schemas import UserGet
-from extra.utils import save_image_from_base64
+from users.utils import get_author_record_response
+from storage.models import Media
+from storage.services import get_media_by_ids, save_media_list_from_base64
+from storage.utils import get_media_sets, get_stored_media_url
+from extra.utils import get_media_url
+
+
+class ItemRecord(NamedTuple):
+    id: int
+    name: str
+    description: str | None
+    item_type: str
+    link: str | None
+    is_private: bool
+    created_at: datetime
+    author__id: int
+    author__username: str
+    author__email: str
+    author__name: str | None
+    author__role: str
+    author__bio: str | None
+
+
+def normalize_link(link: str | None) -> str | None:
+    if not link or not link.strip():
+        return None
+    link = link.strip()
+    if '://' not in link:
+        link = f'https://{link}'
+    try:
+        parts = urlsplit(link)
+        port = parts.port
+    except ValueError:
+        return None
+    host = (parts.hostname or '').rstrip('.').removeprefix('www.')
+    if not host:
+        return None
+    if port not in (None, 80, 443):
+        host = f'{host}:{port}'
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(LINK_TRACKING_PARAMS)
+    ))
+    path = re.sub('/{2,}', '/', parts.path).rstrip('/')
+    # http and https point at the same resource for deduplication purposes
+    url = urlunsplit(('https', host, path, query, ''))
+    return url if len(url) <= 1024 else None
+
+
+def get_item_media_url(item_media: ItemMedia) -> str | None:
+    if item_media.media:
+        return get_media_url(item_media.media.filename)
+    return item_media.url
+
+
+def get_item_media_entries(
+    item: Item
+) -> list[tuple[str | None, int | None]]:
+    return [
+        (
+            get_item_media_url(item_media),
+            item_media.media.width if item_media.media else None
+        )
+        for item_media in sorted(
+            item.item_media,
+            key=lambda item_media: item_media.position
+        )
+    ]
 
 
 def get_item_response(
     item: Item
 ) -> GetItem:
-    media = item.media
-    if not media:
-        media = []
-    else:
-        media = media.split()
+    media = get_item_media_entries(item)
     return GetItem(
         id=item.id,
         author=UserGet.model_validate(item.author),
@@ -20,18 +91,107 @@ def get_item_response(
         item_type=item.item_type,
         link=item.link,
         is_private=item.is_private,
-        media=media,
+        media=[url for url, _ in media],
+        media_srcset=get_media_sets(media),
         created_at=item.created_at
     )
 
 
+def get_item_record_response(record: ItemRecord) -> GetItem:
+    return GetItem.model_construct(
+        id=record.id,
+        author=get_author_record_response(record),
+        name=record.name,
+        description=record.description,
+        item_type=record.item_type,
+        link=record.link,
+        is_private=record.is_private,
+        media=[],
+        media_srcset=[],
+        created_at=record.created_at,
+        headline=getattr(record, 'search_headline', None)
+    )
+
+
 def get_item_list_response(
     items: list[Item]
 ) -> list[GetItem]:
     return [get_item_response(item) for item in items]
 
 
-def get_media_from_base64_list(images: list[str] | None) -> str:
-    if not images:
-        return ''
-    return ' '.join([save_image_from_base64(image) for image in images])
+async def prefetch_item_media(items: list[Item]) -> list[Item]:
+    if items:
+        await Item.fetch_for_list(items, 'item_media__media')
+    return items
+
+
+async def get_item_media_map(
+    item_ids: list[int]
+) -> dict[int, list[tuple[str | None, int | None]]]:
+    media = defaultdict(list)
+    if not item_ids:
+        return media
+    for item_id, hash, ext, width, url in await ItemMedia.filter(
+        item_id__in=item_ids
+    ).order_by(
+        'item_id', 'position'
+    ).values_list(
+        'item_id', 'media__hash', 'media__ext', 'media__width', 'url'
+    ):
+        media[item_id].append((get_stored_media_url(hash, ext, url), width))
+    return media
+
+
+async def fill_items_media(items: list[GetItem]) -> list[GetItem]:
+    media = await get_item_media_map([item.id for item in items])
+    for item in items:
+        item.media = [url for url, _ in media[item.id]]
+        item.media_srcset = get_media_sets(media[item.id])
+    return items
+
+
+def get_item_media_rows(item: Item, media: list[Media]) -> list[ItemMedia]:
+    return [
+        ItemMedia(
+            item=item,
+            position=position,
+            media=entry,
+            hash=entry.hash,
+            mime_type=entry.mime_type,
+            size=entry.size,
+            width=entry.width,
+            height=entry.height,
+        )
+        for position, entry in enumerate(media)
+    ]
+
+
+async def get_item_media(
+    images: list[str] | None,
+    media_ids: list[int] | None
+) -> list[Media]:
+    return [
+        *filter(None, await save_media_list_from_base64(images or [])),
+        *await get_media_by_ids(media_ids)
+    ]
+
+
+async def get_items_media(items: list[CreateItem]) -> list[list[Media]]:
+    saved = await save_media_list_from_base64(
+        [image for item in items for image in item.media or []]
+    )
+    existing = {
+        entry.id: entry for entry in await get_media_by_ids(
+            [id for item in items for id in item.media_ids or []]
+        )
+    }
+    media = []
+    position = 0
+    for item in items:
+        count = len(item.media or [])
+        media.append([
+            *filter(None, saved[position:position + count]),
+            *[existing[id] for id in item.media_ids or []]
+        ])
+        position += count
+    return media
@@ -1,15 +1,35 @@
 from fastapi import FastAPI
 from tortoise.contrib.fastapi import register_tortoise
 
+from config import LIKE_WRITE_BEHIND, TRENDING_JOB
 from db.db import TORTOISE_ORM
 from users.routers import router as users_router
 from moodboards.routers import router as moodboards_router
+from storage.routers import router as storage_router
+from storage.backends import media_storage
+from extra.passwords import password_hasher
+from reactions.services import like_buffer
+from moodboards.trending import trending_task
+from moodboards.services import moodboard_pool
+from items.services import item_pool
 
 
 app = FastAPI()
 
 app.include_router(users_router)
 app.include_router(moodboards_router)
+app.include_router(storage_router)
+app.add_event_handler('shutdown', media_storage.close)
+app.add_event_handler('shutdown', password_hasher.shutdown)
+for pool in (item_pool, moodboard_pool):
+    app.add_event_handler('startup', pool.start)
+    app.add_event_handler('shutdown', pool.stop)
+if LIKE_WRITE_BEHIND:
+    app.add_event_handler('startup', like_buffer.start)
+    app.add_event_handler('shutdown', like_buffer.stop)
+if TRENDING_JOB:
+    app.add_event_handler('startup', trending_task.start)
+    app.add_event_handler('shutdown', trending_task.stop)
 
 
 register_tortoise(
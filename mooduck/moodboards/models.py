@@ -6,20 +6,20 @@ class Moodboard(Model):
     author = fields.ForeignKeyField('models.User', related_name='moodboard')
     name = fields.CharField(max_length=512)
     description = fields.TextField(null=True)
+    # only kept for legacy external covers
     cover = fields.CharField(max_length=1024, null=True)
+    cover_media = fields.ForeignKeyField(
+        'models.Media',
+        related_name='moodboard_covers',
+        null=True,
+        index=True,
+        on_delete=fields.RESTRICT
+    )
     is_private = fields.BooleanField(default=False)
     is_chaotic = fields.BooleanField(default=False)
     created_at = fields.DatetimeField(auto_now_add=True)
     likes = fields.IntField(default=0)
 
-    async def add_like(self):
-        self.likes += 1
-        await self.save()
-
-    async def remove_like(self):
-        self.likes -= 1
-        await self.save()
-
     class Meta:
         ordering = ['-created_at', 'name']
 
@@ -34,3 +34,36 @@ class FavMoodboard(Model):
         'models.Moodboard',
         related_name='fav_moodboard'
     )
+    created_at = fields.DatetimeField(auto_now_add=True, index=True)
+
+
+class MoodboardScore(Model):
+    id = fields.BigIntField(pk=True)
+    moodboard = fields.OneToOneField(
+        'models.Moodboard',
+        related_name='score',
+        on_delete=fields.CASCADE
+    )
+    score = fields.FloatField(default=0)
+
+    class Meta:
+        # created as (score DESC, moodboard_id DESC) by the migration
+        indexes = (('score', 'moodboard_id'),)
+
+
+class ReactionRemoval(Model):
+    id = fields.BigIntField(pk=True)
+    moodboard = fields.ForeignKeyField(
+        'models.Moodboard',
+        related_name='reaction_removal',
+        on_delete=fields.CASCADE
+    )
+    weight = fields.FloatField()
+    created_at = fields.DatetimeField(index=True)
+    removed_at = fields.DatetimeField(auto_now_add=True, index=True)
+
+
+class TrendingState(Model):
+    id = fields.IntField(pk=True)
+    landmark = fields.DatetimeField()
+    watermark = fields.DatetimeField()
@@ -8,6 +8,7 @@ from fastapi import (
     Query,
 )
 
+from config import MEDIA_REQUEST_BODY_SIZE
 from users.models import User
 from moodboards.models import Moodboard
 from moodboards.schemas import (
@@ -30,48 +31,69 @@ from moodboards.services import (
     get_user_moodboards,
     get_user_subs_moodboards,
     get_random_moodboard,
-    get_moodboards
+    get_moodboards,
+    get_trending_moodboards,
+    fill_moodboards_flags,
+    fill_moodboards_headlines
+)
+from moodboards.utils import (
+    get_moodboard_response,
+    get_moodboard_record_response,
+    get_trending_record_response,
+    MoodboardRecord,
+    TrendingMoodboardRecord
 )
-from moodboards.utils import get_moodboard_response
 from moodboards.dependencies import is_moodboard_author
 from extra.dependencies import is_authenticated, pagination
+from extra.routing import LimitedRoute, max_body_size
+from extra.search import get_search_record
 from extra.services import create_instance_by_kwargs, get_instance_or_404
-from extra.utils import save_image_from_base64
 from reactions.routers import router as reactions_router
 from reactions.services import get_moodboard_comments
 from items.routers import router as items_router
 from items.services import bulk_create_items, add_existing_items_to_moodboard
+from storage.services import (
+    get_media_by_id,
+    save_media_from_base64,
+    acquire_media,
+)
 
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedRoute)
 router.include_router(reactions_router)
 router.include_router(items_router)
 
 
 # MOODBOARD
 @router.post('/moodboard')
+@max_body_size(MEDIA_REQUEST_BODY_SIZE)
 async def create_moodboard(
     user: Annotated[User, Depends(is_authenticated)],
     data: CreateMoodboard
 ) -> GetMoodboard:
+    cover = await save_media_from_base64(data.cover)
+    if data.cover_id:
+        cover = await get_media_by_id(data.cover_id)
     moodboard: Moodboard = await create_instance_by_kwargs(
         Moodboard,
         author=user,
         name=data.name,
         description=data.description,
-        cover=save_image_from_base64(data.cover),
+        cover_media=cover,
         is_private=data.is_private,
     )
+    await acquire_media([moodboard.cover_media_id])
     items = []
     if data.items:
         items: list = await bulk_create_items(user, moodboard, data.items)
     if data.existing_items:
         existing_items = await add_existing_items_to_moodboard(
+            user,
             data.existing_items,
             moodboard
         )
         items.extend(existing_items)
-    return get_moodboard_response(moodboard, items, [],)
+    return get_moodboard_response(moodboard, items, None, [])
 
 
 @router.get('/moodboard/{moodboard_id}')
@@ -79,13 +101,16 @@ async def retrieve_moodboard(
     moodboard_id: int,
     user: Annotated[User, Depends(is_authenticated)]
 ) -> GetMoodboard:
-    moodboard, items, comments = await get_moodboard_with_items_and_comments(
-        moodboard_id,
-        user
-    )
+    (
+        moodboard,
+        items,
+        items_next_cursor,
+        comments
+    ) = await get_moodboard_with_items_and_comments(moodboard_id, user)
     return get_moodboard_response(
         moodboard,
         items,
+        items_next_cursor,
         comments,
         await user.is_moodboard_liked(moodboard_id),
         await user.is_moodboard_in_fav(moodboard_id)
@@ -106,6 +131,7 @@ async def delete_moodboard(
 
 
 @router.patch('/moodboard/{moodboard_id}')
+@max_body_size(MEDIA_REQUEST_BODY_SIZE)
 async def patch_moodboard(
     moodboard_id: int,
     user_moodboard: Annotated[
@@ -117,9 +143,11 @@ async def patch_moodboard(
     user, moodboard = user_moodboard
     data = data.model_dump(exclude_none=True)
     moodboard = await update_moodboard(moodboard, data)
+    items, items_next_cursor = await get_moodboard_items(moodboard)
     return get_moodboard_response(
         moodboard,
-        await get_moodboard_items(moodboard),
+        items,
+        items_next_cursor,
         await get_moodboard_comments(moodboard),
         await user.is_moodboard_liked(moodboard_id),
         await user.is_moodboard_in_fav(moodboard_id)
@@ -131,9 +159,11 @@ async def retrieve_random_moodboard(
     user: Annotated[User, Depends(is_authenticated)],
 ) -> GetMoodboard:
     moodboard = await get_random_moodboard()
+    items, items_next_cursor = await get_moodboard_items(moodboard)
     return get_moodboard_response(
         moodboard,
-        await get_moodboard_items(moodboard),
+        items,
+        items_next_cursor,
         await get_moodboard_comments(moodboard),
         await user.is_moodboard_liked(moodboard.id),
         await user.is_moodboard_in_fav(moodboard.id),
@@ -148,16 +178,35 @@ async def list_moodboards(
     period_from: int = 30,
     period_to: int = 0,
     sort: Annotated[
-        str, Query(pattern=r'^(created_at|likes)$')
+        str, Query(pattern=r'^(created_at|likes|trending)$')
     ] = 'created_at',
+    headline: bool = False,
 ) -> PaginatedMoodboard:
-    queryset = get_moodboards(
-        search=search,
-        sort=sort,
-        period_from=period_from,
-        period_to=period_to
-    )
-    return await paginator(queryset, ListMoodboard)
+    if sort == 'trending':
+        page = await paginator(
+            get_trending_moodboards(search),
+            ListMoodboard,
+            get_trending_record_response,
+            TrendingMoodboardRecord
+        )
+        if search and headline:
+            await fill_moodboards_headlines(page.items, search)
+    else:
+        queryset = get_moodboards(
+            search=search,
+            sort=sort,
+            period_from=period_from,
+            period_to=period_to,
+            headline=headline
+        )
+        page = await paginator(
+            queryset,
+            ListMoodboard,
+            get_moodboard_record_response,
+            get_search_record(queryset, MoodboardRecord)
+        )
+    await fill_moodboards_flags(user, page.items)
+    return page
 
 
 @router.get('/user/me/moodboard')
@@ -165,7 +214,14 @@ async def retrieve_self_moodboards(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination)
 ) -> PaginatedMoodboard:
-    return await paginator(get_user_moodboards(user, True), ListMoodboard)
+    page = await paginator(
+        get_user_moodboards(user, True),
+        ListMoodboard,
+        get_moodboard_record_response,
+        MoodboardRecord
+    )
+    await fill_moodboards_flags(user, page.items)
+    return page
 
 
 @router.get('/user/{user_id}/moodboard')
@@ -174,10 +230,14 @@ async def list_user_moodboards(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination)
 ) -> PaginatedMoodboard:
-    return await paginator(
+    page = await paginator(
         get_user_moodboards(await get_instance_or_404(User, id=user_id)),
-        ListMoodboard
+        ListMoodboard,
+        get_moodboard_record_response,
+        MoodboardRecord
     )
+    await fill_moodboards_flags(user, page.items)
+    return page
 
 
 # FAV
@@ -186,7 +246,14 @@ async def list_fav_moodboard(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination)
 ) -> PaginatedMoodboard:
-    return await paginator(get_user_fav_moodboards(user), ListMoodboard)
+    page = await paginator(
+        get_user_fav_moodboards(user),
+        ListMoodboard,
+        get_moodboard_record_response,
+        MoodboardRecord
+    )
+    await fill_moodboards_flags(user, page.items)
+    return page
 
 
 @router.post('/moodboard/{moodboard_id}/fav')
@@ -210,7 +277,14 @@ async def get_subs_moodboards(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination)
 ) -> PaginatedMoodboard:
-    return await paginator(await get_user_subs_moodboards(user), ListMoodboard)
+    page = await paginator(
+        await get_user_subs_moodboards(user),
+        ListMoodboard,
+        get_moodboard_record_response,
+        MoodboardRecord
+    )
+    await fill_moodboards_flags(user, page.items)
+    return page
 
 
 # CHAOTIC
@@ -219,8 +293,10 @@ async def retrive_chaotic(
     user: Annotated[User, Depends(is_authenticated)]
 ) -> GetChaotic:
     moodboard = await get_chaotic(user)
+    items, items_next_cursor = await get_moodboard_items(moodboard)
     return get_moodboard_response(
         moodboard,
-        await get_moodboard_items(moodboard),
+        items,
+        items_next_cursor,
         await get_moodboard_comments(moodboard),
     )
@@ -1,20 +1,20 @@
 from datetime import datetime
-from typing import Annotated
 
 from pydantic import BaseModel
-from fastapi import Query
 
-from config import BASE64_PATTERN
 from users.schemas import UserGet
 from reactions.schemas import GetComment
 from items.schemas import CreateItem, GetItem
 from extra.schemas import Pagination
+from storage.schemas import MediaSet
+from storage.validators import Base64Image
 
 
 class CreateMoodboard(BaseModel):
     name: str
     description: str | None = None
-    cover: Annotated[str | None, Query(pattern=BASE64_PATTERN)] = None
+    cover: Base64Image | None = None
+    cover_id: int | None = None
     is_private: bool = False
     existing_items: list[int] | None = None
     items: list[CreateItem] | None = None
@@ -24,7 +24,8 @@ class CreateMoodboard(BaseModel):
 class PatchMoodboard(BaseModel):
     name: str | None = None
     description: str | None = None
-    cover: Annotated[str | None, Query(pattern=BASE64_PATTERN)] = None
+    cover: Base64Image | None = None
+    cover_id: int | None = None
     is_private: bool | None = None
 
 
@@ -34,6 +35,7 @@ class GetMoodboard(BaseModel):
     name: str
     description: str | None = None
     cover: str | None = None
+    cover_srcset: MediaSet | None = None
     is_private: bool
     is_chaotic: bool
     created_at: datetime
@@ -42,6 +44,7 @@ class GetMoodboard(BaseModel):
     is_in_favorite: bool = False
     comments: list[GetComment] | None = None
     items: list[GetItem] | None = None
+    items_next_cursor: str | None = None
 
 
 class ListMoodboard(BaseModel):
@@ -50,10 +53,14 @@ class ListMoodboard(BaseModel):
     name: str
     description: str | None = None
     cover: str | None = None
+    cover_srcset: MediaSet | None = None
     created_at: datetime
     is_private: bool
     is_chaotic: bool
     likes: int = 0
+    is_liked: bool = False
+    is_in_favorite: bool = False
+    headline: str | None = None
 
     class Config:
         from_attributes = True
@@ -69,7 +76,9 @@ class GetChaotic(BaseModel):
     name: str
     description: str | None = None
     cover: str | None = None
+    cover_srcset: MediaSet | None = None
     is_private: bool
     is_chaotic: bool
     created_at: datetime
     items: list[GetItem] | None = None
+    items_next_cursor: str | None = None
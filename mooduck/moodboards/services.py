@@ -1,29 +1,48 @@
 from datetime import datetime, timedelta
 
-from tortoise.expressions import Q
+from tortoise import Tortoise
 from tortoise.contrib.postgres.functions import Random
+from tortoise.expressions import Subquery
 from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
 from users.models import User
 from moodboards.models import (
     Moodboard,
+    MoodboardScore,
     FavMoodboard
 )
-from extra.services import get_instance_or_404
+from moodboards.schemas import ListMoodboard
+from moodboards.trending import record_reaction_removal
+from extra.sampling import RandomPool
+from extra.search import search_queryset
+from extra.services import (
+    execute_sql,
+    get_sql_placeholders,
+)
 from extra.exceptions import UnAuthorized, NotFound, BadRequest
-from extra.utils import save_image_from_base64
 from reactions.models import Comment
 from reactions.services import get_moodboard_comments
 from items.services import get_moodboard_items
 from items.models import Item
+from storage.services import (
+    get_media_by_id,
+    save_media_from_base64,
+    acquire_media,
+    release_media,
+)
 from moodboards.exceptions import AlreadyInFavorite, CantDeleteChaotic
 
 
+moodboard_pool = RandomPool(Moodboard)
+
+
 # MOODBOARD
 async def get_moodboard(id: int) -> Moodboard:
     moodboard = await Moodboard.all(
     ).select_related(
-        'author'
+        'author',
+        'cover_media'
     ).get_or_none(id=id)
 
     if not moodboard:
@@ -58,7 +77,8 @@ def get_user_moodboards(
 async def get_chaotic(user: User) -> Moodboard:
     moodboard = await Moodboard.all(
     ).select_related(
-        'author'
+        'author',
+        'cover_media'
     ).get_or_none(author=user, is_chaotic=True)
 
     if not moodboard:
@@ -71,6 +91,7 @@ async def delete_moodboard(moodboard: Moodboard) -> None:
         raise CantDeleteChaotic
     try:
         await moodboard.delete()
+        await release_media([moodboard.cover_media_id])
     except Exception as ex:
         print(ex)
     finally:
@@ -79,10 +100,18 @@ async def delete_moodboard(moodboard: Moodboard) -> None:
 
 async def update_moodboard(moodboard: Moodboard, data: dict) -> Moodboard:
     if data.get('cover', None):
-        data['cover'] = save_image_from_base64(data.get('cover', None))
+        data['cover_media'] = await save_media_from_base64(data.pop('cover'))
+    if data.get('cover_id', None):
+        data['cover_media'] = await get_media_by_id(data.pop('cover_id'))
+    if 'cover_media' in data:
+        data['cover'] = None
+    old_cover = moodboard.cover_media_id
     try:
         moodboard.update_from_dict(data)
         await moodboard.save()
+        if 'cover_media' in data:
+            await release_media([old_cover])
+            await acquire_media([moodboard.cover_media_id])
         return moodboard
     except Exception as ex:
         print(ex)
@@ -119,12 +148,51 @@ async def add_moodboard_to_favorite(user: User, moodboard_id: int) -> None:
 
 
 async def remove_moodboard_from_fav(user: User, moodboard_id: int) -> None:
-    instance = await get_instance_or_404(
-        FavMoodboard,
-        user=user,
-        moodboard_id=moodboard_id
+    async with in_transaction() as connection:
+        instance = await FavMoodboard.filter(
+            user=user,
+            moodboard_id=moodboard_id
+        ).using_db(connection).select_for_update().first()
+        if instance:
+            await instance.delete(using_db=connection)
+            await record_reaction_removal(connection, instance)
+    if not instance:
+        raise NotFound
+
+
+async def get_moodboard_flags(
+    user: User,
+    moodboard_ids: list[int]
+) -> tuple[set[int], set[int]]:
+    if not moodboard_ids:
+        return set(), set()
+    placeholders = get_sql_placeholders(len(moodboard_ids), 2)
+    rows = await execute_sql(
+        Tortoise.get_connection('default'),
+        'SELECT "moodboard_id", FALSE AS "is_fav" FROM "like" '
+        f'WHERE "author_id" = $1 AND "moodboard_id" IN ({placeholders}) '
+        'UNION ALL '
+        'SELECT "moodboard_id", TRUE AS "is_fav" FROM "favmoodboard" '
+        f'WHERE "user_id" = $1 AND "moodboard_id" IN ({placeholders})',
+        [user.id, *moodboard_ids]
     )
-    await instance.all().delete()
+    liked, favorite = set(), set()
+    for row in rows:
+        (favorite if row['is_fav'] else liked).add(row['moodboard_id'])
+    return liked, favorite
+
+
+async def fill_moodboards_flags(
+    user: User,
+    moodboards: list[ListMoodboard]
+) -> list[ListMoodboard]:
+    liked, favorite = await get_moodboard_flags(
+        user, [moodboard.id for moodboard in moodboards]
+    )
+    for moodboard in moodboards:
+        moodboard.is_liked = moodboard.id in liked
+        moodboard.is_in_favorite = moodboard.id in favorite
+    return moodboards
 
 
 async def get_user_subs_moodboards(user: User) -> QuerySet[Moodboard]:
@@ -149,26 +217,33 @@ async def get_user_subs_moodboards(user: User) -> QuerySet[Moodboard]:
 async def get_moodboard_with_items_and_comments(
     id: int,
     user: User
-) -> tuple[Moodboard, list[Item], list[Comment]]:
+) -> tuple[Moodboard, list[Item], str | None, list[Comment]]:
     moodboard = await get_moodboard(id)
     if moodboard.is_private and moodboard.author != user:
         raise UnAuthorized
     return (
         moodboard,
-        await get_moodboard_items(moodboard),
+        *await get_moodboard_items(moodboard),
         await get_moodboard_comments(moodboard))
 
 
 async def get_random_moodboard() -> Moodboard:
-    return await Moodboard.filter(
+    queryset = Moodboard.filter(
         is_private=False
-    ).annotate(
+    ).select_related(
+        'author',
+        'cover_media'
+    )
+    moodboard = await moodboard_pool.get(
+        lambda id: queryset.get_or_none(id=id)
+    )
+    if moodboard:
+        return moodboard
+    return await queryset.annotate(
         order=Random()
     ).order_by(
         'order'
-    ).first(
-    ).select_related(
-        'author')
+    ).first()
 
 
 def get_moodboards(
@@ -176,8 +251,11 @@ def get_moodboards(
     sort: str = 'created_at',
     period_from: int = 30,
     period_to: int = 0,
+    headline: bool = False,
 ) -> QuerySet[Moodboard]:
-    period_to = datetime.now() - timedelta(days=period_to)
+    # rounded up to the minute so repeated requests build the same query
+    now = datetime.now().replace(second=0, microsecond=0)
+    period_to = now + timedelta(minutes=1) - timedelta(days=period_to)
     period_from = period_to - timedelta(days=period_from)
 
     base_query = Moodboard.all(
@@ -191,7 +269,43 @@ def get_moodboards(
         '-created_at'
     )
     if search:
-        base_query = base_query.filter(
-            Q(name__icontains=search) | Q(description__icontains=search)
-        )
+        base_query = search_queryset(base_query, search, headline)
     return base_query
+
+
+async def fill_moodboards_headlines(
+    moodboards: list[ListMoodboard],
+    search: str
+) -> list[ListMoodboard]:
+    # trending pages come from the score table, so headlines are looked
+    # up for the page rows only instead of through the search subquery
+    if not moodboards:
+        return moodboards
+    queryset = search_queryset(
+        Moodboard.filter(id__in=[moodboard.id for moodboard in moodboards]),
+        search,
+        headline=True,
+        ranked=False
+    )
+    if 'search_headline' not in queryset._annotations:
+        return moodboards
+    headlines = dict(await queryset.values_list('id', 'search_headline'))
+    for moodboard in moodboards:
+        moodboard.headline = headlines.get(moodboard.id)
+    return moodboards
+
+
+def get_trending_moodboards(search: str | None) -> QuerySet[MoodboardScore]:
+    # read in (score, moodboard_id) index order; decayed scores already
+    # age boards out, so no period is applied
+    queryset = MoodboardScore.filter(
+        score__gt=0,
+        moodboard__is_private=False
+    ).select_related(
+        'moodboard__author'
+    ).order_by('-score', '-moodboard_id')
+    if search:
+        queryset = queryset.filter(moodboard_id__in=Subquery(search_queryset(
+            Moodboard.all(), search, ranked=False
+        ).values('id')))
+    return queryset
@@ -0,0 +1,165 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from tortoise import Tortoise, Model, run_async, timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from config import (
+    SQL_MAX_PARAMETERS,
+    TRENDING_REFRESH,
+    TRENDING_SETTLE_MARGIN,
+    TRENDING_HALF_LIFE,
+    TRENDING_RESCALE_AFTER,
+    TRENDING_MIN_SCORE,
+    TRENDING_LIKE_WEIGHT,
+    TRENDING_COMMENT_WEIGHT,
+    TRENDING_FAVORITE_WEIGHT,
+)
+from db.db import TORTOISE_ORM
+from moodboards.models import (
+    FavMoodboard,
+    MoodboardScore,
+    ReactionRemoval,
+    TrendingState,
+)
+from reactions.models import Comment, Like
+from extra.services import execute_sql, get_sql_placeholders
+from extra.tasks import PeriodicTask
+
+
+# Scores use forward decay: a reaction is weighted by
+# 2 ** ((created_at - landmark) / half_life), so its contribution never
+# changes and the order of stored scores matches the decayed order.
+# Each refresh counts reactions created in [watermark, now - margin) once
+# and takes back reactions removed in that interval, see ReactionRemoval.
+TRENDING_WEIGHTS: dict[type[Model], float] = {
+    Like: TRENDING_LIKE_WEIGHT,
+    Comment: TRENDING_COMMENT_WEIGHT,
+    FavMoodboard: TRENDING_FAVORITE_WEIGHT,
+}
+
+
+async def record_reaction_removal(
+    connection: BaseDBAsyncClient,
+    reaction: Like | Comment | FavMoodboard
+) -> None:
+    await ReactionRemoval.create(
+        moodboard_id=reaction.moodboard_id,
+        weight=TRENDING_WEIGHTS[type(reaction)],
+        created_at=reaction.created_at,
+        using_db=connection
+    )
+
+
+async def rescale_trending_scores(
+    connection: BaseDBAsyncClient,
+    factor: float
+) -> None:
+    await MoodboardScore.all().using_db(connection).update(
+        score=F('score') * factor
+    )
+    await MoodboardScore.filter(
+        score__lt=TRENDING_MIN_SCORE
+    ).using_db(connection).delete()
+
+
+async def add_trending_scores(
+    connection: BaseDBAsyncClient,
+    scores: dict[int, float]
+) -> None:
+    rows = list(scores.items())
+    batch_size = SQL_MAX_PARAMETERS // 2
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        await execute_sql(
+            connection,
+            'INSERT INTO "moodboardscore" ("moodboard_id", "score") VALUES '
+            + ', '.join(
+                f'({get_sql_placeholders(2, index * 2 + 1)})'
+                for index in range(len(batch))
+            )
+            + ' ON CONFLICT ("moodboard_id") DO UPDATE '
+            'SET "score" = "moodboardscore"."score" + EXCLUDED."score"',
+            [value for row in batch for value in row]
+        )
+
+
+async def get_interval_scores(
+    connection: BaseDBAsyncClient,
+    landmark: datetime,
+    start: datetime,
+    end: datetime
+) -> Counter:
+    scores = Counter()
+
+    def add(moodboard_id: int, created_at: datetime, weight: float):
+        elapsed = (created_at - landmark).total_seconds()
+        scores[moodboard_id] += weight * 2 ** (elapsed / TRENDING_HALF_LIFE)
+
+    for model, weight in TRENDING_WEIGHTS.items():
+        for moodboard_id, created_at in await model.filter(
+            created_at__gte=start,
+            created_at__lt=end
+        ).using_db(connection).values_list('moodboard_id', 'created_at'):
+            add(moodboard_id, created_at, weight)
+    # A reaction removed before its interval was counted is still counted
+    # here, so that taking back every removal keeps the sum exact.
+    for moodboard_id, created_at, weight in await ReactionRemoval.filter(
+        created_at__gte=start,
+        created_at__lt=end
+    ).using_db(connection).values_list('moodboard_id', 'created_at', 'weight'):
+        add(moodboard_id, created_at, weight)
+    for moodboard_id, created_at, weight in await ReactionRemoval.filter(
+        removed_at__gte=start,
+        removed_at__lt=end
+    ).using_db(connection).values_list('moodboard_id', 'created_at', 'weight'):
+        add(moodboard_id, created_at, -weight)
+    return scores
+
+
+async def refresh_trending_scores() -> int:
+    now = timezone.now()
+    end = now - timedelta(seconds=TRENDING_SETTLE_MARGIN)
+    async with in_transaction() as connection:
+        state = await TrendingState.select_for_update().using_db(
+            connection
+        ).get_or_none(id=1)
+        if state is None:
+            state = TrendingState(
+                id=1,
+                landmark=now,
+                watermark=now - timedelta(
+                    seconds=TRENDING_HALF_LIFE * TRENDING_RESCALE_AFTER
+                )
+            )
+        if end <= state.watermark:
+            return 0
+        elapsed = (now - state.landmark).total_seconds() / TRENDING_HALF_LIFE
+        if elapsed > TRENDING_RESCALE_AFTER:
+            await rescale_trending_scores(connection, 2 ** -elapsed)
+            state.landmark = now
+        scores = await get_interval_scores(
+            connection, state.landmark, state.watermark, end
+        )
+        await add_trending_scores(connection, scores)
+        await ReactionRemoval.filter(
+            removed_at__lt=end
+        ).using_db(connection).delete()
+        state.watermark = end
+        await state.save(using_db=connection)
+    return len(scores)
+
+
+trending_task = PeriodicTask(refresh_trending_scores, TRENDING_REFRESH)
+
+
+async def main():
+    await Tortoise.init(TORTOISE_ORM)
+    updated = await refresh_trending_scores()
+    print(f'Updated trending scores of {updated} moodboards')
+
+
+if __name__ == '__main__':
+    run_async(main())
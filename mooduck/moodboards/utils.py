@@ -1,30 +1,106 @@
+from datetime import datetime
+from typing import NamedTuple
+
 from moodboards.models import Moodboard
-from moodboards.schemas import GetMoodboard
+from moodboards.schemas import GetMoodboard, ListMoodboard
 from reactions.models import Comment
 from reactions.utils import get_comment_list_response
 from items.utils import get_item_list_response
 from items.models import Item
+from users.utils import get_author_record_response
+from storage.utils import get_media_set, get_stored_media_url
+from extra.utils import get_media_url
+
+
+class MoodboardRecord(NamedTuple):
+    id: int
+    name: str
+    description: str | None
+    cover: str | None
+    cover_media__hash: str | None
+    cover_media__ext: str | None
+    cover_media__width: int | None
+    created_at: datetime
+    is_private: bool
+    is_chaotic: bool
+    likes: int
+    author__id: int
+    author__username: str
+    author__email: str
+    author__name: str | None
+    author__role: str
+    author__bio: str | None
+
+
+TrendingMoodboardRecord = NamedTuple('TrendingMoodboardRecord', [
+    ('score', float),
+    ('moodboard_id', int),
+    *[
+        (f'moodboard__{name}', type_)
+        for name, type_ in list(MoodboardRecord.__annotations__.items())[1:]
+    ],
+])
+
+
+def get_moodboard_cover(moodboard: Moodboard) -> str | None:
+    if moodboard.cover_media:
+        return get_media_url(moodboard.cover_media.filename)
+    return moodboard.cover
 
 
 def get_moodboard_response(
     moodboard: Moodboard,
     items: list[Item],
+    items_next_cursor: str | None,
     comments: list[Comment],
     is_liked: bool = False,
     is_in_favorite: bool = False
 ) -> GetMoodboard:
+    cover = get_moodboard_cover(moodboard)
     return GetMoodboard(
         id=moodboard.id,
         author=moodboard.author,
         name=moodboard.name,
         description=moodboard.description,
-        cover=moodboard.cover,
+        cover=cover,
+        cover_srcset=get_media_set(
+            cover,
+            moodboard.cover_media.width if moodboard.cover_media else None
+        ),
         is_private=moodboard.is_private,
         is_chaotic=moodboard.is_chaotic,
         created_at=moodboard.created_at,
         items=get_item_list_response(items),
+        items_next_cursor=items_next_cursor,
         comments=get_comment_list_response(comments),
         likes=moodboard.likes,
         is_liked=is_liked,
         is_in_favorite=is_in_favorite
     )
+
+
+def get_moodboard_record_response(record: MoodboardRecord) -> ListMoodboard:
+    cover = get_stored_media_url(
+        record.cover_media__hash,
+        record.cover_media__ext,
+        record.cover
+    )
+    return ListMoodboard.model_construct(
+        id=record.id,
+        author=get_author_record_response(record),
+        name=record.name,
+        description=record.description,
+        cover=cover,
+        cover_srcset=get_media_set(cover, record.cover_media__width),
+        created_at=record.created_at,
+        is_private=record.is_private,
+        is_chaotic=record.is_chaotic,
+        likes=record.likes,
+        headline=getattr(record, 'search_headline', None),
+    )
+
+
+def get_trending_record_response(
+    record: TrendingMoodboardRecord
+) -> ListMoodboard:
+    return get_moodboard_record_response(MoodboardRecord._make(record[1:]))
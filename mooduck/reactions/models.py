@@ -17,7 +17,7 @@ class Comment(Model):
         null=True
     )
     text = fields.CharField(max_length=2048)
-    created_at = fields.DatetimeField(auto_now_add=True)
+    created_at = fields.DatetimeField(auto_now_add=True, index=True)
 
     class Meta:
         ordering = ('created_at',)
@@ -33,3 +33,7 @@ class Like(Model):
         'models.Moodboard',
         related_name='like'
     )
+    created_at = fields.DatetimeField(auto_now_add=True, index=True)
+
+    class Meta:
+        unique_together = (('author', 'moodboard'),)
@@ -0,0 +1,14 @@
+from tortoise import Tortoise, run_async
+
+from db.db import TORTOISE_ORM
+from reactions.services import reconcile_moodboard_likes
+
+
+async def main():
+    await Tortoise.init(TORTOISE_ORM)
+    updated = await reconcile_moodboard_likes()
+    print(f'Reconciled like counts of {updated} moodboards')
+
+
+if __name__ == '__main__':
+    run_async(main())
@@ -20,9 +20,10 @@ from reactions.utils import get_comment_list_response, get_comment_response
 from reactions.models import Comment
 from reactions.dependencies import is_comment_author
 from extra.dependencies import is_authenticated
+from extra.routing import LimitedRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedRoute)
 
 
 @router.post('/moodboard/{moodboard_id}/comment')
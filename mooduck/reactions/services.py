@@ -1,12 +1,28 @@
+from datetime import timedelta
+
+from tortoise import timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
 from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
+from config import (
+    LIKE_WRITE_BEHIND,
+    LIKE_FLUSH_INTERVAL,
+    LIKE_RECONCILE_QUIET,
+)
 from reactions.models import Comment, Like
 from moodboards.models import Moodboard
+from moodboards.trending import record_reaction_removal
 from users.models import User
-from extra.services import get_instance_or_404
+from extra.buffer import DeltaBuffer
+from extra.services import execute_sql
 from extra.exceptions import NotFound, BadRequest, AlreadyExists
 
 
+like_buffer = DeltaBuffer(Moodboard, 'likes', LIKE_FLUSH_INTERVAL)
+
+
 async def get_moodboard_comments(moodboard: Moodboard) -> list[Comment]:
     return await Comment.all(
     ).select_related(
@@ -60,28 +76,78 @@ async def update_comment(comment: Comment, text: str) -> Comment:
 
 
 async def delete_comment(comment: Comment) -> None:
-    await comment.delete()
+    async with in_transaction() as connection:
+        await comment.delete(using_db=connection)
+        await record_reaction_removal(connection, comment)
+
+
+async def update_moodboard_likes(
+    connection: BaseDBAsyncClient,
+    moodboard_id: int,
+    delta: int
+) -> None:
+    if LIKE_WRITE_BEHIND:
+        like_buffer.add(moodboard_id, delta)
+        return
+    await Moodboard.filter(
+        id=moodboard_id
+    ).using_db(connection).update(likes=F('likes') + delta)
 
 
 async def like_moodboard(user: User, moodboard_id: int):
-    moodboard: Moodboard = await get_instance_or_404(
-        Moodboard,
-        id=moodboard_id,
-    )
-    like, is_created = await Like.get_or_create(
-        author=user, moodboard=moodboard)
-    if not is_created:
-        raise AlreadyExists
-    await moodboard.add_like()
+    async with in_transaction() as connection:
+        rows = await execute_sql(
+            connection,
+            'INSERT INTO "like" ("author_id", "moodboard_id", "created_at") '
+            'SELECT $1, "id", $3 FROM "moodboard" WHERE "id" = $2 '
+            'ON CONFLICT ("author_id", "moodboard_id") DO NOTHING '
+            'RETURNING "id"',
+            [user.id, moodboard_id, timezone.now()]
+        )
+        if rows:
+            await update_moodboard_likes(connection, moodboard_id, 1)
+    if not rows:
+        if await Moodboard.exists(id=moodboard_id):
+            raise AlreadyExists
+        raise NotFound
 
 
 async def dislike_moodboard(user: User, moodboard_id: int):
-    moodboard: Moodboard = await get_instance_or_404(
-        Moodboard,
-        id=moodboard_id,
-    )
-    like = await Like.get_or_none(author=user, moodboard=moodboard)
+    async with in_transaction() as connection:
+        like = await Like.filter(
+            author=user,
+            moodboard_id=moodboard_id
+        ).using_db(connection).select_for_update().first()
+        if like:
+            await like.delete(using_db=connection)
+            await update_moodboard_likes(connection, moodboard_id, -1)
+            await record_reaction_removal(connection, like)
     if not like:
         raise NotFound
-    await moodboard.remove_like()
-    await like.delete()
+
+
+async def reconcile_moodboard_likes(
+    quiet: timedelta = timedelta(seconds=LIKE_RECONCILE_QUIET)
+) -> int:
+    # Write-behind deltas live in the memory of every worker, so only
+    # boards without recent likes or removals are recounted: anything
+    # still buffered would be applied on top of the recomputed count.
+    counted = (
+        'SELECT COUNT(*) FROM "like" '
+        'WHERE "like"."moodboard_id" = "moodboard"."id"'
+    )
+    rows = await execute_sql(
+        Moodboard._meta.db,
+        f'UPDATE "moodboard" SET "likes" = ({counted}) '
+        f'WHERE "likes" <> ({counted}) AND NOT EXISTS ('
+        'SELECT 1 FROM "like" '
+        'WHERE "like"."moodboard_id" = "moodboard"."id" '
+        'AND "like"."created_at" >= $1'
+        ') AND NOT EXISTS ('
+        'SELECT 1 FROM "reactionremoval" '
+        'WHERE "reactionremoval"."moodboard_id" = "moodboard"."id" '
+        'AND "reactionremoval"."removed_at" >= $1'
+        ') RETURNING "id"',
+        [timezone.now() - quiet]
+    )
+    return len(rows)
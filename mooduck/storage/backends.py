@@ -0,0 +1,323 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, Mapping
+from urllib.parse import quote
+from xml.etree import ElementTree
+import asyncio
+import hmac
+import os
+
+import aiohttp
+from yarl import URL
+
+from config import (
+    MEDIA_ROOT,
+    MEDIA_WORKERS,
+    MEDIA_STORAGE,
+    MEDIA_S3_ENDPOINT,
+    MEDIA_S3_BUCKET,
+    MEDIA_S3_ACCESS_KEY,
+    MEDIA_S3_SECRET_KEY,
+    MEDIA_S3_REGION,
+    MEDIA_S3_PART_SIZE,
+    MEDIA_S3_CONCURRENCY,
+    MEDIA_S3_CONNECTIONS,
+)
+from storage.utils import write_file
+
+
+media_executor = ThreadPoolExecutor(
+    MEDIA_WORKERS,
+    thread_name_prefix='media'
+)
+
+
+async def run_in_media_executor(func: Callable, *args):
+    return await asyncio.get_running_loop().run_in_executor(
+        media_executor, func, *args
+    )
+
+
+def _read_part(path: Path, offset: int, size: int) -> bytes:
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        return file.read(size)
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def save(self, name: str, source: bytes | Path) -> None:
+        # A Path source is a scratch file the backend may consume.
+        ...
+
+    @abstractmethod
+    async def read(self, name: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        ...
+
+    def get_path(self, name: str) -> Path | None:
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def exists(self, name: str) -> bool:
+        return await run_in_media_executor(self.get_path(name).exists)
+
+    async def save(self, name: str, source: bytes | Path) -> None:
+        path = self.get_path(name)
+        if isinstance(source, Path):
+            await run_in_media_executor(os.replace, source, path)
+        else:
+            await run_in_media_executor(write_file, path, source)
+
+    async def read(self, name: str) -> bytes:
+        return await run_in_media_executor(self.get_path(name).read_bytes)
+
+    async def delete(self, name: str) -> None:
+        await run_in_media_executor(self.get_path(name).unlink, True)
+
+    def get_path(self, name: str) -> Path:
+        return self.root / name
+
+
+class S3Storage(StorageBackend):
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = 'us-east-1',
+        part_size: int = MEDIA_S3_PART_SIZE,
+        concurrency: int = MEDIA_S3_CONCURRENCY,
+        connections: int = MEDIA_S3_CONNECTIONS,
+    ) -> None:
+        self.endpoint = endpoint.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.connections = connections
+        self.session: aiohttp.ClientSession | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if (
+            self.session is None
+            or self.session.closed
+            or self.loop is not loop
+        ):
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections)
+            )
+            self.loop = loop
+        return self.session
+
+    def get_url(self, name: str, query: dict[str, str] | None = None) -> URL:
+        url = f'{self.endpoint}/{self.bucket}/{quote(name, safe="-_.~/")}'
+        if query:
+            url += '?' + '&'.join(
+                f'{quote(key, safe="-_.~")}={quote(value, safe="-_.~")}'
+                for key, value in sorted(query.items())
+            )
+        return URL(url, encoded=True)
+
+    def sign(
+        self,
+        method: str,
+        url: URL,
+        payload_hash: str,
+        headers: dict[str, str] | None = None,
+    ) -> dict[str, str]:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = amz_date[:8]
+        host = url.raw_host
+        if not url.is_default_port():
+            host = f'{host}:{url.port}'
+        headers = {
+            **(headers or {}),
+            'host': host,
+            'x-amz-date': amz_date,
+            'x-amz-content-sha256': payload_hash,
+        }
+        signed_headers = sorted(key.lower() for key in headers)
+        canonical_headers = ''.join(
+            f'{key.lower()}:{str(value).strip()}\n'
+            for key, value in sorted(
+                headers.items(), key=lambda header: header[0].lower()
+            )
+        )
+        canonical_request = '\n'.join([
+            method,
+            url.raw_path,
+            url.raw_query_string,
+            canonical_headers,
+            ';'.join(signed_headers),
+            payload_hash,
+        ])
+        scope = f'{date}/{self.region}/s3/aws4_request'
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256',
+            amz_date,
+            scope,
+            sha256(canonical_request.encode()).hexdigest(),
+        ])
+        key = f'AWS4{self.secret_key}'.encode()
+        for part in (date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), sha256).digest()
+        signature = hmac.new(
+            key, string_to_sign.encode(), sha256
+        ).hexdigest()
+        headers['Authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+            f'SignedHeaders={";".join(signed_headers)}, '
+            f'Signature={signature}'
+        )
+        del headers['host']
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        name: str,
+        query: dict[str, str] | None = None,
+        data: bytes = b'',
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, Mapping[str, str], bytes]:
+        url = self.get_url(name, query)
+        async with self.get_session().request(
+            method,
+            url,
+            data=data,
+            headers=self.sign(
+                method, url, sha256(data).hexdigest(), headers
+            ),
+        ) as response:
+            body = await response.read()
+            if response.status >= 400 and response.status != 404:
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=body.decode(errors='replace'),
+                )
+            return response.status, response.headers, body
+
+    async def exists(self, name: str) -> bool:
+        status, _, _ = await self.request('HEAD', name)
+        return status != 404
+
+    async def put(self, name: str, data: bytes) -> None:
+        await self.request('PUT', name, data=data)
+
+    async def save(self, name: str, source: bytes | Path) -> None:
+        if isinstance(source, Path):
+            size = (await run_in_media_executor(source.stat)).st_size
+            if size <= self.part_size:
+                source = await run_in_media_executor(source.read_bytes)
+        else:
+            size = len(source)
+        if size <= self.part_size:
+            await self.put(name, source)
+            return
+        await self.save_multipart(name, source, size)
+
+    async def save_multipart(
+        self,
+        name: str,
+        source: bytes | Path,
+        size: int,
+    ) -> None:
+        _, _, body = await self.request('POST', name, {'uploads': ''})
+        upload_id = ElementTree.fromstring(body).findtext(
+            '{*}UploadId'
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def upload_part(number: int, offset: int) -> str:
+            async with semaphore:
+                if isinstance(source, Path):
+                    data = await run_in_media_executor(
+                        _read_part, source, offset, self.part_size
+                    )
+                else:
+                    data = source[offset:offset + self.part_size]
+                _, headers, _ = await self.request(
+                    'PUT',
+                    name,
+                    {'partNumber': str(number), 'uploadId': upload_id},
+                    data=data,
+                )
+                return headers['ETag']
+
+        try:
+            etags = await asyncio.gather(*[
+                upload_part(number, offset)
+                for number, offset in enumerate(
+                    range(0, size, self.part_size), 1
+                )
+            ])
+            await self.request(
+                'POST',
+                name,
+                {'uploadId': upload_id},
+                data=(
+                    '<CompleteMultipartUpload>' + ''.join(
+                        f'<Part><PartNumber>{number}</PartNumber>'
+                        f'<ETag>{etag}</ETag></Part>'
+                        for number, etag in enumerate(etags, 1)
+                    ) + '</CompleteMultipartUpload>'
+                ).encode(),
+            )
+        except Exception:
+            await self.request('DELETE', name, {'uploadId': upload_id})
+            raise
+
+    async def read(self, name: str) -> bytes:
+        status, _, body = await self.request('GET', name)
+        if status == 404:
+            raise FileNotFoundError(name)
+        return body
+
+    async def delete(self, name: str) -> None:
+        await self.request('DELETE', name)
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+def get_storage_backend() -> StorageBackend:
+    if MEDIA_STORAGE == 's3':
+        return S3Storage(
+            endpoint=MEDIA_S3_ENDPOINT,
+            bucket=MEDIA_S3_BUCKET,
+            access_key=MEDIA_S3_ACCESS_KEY,
+            secret_key=MEDIA_S3_SECRET_KEY,
+            region=MEDIA_S3_REGION,
+        )
+    return LocalStorage(MEDIA_ROOT)
+
+
+media_storage = get_storage_backend()
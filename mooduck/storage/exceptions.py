@@ -0,0 +1,17 @@
+from fastapi import HTTPException, status
+
+
+UnsupportedMedia = HTTPException(
+    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+    detail='Only png, jpeg, gif and webp images are supported'
+)
+
+MediaTooLarge = HTTPException(
+    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    detail='Media is too large'
+)
+
+TooManyMedia = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail='Too many images in one request'
+)
@@ -0,0 +1,16 @@
+from tortoise import Tortoise, run_async
+
+from db.db import TORTOISE_ORM
+from storage.services import collect_media_garbage
+from storage.backends import media_storage
+
+
+async def main():
+    await Tortoise.init(TORTOISE_ORM)
+    removed = await collect_media_garbage()
+    await media_storage.close()
+    print(f'Removed {removed} unreferenced media files')
+
+
+if __name__ == '__main__':
+    run_async(main())
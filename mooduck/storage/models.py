@@ -0,0 +1,32 @@
+import mimetypes
+
+from tortoise import Model, fields
+
+
+class Media(Model):
+    id = fields.BigIntField(pk=True)
+    hash = fields.CharField(max_length=64, unique=True)
+    ext = fields.CharField(max_length=8)
+    size = fields.BigIntField()
+    width = fields.IntField(null=True)
+    height = fields.IntField(null=True)
+    author = fields.ForeignKeyField(
+        'models.User',
+        related_name='media',
+        null=True,
+        on_delete=fields.SET_NULL
+    )
+    ref_count = fields.IntField(default=0)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        indexes = (('ref_count', 'updated_at'),)
+
+    @property
+    def filename(self) -> str:
+        return f'{self.hash}.{self.ext}'
+
+    @property
+    def mime_type(self) -> str | None:
+        return mimetypes.guess_type(self.filename)[0]
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from config import MEDIA_CHUNK_SIZE
+
+
+class MediaResponse(Response):
+    chunk_size = MEDIA_CHUNK_SIZE
+
+    def __init__(
+        self,
+        path: Path,
+        size: int,
+        byte_range: range,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+        media_type: str | None = None,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.byte_range = byte_range
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({
+            **(headers or {}),
+            'Content-Length': str(len(byte_range)),
+        })
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': self.status_code,
+            'headers': self.raw_headers,
+        })
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        extensions = scope.get('extensions') or {}
+        if 'http.response.zerocopysend' in extensions:
+            with open(self.path, 'rb') as file:
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': file,
+                    'offset': self.byte_range.start,
+                    'count': len(self.byte_range),
+                })
+            return
+        if (
+            'http.response.pathsend' in extensions
+            and len(self.byte_range) == self.size
+        ):
+            await send({
+                'type': 'http.response.pathsend',
+                'path': str(self.path),
+            })
+            return
+
+        remaining = len(self.byte_range)
+        async with await anyio.open_file(self.path, 'rb') as file:
+            await file.seek(self.byte_range.start)
+            while remaining:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,29 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request, UploadFile
+from starlette.responses import Response
+
+from config import MEDIA_URL, MEDIA_UPLOAD_BODY_SIZE
+from users.models import User
+from storage.schemas import GetMedia
+from storage.services import save_upload, get_media_file_response
+from storage.utils import get_media_response
+from extra.dependencies import is_authenticated
+from extra.routing import LimitedRoute, max_body_size
+
+
+router = APIRouter(route_class=LimitedRoute)
+
+
+@router.post('/media')
+@max_body_size(MEDIA_UPLOAD_BODY_SIZE)
+async def upload_media(
+    user: Annotated[User, Depends(is_authenticated)],
+    file: UploadFile
+) -> GetMedia:
+    return get_media_response(await save_upload(file, user))
+
+
+@router.api_route(f'/{MEDIA_URL}/{{filename}}', methods=['GET', 'HEAD'])
+async def serve_media(filename: str, request: Request) -> Response:
+    return await get_media_file_response(filename, request.headers)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class GetMedia(BaseModel):
+    id: int
+    url: str
+    size: int
+
+    class Config:
+        from_attributes = True
+
+
+class MediaSource(BaseModel):
+    url: str
+    width: int
+    type: str
+
+
+class MediaSet(BaseModel):
+    original: str
+    srcset: str
+    sources: list[MediaSource]
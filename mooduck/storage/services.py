@@ -0,0 +1,354 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from hashlib import sha256
+from pathlib import Path
+from uuid import uuid4
+import asyncio
+import base64
+import mimetypes
+
+from fastapi import UploadFile, status
+from starlette.datastructures import Headers
+from starlette.responses import RedirectResponse, Response
+from tortoise import timezone
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F, Subquery
+from tortoise.transactions import in_transaction
+
+from config import (
+    MEDIA_ROOT,
+    MEDIA_CHUNK_SIZE,
+    MEDIA_MAX_SIZE,
+    MEDIA_MAX_PER_REQUEST,
+    MEDIA_MAX_REQUEST_SIZE,
+    MEDIA_REQUEST_CONCURRENCY,
+    MEDIA_GC_GRACE_HOURS,
+    MEDIA_GC_BATCH_SIZE,
+    MEDIA_DERIVATIVE_WIDTHS,
+    MEDIA_CACHE_CONTROL,
+)
+from storage.models import Media
+from items.models import ItemMedia
+from moodboards.models import Moodboard
+from storage.backends import media_storage, run_in_media_executor
+from storage.responses import MediaResponse
+from storage.utils import (
+    MEDIA_FILENAME,
+    get_byte_range,
+    is_etag_matched,
+    get_image_ext,
+    get_derivative_filename,
+    get_derivative_filenames,
+    render_derivatives,
+    get_image_dimensions,
+)
+from storage.exceptions import UnsupportedMedia, MediaTooLarge, TooManyMedia
+from extra.exceptions import NotFound
+from extra.utils import get_media_url
+from users.models import User
+
+
+async def save_derivatives(hash: str, source: bytes | Path) -> None:
+    widths = [
+        width for width in MEDIA_DERIVATIVE_WIDTHS
+        if not await media_storage.exists(
+            get_derivative_filename(hash, width)
+        )
+    ]
+    if not widths:
+        return
+    derivatives = await run_in_media_executor(
+        render_derivatives, source, widths
+    )
+    await asyncio.gather(*[
+        media_storage.save(get_derivative_filename(hash, width), data)
+        for width, data in derivatives.items()
+    ])
+
+
+async def register_media(
+    hash: str,
+    ext: str,
+    size: int,
+    source: bytes | Path,
+    author: User | None = None,
+) -> Media:
+    width, height = await run_in_media_executor(get_image_dimensions, source)
+    for attempt in range(2):
+        try:
+            async with in_transaction() as connection:
+                is_touched = await Media.filter(
+                    hash=hash
+                ).using_db(connection).update(updated_at=timezone.now())
+                if is_touched:
+                    media = await Media.filter(
+                        hash=hash
+                    ).using_db(connection).get()
+                else:
+                    media = await Media.create(
+                        hash=hash,
+                        ext=ext,
+                        size=size,
+                        width=width,
+                        height=height,
+                        author=author,
+                        using_db=connection
+                    )
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    await save_derivatives(media.hash, source)
+    if not await media_storage.exists(media.filename):
+        await media_storage.save(media.filename, source)
+    return media
+
+
+def _decode_image(base64_data: str) -> tuple[str, str, bytes] | None:
+    format, imgstr = base64_data.split(';base64,')
+    try:
+        data = base64.b64decode(imgstr)
+    except Exception as ex:
+        print(ex)
+        return None
+    ext = get_image_ext(data) or format.split('/')[-1]
+    return sha256(data).hexdigest(), ext, data
+
+
+async def save_media_from_base64(base64_data: str) -> Media | None:
+    if not base64_data:
+        return None
+    decoded = await run_in_media_executor(_decode_image, base64_data)
+    if not decoded:
+        return None
+    hash, ext, data = decoded
+    return await register_media(
+        hash=hash,
+        ext=ext,
+        size=len(data),
+        source=data
+    )
+
+
+async def save_media_list_from_base64(
+    images: list[str]
+) -> list[Media | None]:
+    if len(images) > MEDIA_MAX_PER_REQUEST:
+        raise TooManyMedia
+    if sum(len(image) for image in images) * 3 // 4 > MEDIA_MAX_REQUEST_SIZE:
+        raise MediaTooLarge
+    semaphore = asyncio.Semaphore(MEDIA_REQUEST_CONCURRENCY)
+
+    async def save(image: str) -> Media | None:
+        async with semaphore:
+            return await save_media_from_base64(image)
+
+    return list(await asyncio.gather(*[save(image) for image in images]))
+
+
+def _write_chunk(file, chunk: bytes) -> None:
+    file.write(chunk)
+
+
+async def save_upload(upload: UploadFile, author: User) -> Media:
+    hasher = sha256()
+    size = 0
+    ext = None
+    tmp_path: Path = MEDIA_ROOT / f'.upload-{uuid4().hex}'
+    file = await run_in_media_executor(open, tmp_path, 'wb')
+    try:
+        while chunk := await upload.read(MEDIA_CHUNK_SIZE):
+            if ext is None:
+                ext = get_image_ext(chunk)
+                if not ext:
+                    raise UnsupportedMedia
+            size += len(chunk)
+            if size > MEDIA_MAX_SIZE:
+                raise MediaTooLarge
+            hasher.update(chunk)
+            await run_in_media_executor(_write_chunk, file, chunk)
+        await run_in_media_executor(file.close)
+        if not ext:
+            raise UnsupportedMedia
+
+        return await register_media(
+            hash=hasher.hexdigest(),
+            ext=ext,
+            size=size,
+            source=tmp_path,
+            author=author
+        )
+    finally:
+        if not file.closed:
+            await run_in_media_executor(file.close)
+        if tmp_path.exists():
+            await run_in_media_executor(tmp_path.unlink)
+
+
+async def get_media_by_ids(ids: list[int] | None) -> list[Media]:
+    if not ids:
+        return []
+    media = {
+        media.id: media for media in await Media.filter(id__in=ids)
+    }
+    if len(media) != len(set(ids)):
+        raise NotFound
+    return [media[id] for id in ids]
+
+
+async def get_media_by_id(id: int) -> Media:
+    return (await get_media_by_ids([id]))[0]
+
+
+async def make_derivative_lazily(name: str, width: int) -> None:
+    if width not in MEDIA_DERIVATIVE_WIDTHS:
+        raise NotFound
+    media = await Media.get_or_none(hash=name)
+    if not media:
+        raise NotFound
+    try:
+        source = (
+            media_storage.get_path(media.filename)
+            or await media_storage.read(media.filename)
+        )
+    except FileNotFoundError:
+        raise NotFound
+    await save_derivatives(media.hash, source)
+
+
+async def get_media_size(path: Path, width: str | None, name: str) -> int:
+    try:
+        return (await run_in_media_executor(path.stat)).st_size
+    except FileNotFoundError:
+        if not width:
+            raise NotFound
+    await make_derivative_lazily(name, int(width))
+    try:
+        return (await run_in_media_executor(path.stat)).st_size
+    except FileNotFoundError:
+        raise NotFound
+
+
+async def get_media_file_response(
+    filename: str,
+    headers: Headers
+) -> Response:
+    match = MEDIA_FILENAME.match(filename)
+    if not match:
+        raise NotFound
+    path = media_storage.get_path(filename)
+    if path is None:
+        return RedirectResponse(get_media_url(filename))
+    size = await get_media_size(path, match['width'], match['name'])
+    etag = f'"{filename.rsplit(".", 1)[0]}"'
+    response_headers = {
+        'ETag': etag,
+        'Cache-Control': MEDIA_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+    if is_etag_matched(headers.get('if-none-match'), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers=response_headers
+        )
+
+    byte_range = None
+    if headers.get('if-range', etag) == etag:
+        byte_range = get_byte_range(headers.get('range'), size)
+    if byte_range is not None and not byte_range:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={
+                **response_headers,
+                'Content-Range': f'bytes */{size}'
+            }
+        )
+    status_code = status.HTTP_200_OK
+    if byte_range is None:
+        byte_range = range(size)
+    else:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        response_headers['Content-Range'] = (
+            f'bytes {byte_range.start}-{byte_range.stop - 1}/{size}'
+        )
+    return MediaResponse(
+        path=path,
+        size=size,
+        byte_range=byte_range,
+        status_code=status_code,
+        headers=response_headers,
+        media_type=mimetypes.guess_type(filename)[0]
+    )
+
+
+async def change_media_references(
+    ids: list[int | None],
+    delta: int,
+    connection: BaseDBAsyncClient | None = None
+) -> None:
+    ids_by_count = defaultdict(list)
+    for id, count in Counter(filter(None, ids)).items():
+        ids_by_count[count].append(id)
+    for count, media_ids in ids_by_count.items():
+        await Media.filter(
+            id__in=media_ids
+        ).using_db(connection).update(ref_count=F('ref_count') + count * delta)
+
+
+async def acquire_media(
+    ids: list[int | None],
+    connection: BaseDBAsyncClient | None = None
+) -> None:
+    await change_media_references(ids, 1, connection)
+
+
+async def release_media(
+    ids: list[int | None],
+    connection: BaseDBAsyncClient | None = None
+) -> None:
+    await change_media_references(ids, -1, connection)
+
+
+def get_referenced_media_ids() -> list[Subquery]:
+    return [
+        Subquery(ItemMedia.filter(
+            media_id__isnull=False
+        ).order_by('media_id').values('media_id')),
+        Subquery(Moodboard.filter(
+            cover_media_id__isnull=False
+        ).order_by('cover_media_id').values('cover_media_id')),
+    ]
+
+
+async def collect_media_garbage(
+    grace: timedelta = timedelta(hours=MEDIA_GC_GRACE_HOURS),
+    batch_size: int = MEDIA_GC_BATCH_SIZE,
+) -> int:
+    cutoff = timezone.now() - grace
+    removed = 0
+    while True:
+        queryset = Media.filter(ref_count__lte=0, updated_at__lt=cutoff)
+        # a drifted ref_count must not delete media that is still used,
+        # the foreign keys would reject the whole batch on every run
+        for referenced in get_referenced_media_ids():
+            queryset = queryset.exclude(id__in=referenced)
+        async with in_transaction() as connection:
+            batch = await queryset.select_for_update(
+                skip_locked=True
+            ).using_db(connection).limit(batch_size)
+            if not batch:
+                return removed
+            await Media.filter(
+                id__in=[media.id for media in batch]
+            ).using_db(connection).delete()
+        # files go only once the rows are gone for good
+        for media in batch:
+            await asyncio.gather(*[
+                media_storage.delete(filename)
+                for filename in (
+                    media.filename,
+                    *get_derivative_filenames(media.hash)
+                )
+            ])
+        removed += len(batch)
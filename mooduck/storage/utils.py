@@ -0,0 +1,190 @@
+from io import BytesIO
+from pathlib import Path
+from uuid import uuid4
+import os
+import re
+
+from PIL import Image, ImageOps
+
+from config import (
+    MEDIA_DERIVATIVE_WIDTHS,
+    MEDIA_DERIVATIVE_FORMAT,
+    MEDIA_DERIVATIVE_QUALITY,
+)
+from storage.models import Media
+from storage.schemas import GetMedia, MediaSet, MediaSource
+from extra.utils import get_media_url
+
+
+MEDIA_FILENAME = re.compile(
+    r'^(?P<name>[\w-]+?)(_w(?P<width>\d+))?\.(?P<ext>[a-z0-9]+)$'
+)
+MEDIA_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+IMAGE_SIGNATURES: tuple[tuple[bytes, str], ...] = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def get_image_ext(header: bytes) -> str | None:
+    for signature, ext in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return ext
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def get_byte_range(header: str | None, size: int) -> range | None:
+    if not header or not header.startswith('bytes='):
+        return None
+    start, separator, end = header[6:].strip().partition('-')
+    if (
+        not separator
+        or not (start.isdigit() or end.isdigit())
+        or (start and not start.isdigit())
+        or (end and not end.isdigit())
+    ):
+        return None
+    if not start:
+        return range(max(size - int(end), 0), size if int(end) else 0)
+    return range(int(start), min(int(end) + 1, size) if end else size)
+
+
+def is_etag_matched(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == '*' or etag in (
+        tag.strip().removeprefix('W/') for tag in header.split(',')
+    )
+
+
+def get_media_response(media: Media) -> GetMedia:
+    return GetMedia(
+        id=media.id,
+        url=get_media_url(media.filename),
+        size=media.size
+    )
+
+
+def get_media_hash(url: str | None) -> str | None:
+    if not url:
+        return None
+    hash = url.rsplit('/', 1)[-1].split('.')[0]
+    return hash if MEDIA_HASH.match(hash) else None
+
+
+def get_stored_media_url(
+    hash: str | None,
+    ext: str | None,
+    url: str | None = None
+) -> str | None:
+    if not hash:
+        return url
+    return get_media_url(f'{hash}.{ext}')
+
+
+def get_derivative_filename(hash: str, width: int) -> str:
+    return f'{hash}_w{width}.{MEDIA_DERIVATIVE_FORMAT}'
+
+
+def get_derivative_filenames(hash: str) -> list[str]:
+    return [
+        get_derivative_filename(hash, width)
+        for width in MEDIA_DERIVATIVE_WIDTHS
+    ]
+
+
+def get_media_set(
+    url: str | None,
+    width: int | None = None
+) -> MediaSet | None:
+    hash = get_media_hash(url)
+    # derivatives are never upscaled, wider ones would repeat the original
+    widths = [
+        derivative_width for derivative_width in MEDIA_DERIVATIVE_WIDTHS
+        if width and derivative_width <= width
+    ]
+    if not hash or not widths:
+        return None
+    sources = [
+        MediaSource(
+            url=get_media_url(get_derivative_filename(hash, derivative_width)),
+            width=derivative_width,
+            type=f'image/{MEDIA_DERIVATIVE_FORMAT}'
+        )
+        for derivative_width in widths
+    ]
+    return MediaSet(
+        original=url,
+        srcset=', '.join(
+            f'{source.url} {source.width}w' for source in sources
+        ),
+        sources=sources
+    )
+
+
+def get_media_sets(
+    media: list[tuple[str | None, int | None]] | None
+) -> list[MediaSet]:
+    return list(filter(None, (
+        get_media_set(url, width) for url, width in media or []
+    )))
+
+
+def write_file(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f'.{path.name}.{uuid4().hex}.tmp')
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def get_image_dimensions(
+    source: bytes | Path
+) -> tuple[int | None, int | None]:
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    try:
+        with Image.open(source) as image:
+            return image.size
+    except (OSError, Image.DecompressionBombError) as ex:
+        print(ex)
+        return None, None
+
+
+def render_derivative(image: Image.Image, width: int) -> bytes:
+    derivative = image.copy()
+    if derivative.width > width:
+        derivative.thumbnail(
+            (width, derivative.height),
+            Image.Resampling.LANCZOS
+        )
+    if derivative.mode not in ('RGB', 'RGBA'):
+        derivative = derivative.convert('RGBA')
+    buffer = BytesIO()
+    derivative.save(
+        buffer,
+        MEDIA_DERIVATIVE_FORMAT,
+        quality=MEDIA_DERIVATIVE_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def render_derivatives(
+    source: bytes | Path,
+    widths: list[int]
+) -> dict[int, bytes]:
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            return {
+                width: render_derivative(image, width) for width in widths
+            }
+    except (OSError, Image.DecompressionBombError) as ex:
+        print(ex)
+        return {}
@@ -0,0 +1,34 @@
+from typing import Annotated
+import base64
+import binascii
+import re
+
+from pydantic import AfterValidator
+
+from config import MEDIA_MAX_SIZE, MEDIA_BASE64_HEADER_LENGTH
+from storage.utils import get_image_ext
+
+
+BASE64_IMAGE_PREFIX = re.compile(r'data:image/(png|jpeg|jpg|gif|webp);base64,')
+
+
+def validate_base64_image(value: str) -> str:
+    prefix = BASE64_IMAGE_PREFIX.match(value)
+    if not prefix:
+        raise ValueError('Expected a data:image/<type>;base64, URI')
+    if (len(value) - prefix.end()) * 3 // 4 > MEDIA_MAX_SIZE:
+        raise ValueError('Image is too large')
+    try:
+        header = base64.b64decode(
+            value[prefix.end():prefix.end() + MEDIA_BASE64_HEADER_LENGTH],
+            validate=True
+        )
+    except binascii.Error:
+        raise ValueError('Image data is not valid base64')
+    declared = 'jpeg' if prefix[1] == 'jpg' else prefix[1]
+    if get_image_ext(header) != declared:
+        raise ValueError(f'Image data is not {declared}')
+    return value
+
+
+Base64Image = Annotated[str, AfterValidator(validate_base64_image)]
@@ -2,7 +2,7 @@ import datetime
 
 import pytest
 
-from items.models import Item
+from items.models import Item, ItemMedia
 
 
 @pytest.fixture()
@@ -20,7 +20,16 @@ def item_creation_data(base64):
 
 @pytest.fixture()
 async def item(item_creation_data, author):
-    return await Item.create(author=author, **item_creation_data)
+    item = await Item.create(author=author, **{
+        key: value for key, value in item_creation_data.items()
+        if key != 'media'
+    })
+    await ItemMedia.create(
+        item=item,
+        position=0,
+        url='https://example.com/image.jpeg'
+    )
+    return item
 
 
 @pytest.fixture()
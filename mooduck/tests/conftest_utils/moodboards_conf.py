@@ -3,6 +3,7 @@ import datetime
 import pytest_asyncio
 
 from items.models import ItemMoodboard
+from moodboards import trending
 from moodboards.models import Moodboard, FavMoodboard
 from reactions.models import Comment
 from users.models import Subscription
@@ -138,3 +139,8 @@ async def private_moodboard(author):
         name='private',
         is_private=True
     )
+
+
+@pytest_asyncio.fixture()
+def trending_without_margin(monkeypatch):
+    monkeypatch.setattr(trending, 'TRENDING_SETTLE_MARGIN', 0)
@@ -0,0 +1,113 @@
+from hashlib import md5, sha256
+from io import BytesIO
+from uuid import uuid4
+from xml.etree import ElementTree
+import base64 as b64
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+from storage.models import Media
+from storage.backends import S3Storage, media_storage
+
+
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_storage, 'root', tmp_path)
+    monkeypatch.setattr('storage.services.MEDIA_ROOT', tmp_path)
+    return tmp_path
+
+
+@pytest.fixture()
+def image_bytes(base64):
+    return b64.b64decode(base64.split(';base64,')[-1])
+
+
+@pytest.fixture()
+def wide_base64():
+    buffer = BytesIO()
+    Image.new('RGB', (700, 10)).save(buffer, 'png')
+    return 'data:image/png;base64,' + b64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@pytest.fixture()
+async def media(author, image_bytes):
+    return await Media.create(
+        hash='a' * 64,
+        ext='jpeg',
+        size=len(image_bytes),
+        author=author
+    )
+
+
+@pytest.fixture()
+async def s3_server():
+    objects = {}
+    uploads = {}
+
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.read()
+        if not request.headers.get('Authorization', '').startswith(
+            'AWS4-HMAC-SHA256 Credential=minio/'
+        ) or request.headers.get(
+            'x-amz-content-sha256'
+        ) != sha256(body).hexdigest():
+            return web.Response(status=403)
+        key = request.match_info['key']
+        upload_id = request.query.get('uploadId')
+        if request.method == 'POST' and 'uploads' in request.query:
+            upload_id = uuid4().hex
+            uploads[upload_id] = {}
+            return web.Response(body=(
+                '<InitiateMultipartUploadResult xmlns='
+                '"http://s3.amazonaws.com/doc/2006-03-01/">'
+                f'<Key>{key}</Key><UploadId>{upload_id}</UploadId>'
+                '</InitiateMultipartUploadResult>'
+            ))
+        if request.method == 'POST':
+            parts = uploads.pop(upload_id)
+            objects[key] = b''.join(
+                parts[int(part.findtext('PartNumber'))]
+                for part in ElementTree.fromstring(body).findall('Part')
+            )
+            return web.Response()
+        if request.method == 'PUT' and upload_id:
+            uploads[upload_id][int(request.query['partNumber'])] = body
+            return web.Response(
+                headers={'ETag': f'"{md5(body).hexdigest()}"'}
+            )
+        if request.method == 'PUT':
+            objects[key] = body
+            return web.Response()
+        if request.method == 'DELETE':
+            uploads.pop(upload_id, None)
+            objects.pop(key, None)
+            return web.Response(status=204)
+        if key not in objects:
+            return web.Response(status=404)
+        return web.Response(body=objects[key])
+
+    app = web.Application(client_max_size=0)
+    app.router.add_route('*', '/media/{key:.+}', handle)
+    server = TestServer(app)
+    await server.start_server()
+    server.objects = objects
+    yield server
+    await server.close()
+
+
+@pytest.fixture()
+async def s3_storage(s3_server):
+    storage = S3Storage(
+        endpoint=str(s3_server.make_url('')),
+        bucket='media',
+        access_key='minio',
+        secret_key='minio-secret',
+        part_size=1024
+    )
+    yield storage
+    await storage.close()
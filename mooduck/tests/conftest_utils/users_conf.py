@@ -1,9 +1,12 @@
+import threading
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 
 from main import app
 from users.models import User
 from extra.utils import get_password_hash, create_access_token
+from extra import passwords
 
 
 @pytest.fixture()
@@ -84,3 +87,20 @@ def auth_token(user):
     return create_access_token(
         data={'sub': user.username}
     )
+
+
+@pytest.fixture()
+async def blocked_hasher(monkeypatch):
+    release = threading.Event()
+    hasher = passwords.PasswordHasher(workers=1, max_pending=1)
+    check = passwords._check
+
+    def blocked_check(password: bytes, hashed: bytes) -> bool:
+        release.wait(10)
+        return check(password, hashed)
+
+    monkeypatch.setattr(passwords, '_check', blocked_check)
+    monkeypatch.setattr('users.routers.password_hasher', hasher)
+    yield hasher, release
+    release.set()
+    hasher.shutdown()
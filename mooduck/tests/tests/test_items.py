@@ -1,6 +1,26 @@
+from array import array
 from pprint import pprint
+from time import monotonic
+import asyncio
 
 import pytest
+from tortoise.transactions import in_transaction
+
+from config import MOODBOARD_ITEMS_WINDOW
+from items.models import (
+    CanonicalLink,
+    Item,
+    ItemMedia,
+    ItemMoodboard,
+    ITEM_TYPES
+)
+from items import services as item_services
+from items.schemas import ItemOperation
+from items.services import item_pool, get_all_items
+from items.utils import ItemRecord, normalize_link
+from extra import search
+from extra.services import bulk_insert_returning
+from extra.utils import decode_cursor, encode_cursor
 
 
 pytestmark = pytest.mark.asyncio
@@ -54,6 +74,36 @@ async def test_add_existing_items_to_chaotic_400(
     assert response.status_code == 400
 
 
+async def test_add_existing_items_to_chaotic_twice(
+    user_client,
+    user_chaotic,
+    item
+):
+    for status_code in (200, 400):
+        response = await user_client.post(
+            '/chaotic',
+            json={'existing_items': [item.id, item.id]}
+        )
+        assert response.status_code == status_code
+    assert await ItemMoodboard.filter(
+        item=item,
+        moodboard=user_chaotic
+    ).count() == 1
+
+
+async def test_add_existing_private_item_to_chaotic(
+    user_client,
+    user_chaotic,
+    private_item
+):
+    response = await user_client.post(
+        '/chaotic',
+        json={'existing_items': [private_item.id]}
+    )
+    assert response.status_code == 400
+    assert not await ItemMoodboard.filter(item=private_item).exists()
+
+
 async def test_delete_item_from_chaotic(
     user_client,
     user_with_chaotic
@@ -130,7 +180,41 @@ async def test_get_moodboard_items(
     moodboard, item, comment = moodboard_item_comment
     response = await user_client.get(f'/moodboard/{moodboard.id}/item')
     assert response.status_code == 200
-    assert len(response.json()) == 1
+    assert len(response.json().get('items')) == 1
+
+
+async def test_moodboard_items_window(
+    user_client,
+    author,
+    moodboard,
+    item
+):
+    await Item.bulk_create([
+        Item(author=author, name=f'item {index:02}', item_type='anime')
+        for index in range(MOODBOARD_ITEMS_WINDOW + 4)
+    ])
+    await ItemMoodboard.bulk_create([
+        ItemMoodboard(item_id=id, moodboard=moodboard)
+        for id in await Item.all().values_list('id', flat=True)
+    ])
+    response = await user_client.get(f'/moodboard/{moodboard.id}')
+    assert response.status_code == 200
+    window = response.json().get('items')
+    assert len(window) == MOODBOARD_ITEMS_WINDOW
+    response = await user_client.get(
+        f'/moodboard/{moodboard.id}/item',
+        params={
+            'cursor': response.json().get('items_next_cursor'),
+            'limit': MOODBOARD_ITEMS_WINDOW
+        }
+    )
+    rest = response.json().get('items')
+    assert len(rest) == 5
+    assert response.json().get('next_cursor') is None
+    ids = {entry.get('id') for entry in window + rest}
+    assert ids == set(await Item.all().values_list('id', flat=True))
+    media = {entry.get('id'): entry.get('media') for entry in window + rest}
+    assert media[item.id] == ['https://example.com/image.jpeg']
 
 
 async def test_get_private_moodboard_items(
@@ -150,7 +234,115 @@ async def test_delete_item_from_moodboard(
         f'/moodboard/{moodboard.id}/item/{item.id}')
     assert response.status_code == 204
     response = await author_client.get(f'/moodboard/{moodboard.id}/item')
-    assert len(response.json()) == 0
+    assert len(response.json().get('items')) == 0
+
+
+async def test_delete_item_from_moodboard_with_item(
+    author_client,
+    moodboard_item_comment
+):
+    moodboard, item, comment = moodboard_item_comment
+    response = await author_client.delete(
+        f'/moodboard/{moodboard.id}/item/{item.id}',
+        params={'delete_item': True}
+    )
+    assert response.status_code == 204
+    assert not await Item.exists(id=item.id)
+    assert not await ItemMedia.exists(item_id=item.id)
+
+
+async def test_batch_item_operations(
+    author_client,
+    moodboard,
+    private_moodboard,
+    items,
+    item
+):
+    await ItemMoodboard.bulk_create([
+        ItemMoodboard(item=entry, moodboard=moodboard)
+        for entry in (*items[:3], item)
+    ])
+    response = await author_client.post(
+        '/item/batch',
+        json={'operations': [
+            {
+                'action': 'move',
+                'item_ids': [items[0].id, items[1].id, items[3].id],
+                'source': moodboard.id,
+                'target': private_moodboard.id
+            },
+            {
+                'action': 'copy',
+                'item_ids': [items[2].id, items[3].id],
+                'target': private_moodboard.id
+            },
+            {
+                'action': 'remove',
+                'item_ids': [items[2].id, item.id],
+                'source': moodboard.id,
+                'delete_item': True
+            },
+        ]}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            'action': 'move',
+            'items': [items[0].id, items[1].id],
+            'deleted': []
+        },
+        {
+            'action': 'copy',
+            'items': [items[2].id, items[3].id],
+            'deleted': []
+        },
+        {
+            'action': 'remove',
+            'items': [items[2].id, item.id],
+            'deleted': [item.id]
+        },
+    ]
+    assert not await ItemMoodboard.exists(moodboard=moodboard)
+    assert await ItemMoodboard.filter(
+        moodboard=private_moodboard
+    ).count() == 4
+    assert await Item.exists(id=items[2].id)
+    assert not await Item.exists(id=item.id)
+
+
+async def test_batch_item_operations_401(
+    user_client,
+    user_chaotic,
+    moodboard,
+    item
+):
+    response = await user_client.post(
+        '/item/batch',
+        json={'operations': [
+            {
+                'action': 'copy',
+                'item_ids': [item.id],
+                'target': user_chaotic.id
+            },
+            {
+                'action': 'copy',
+                'item_ids': [item.id],
+                'target': moodboard.id
+            },
+        ]}
+    )
+    assert response.status_code == 401
+    assert not await ItemMoodboard.exists(item=item)
+
+
+async def test_batch_item_operations_invalid(author_client, moodboard, item):
+    response = await author_client.post(
+        '/item/batch',
+        json={'operations': [
+            {'action': 'move', 'item_ids': [item.id], 'source': moodboard.id}
+        ]}
+    )
+    assert response.status_code == 422
 
 
 async def test_delete_item_from_moodboard_401(
@@ -162,7 +354,7 @@ async def test_delete_item_from_moodboard_401(
         f'/moodboard/{moodboard.id}/item/{item.id}')
     assert response.status_code == 401
     response = await user_client.get(f'/moodboard/{moodboard.id}/item')
-    assert len(response.json()) == 1
+    assert len(response.json().get('items')) == 1
 
 
 async def test_delete_item_from_moodboard_404(
@@ -174,7 +366,7 @@ async def test_delete_item_from_moodboard_404(
         f'/moodboard/{moodboard.id}/item/{item.id + 1}')
     assert response.status_code == 404
     response = await author_client.get(f'/moodboard/{moodboard.id}/item')
-    assert len(response.json()) == 1
+    assert len(response.json().get('items')) == 1
 
 
 async def test_retrieve_item(
@@ -215,6 +407,61 @@ async def test_random_item(user_client, items):
     )
 
 
+async def test_random_item_pool(user_client, items, monkeypatch):
+    first_item, second_item, third_item, fourth_item = items
+    monkeypatch.setattr(item_pool, 'refresh_interval', 0)
+    await Item.filter(id=first_item.id).update(item_type='movie')
+    await Item.filter(id=second_item.id).update(is_private=True)
+    seen = set()
+    for _ in range(20):
+        response = await user_client.get(
+            '/random/item',
+            params={'item_type': 'anime'}
+        )
+        assert response.status_code == 200
+        seen.add(response.json().get('id'))
+    assert seen <= {third_item.id, fourth_item.id}
+    new_item = await Item.create(
+        author=await first_item.author,
+        name='new item',
+        item_type='game'
+    )
+    response = await user_client.get(
+        '/random/item',
+        params={'item_type': 'game'}
+    )
+    assert response.json().get('id') == new_item.id
+
+
+async def test_random_item_pool_reload(items):
+    first_item, second_item, third_item, fourth_item = items
+    await item_pool.reload()
+    assert not item_pool.loaded
+    await item_pool.refresh()
+    ids = item_pool.ids
+    await Item.filter(id=first_item.id).update(is_private=True)
+    await item_pool.reload()
+    assert item_pool.ids is not ids
+    assert first_item.id in ids[None]
+    assert first_item.id not in item_pool.ids[None]
+
+
+async def test_random_item_pool_concurrent_misses(items, monkeypatch):
+    first_item, *_ = items
+    monkeypatch.setattr('extra.sampling.randrange', lambda size: size - 1)
+    item_pool.ids[None] = array('q', [first_item.id, 0])
+    item_pool.loaded = True
+    item_pool.refreshed_at = monotonic()
+
+    async def fetch(id: int) -> Item | None:
+        await asyncio.sleep(0)
+        return await Item.get_or_none(id=id)
+
+    found = await asyncio.gather(item_pool.get(fetch), item_pool.get(fetch))
+    assert [item.id for item in found] == [first_item.id, first_item.id]
+    assert list(item_pool.ids[None]) == [first_item.id]
+
+
 async def test_patch_item(author_client, item):
     response = await author_client.patch(
         f'/item/{item.id}',
@@ -285,3 +532,375 @@ async def test_list_items_with_params(user_client, items):
 
     assert response_limit_json.get('items')[0].get('id') == fourth_item.id
     assert response_limit_page_json.get('items')[0].get('id') == second_item.id
+
+
+async def test_list_items_with_cursor(user_client, items):
+    first_item, second_item, third_item, fourth_item = items
+    response = await user_client.get('/item?limit=2')
+    next_cursor = response.json().get('next_cursor')
+    assert next_cursor is not None
+
+    response = await user_client.get(f'/item?limit=2&cursor={next_cursor}')
+    json = response.json()
+    assert response.status_code == 200
+    assert [item.get('id') for item in json.get('items')] == [
+        second_item.id,
+        first_item.id
+    ]
+    assert json.get('prev_page') is None
+    assert json.get('next_page') is None
+    assert json.get('next_cursor') is None
+
+
+async def test_list_items_with_cursor_next_page(user_client, items):
+    first_item, second_item, third_item, fourth_item = items
+    response = await user_client.get('/item?limit=1')
+    next_page = response.json().get('next_page')
+    cursor = response.json().get('next_cursor')
+    response = await user_client.get(f'/item?limit=1&cursor={cursor}')
+    json = response.json()
+    assert json.get('items')[0].get('id') == third_item.id
+    assert 'cursor=' in json.get('next_page')
+    assert next_page != json.get('next_page')
+
+
+async def test_list_items_with_invalid_cursor(user_client, items):
+    response = await user_client.get('/item?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+async def test_list_items_with_null_cursor(user_client, items):
+    response = await user_client.get('/item?limit=1')
+    cursor = decode_cursor(response.json().get('next_cursor'))
+    response = await user_client.get(
+        f'/item?cursor={encode_cursor([None] * len(cursor))}'
+    )
+    assert response.status_code == 400
+
+
+async def test_list_items_with_total(user_client, items, private_item):
+    response = await user_client.get('/item?limit=1&with_total=exact')
+    assert response.status_code == 200
+    assert response.json().get('total') == 4
+    assert response.json().get('total_relation') == 'eq'
+
+    response = await user_client.get('/item?limit=1&with_total=capped')
+    assert response.json().get('total') == 4
+
+    response = await user_client.get('/item?limit=1&with_total=estimate')
+    assert response.json().get('total') == 4
+
+    response = await user_client.get('/item?limit=1')
+    assert response.json().get('total') is None
+
+
+async def test_list_items_with_total_cached(user_client, items, author):
+    response = await user_client.get('/item?with_total=exact')
+    assert response.json().get('total') == 4
+    await Item.create(author=author, name='fifth item', item_type='anime')
+    response = await user_client.get('/item?limit=2&with_total=exact')
+    assert response.json().get('total') == 4
+    response = await user_client.get(
+        '/item?with_total=exact&item_type=anime')
+    assert response.json().get('total') == 5
+
+
+async def test_item_media_rows(
+    author_client,
+    moodboard,
+    item_creation_data,
+    media
+):
+    item_creation_data['media_ids'] = [media.id]
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [item_creation_data]}
+    )
+    assert response.status_code == 200
+    rows = await ItemMedia.filter(
+        item_id=response.json()[0].get('id')
+    ).order_by('position')
+    assert [row.url for row in rows] == [None, None]
+    assert response.json()[0].get('media')[1].endswith(media.filename)
+    assert rows[1].media_id == media.id
+    assert rows[0].mime_type == 'image/jpeg'
+    assert (rows[0].width, rows[0].height) == (1, 1)
+    assert rows[1].hash == media.hash
+
+
+async def test_list_items_media(user_client, item, items):
+    await ItemMedia.create(
+        item=items[0],
+        position=0,
+        url='https://example.com/first.jpeg'
+    )
+    await ItemMedia.create(
+        item=item,
+        position=1,
+        url='https://example.com/second.jpeg'
+    )
+    response = await user_client.get('/item')
+    assert response.status_code == 200
+    media = {
+        entry.get('id'): entry.get('media')
+        for entry in response.json().get('items')
+    }
+    assert media[item.id] == [
+        'https://example.com/image.jpeg',
+        'https://example.com/second.jpeg'
+    ]
+    assert media[items[0].id] == ['https://example.com/first.jpeg']
+    assert media[items[1].id] == []
+
+
+async def test_add_many_items_to_moodboard(
+    author_client,
+    moodboard,
+    item_creation_data,
+    media
+):
+    items = [
+        {**item_creation_data, 'name': f'item {index}'}
+        for index in range(50)
+    ]
+    items[10]['media_ids'] = [media.id, media.id]
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': items}
+    )
+    assert response.status_code == 200
+    created = {
+        item.id: item.name
+        for item in await Item.filter(item_moodboard__moodboard=moodboard)
+    }
+    assert [
+        created[entry.get('id')] for entry in response.json()
+    ] == [item['name'] for item in items]
+    assert len(response.json()[10].get('media')) == 3
+    assert response.json()[0].get('author').get('id') == moodboard.author_id
+    await media.refresh_from_db()
+    assert media.ref_count == 2
+
+
+async def test_add_items_to_moodboard_rolls_back(
+    author_client,
+    moodboard,
+    item_creation_data
+):
+    items = [item_creation_data, {**item_creation_data, 'media_ids': [0]}]
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': items}
+    )
+    assert response.status_code == 404
+    assert not await Item.filter(item_moodboard__moodboard=moodboard).exists()
+
+
+async def test_normalize_link():
+    assert normalize_link(
+        'HTTP://WWW.Example.com:80/a//b/?utm_source=x&b=2&a=1#top'
+    ) == 'https://example.com/a/b?a=1&b=2'
+    assert normalize_link('example.com/') == 'https://example.com'
+    assert normalize_link('https://example.com/Path') == (
+        'https://example.com/Path'
+    )
+    assert normalize_link('http://example.com:8080') == (
+        'https://example.com:8080'
+    )
+    assert normalize_link('https://') is None
+    assert normalize_link('') is None
+
+
+async def test_add_items_share_canonical_link(
+    author_client,
+    moodboard,
+    item_creation_data
+):
+    items = [
+        {**item_creation_data, 'link': 'https://www.example.com/film/'},
+        {**item_creation_data, 'link': 'http://example.com/film#cast'},
+        {**item_creation_data, 'link': 'https://example.com/other'},
+    ]
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': items}
+    )
+    assert response.status_code == 200
+    canonical = await Item.filter(
+        id__in=[entry.get('id') for entry in response.json()]
+    ).order_by('id').values_list('canonical__url', flat=True)
+    assert canonical == [
+        'https://example.com/film',
+        'https://example.com/film',
+        'https://example.com/other',
+    ]
+    assert await CanonicalLink.all().count() == 2
+
+
+async def test_canonical_links_are_inserted_in_order():
+    links = [f'https://example.com/{name}' for name in 'dbeac']
+    canonical = await item_services.get_canonical_links(links)
+    assert [entry.url for entry in canonical] == links
+    assert await CanonicalLink.all().order_by('id').values_list(
+        'url', flat=True
+    ) == sorted(links)
+
+
+async def test_patch_item_link(author_client, item):
+    response = await author_client.patch(
+        f'/item/{item.id}',
+        json={'link': 'https://www.example.com/patched/'}
+    )
+    assert response.status_code == 200
+    assert await Item.filter(id=item.id).values_list(
+        'canonical__url', flat=True
+    ) == ['https://example.com/patched']
+
+
+async def test_lookup_items_by_link(
+    user_client,
+    author_client,
+    moodboard,
+    item_creation_data
+):
+    items = [
+        {**item_creation_data, 'link': 'https://example.com/film'},
+        {
+            **item_creation_data,
+            'link': 'https://example.com/film',
+            'is_private': True
+        },
+        {**item_creation_data, 'link': 'https://example.com/other'},
+    ]
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': items}
+    )
+    response = await user_client.get(
+        '/item/lookup',
+        params={'link': 'www.example.com/film?utm_medium=social'}
+    )
+    assert response.status_code == 200
+    assert len(response.json().get('items')) == 1
+    assert response.json().get('items')[0].get('link') == (
+        'https://example.com/film'
+    )
+    assert 'facets' not in response.json()
+
+
+async def test_lookup_items_by_invalid_link(user_client):
+    response = await user_client.get('/item/lookup', params={'link': '//'})
+    assert response.status_code == 400
+
+
+async def test_full_text_search_query(monkeypatch):
+    monkeypatch.setattr(
+        search, 'is_full_text_search_supported', lambda queryset: True
+    )
+    queryset = get_all_items("cat's", 'anime', headline=True)
+    record = search.get_search_record(queryset, ItemRecord)
+    assert record._fields[-2:] == ('search_rank', 'search_headline')
+    sql = queryset.values_list(*record._fields).sql()
+    assert '"item"."search_vector" @@ websearch_to_tsquery(' in sql
+    assert "'mooduck_search','cat''s'" in sql
+    assert 'ORDER BY ts_rank_cd(' in sql
+    assert search.get_search_record(get_all_items(), ItemRecord) is ItemRecord
+
+
+async def test_search_items_fallback(user_client, items):
+    response = await user_client.get('/item', params={'search': 'THIRD'})
+    assert response.status_code == 200
+    assert [
+        item.get('name') for item in response.json().get('items')
+    ] == ['third item']
+
+
+async def test_item_facets(user_client, items, private_item):
+    response = await user_client.get('/item/facets')
+    assert response.status_code == 200
+    assert set(response.json()) == set(ITEM_TYPES)
+    assert response.json()['anime'] == 4
+    assert response.json()['movie'] == 0
+    response = await user_client.get(
+        '/item/facets',
+        params={'search': 'first'}
+    )
+    assert response.json()['anime'] == 1
+
+
+async def test_item_facets_are_updated(
+    author_client,
+    moodboard,
+    item_creation_data,
+    items
+):
+    response = await author_client.get('/item', params={'facets': True})
+    assert response.status_code == 200
+    assert response.json().get('facets')['anime'] == 4
+    await Item.filter(id=items[0].id).update(item_type='game')
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [
+            {**item_creation_data, 'item_type': 'movie'},
+            {**item_creation_data, 'item_type': 'movie', 'is_private': True}
+        ]}
+    )
+    created = response.json()[0].get('id')
+    await author_client.patch(f'/item/{items[1].id}', json={
+        'is_private': True
+    })
+    response = await author_client.get('/item/facets')
+    assert response.json()['movie'] == 1
+    assert response.json()['anime'] == 3
+    assert response.json()['game'] == 0
+    await author_client.delete(
+        f'/moodboard/{moodboard.id}/item/{created}',
+        params={'delete_item': True}
+    )
+    response = await author_client.get('/item/facets')
+    assert response.json()['movie'] == 0
+
+
+async def test_item_facets_survive_rollback(
+    author_client,
+    author,
+    moodboard,
+    item,
+    monkeypatch
+):
+    await ItemMoodboard.create(item=item, moodboard=moodboard)
+    response = await author_client.get('/item/facets')
+    assert response.json()['anime'] == 1
+
+    async def fail(*args):
+        raise RuntimeError
+
+    monkeypatch.setattr(item_services, 'copy_items', fail)
+    with pytest.raises(RuntimeError):
+        await item_services.apply_item_operations(author, [
+            ItemOperation(
+                action='remove',
+                item_ids=[item.id],
+                source=moodboard.id,
+                delete_item=True
+            ),
+            ItemOperation(
+                action='copy',
+                item_ids=[item.id],
+                target=moodboard.id
+            ),
+        ])
+    assert await Item.exists(id=item.id)
+    response = await author_client.get('/item/facets')
+    assert response.json()['anime'] == 1
+
+
+async def test_bulk_insert_returning(author, item):
+    async with in_transaction() as connection:
+        items = await bulk_insert_returning([
+            Item(name=f'item {index}', item_type='anime', author=author)
+            for index in range(3)
+        ], connection)
+    assert len({entry.pk for entry in items} | {item.id}) == 4
+    for entry in items:
+        assert (await Item.get(id=entry.pk)).name == entry.name
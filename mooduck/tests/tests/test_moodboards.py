@@ -1,6 +1,15 @@
+from datetime import timedelta
 from pprint import pprint
 
 import pytest
+from tortoise import timezone
+from tortoise.expressions import F
+
+from config import TRENDING_HALF_LIFE
+from moodboards.models import FavMoodboard, MoodboardScore, TrendingState
+from moodboards import services as moodboard_services, trending
+from moodboards.trending import refresh_trending_scores
+from reactions.models import Comment, Like
 
 
 pytestmark = pytest.mark.asyncio
@@ -54,6 +63,16 @@ async def test_retrieve_moodboard(moodboard_item_comment, user_client):
     assert bool(response.json().get('comments')) is True
 
 
+async def test_retrieve_moodboard_flags(user_fav_moodboard, user_client):
+    user, moodboard = user_fav_moodboard
+    response = await user_client.get(f'/moodboard/{moodboard.id}')
+    assert response.json().get('is_liked') is False
+    assert response.json().get('is_in_favorite') is True
+    await Like.create(author=user, moodboard=moodboard)
+    response = await user_client.get(f'/moodboard/{moodboard.id}')
+    assert response.json().get('is_liked') is True
+
+
 async def test_retrieve_private_moodboard(user_client, private_moodboard):
     response = await user_client.get(f'/moodboard/{private_moodboard.id}')
     assert response.status_code == 401
@@ -195,6 +214,168 @@ async def test_list_moodboard_by_likes(user_client, moodboards):
     assert response.json().get('items')[2].get('id') == fourth_mb.id
 
 
+async def test_trending_scores(
+    user,
+    author,
+    moodboards,
+    trending_without_margin
+):
+    first_mb, second_mb, third_mb, fourth_mb = moodboards
+    await Like.create(author=user, moodboard=first_mb)
+    await Like.create(author=author, moodboard=first_mb)
+    await Comment.create(author=user, moodboard=second_mb, text='text')
+    await FavMoodboard.create(user=user, moodboard=third_mb)
+    assert await refresh_trending_scores() == 3
+    scores = dict(
+        await MoodboardScore.all().values_list('moodboard_id', 'score')
+    )
+    assert scores == pytest.approx(
+        {first_mb.id: 2, second_mb.id: 2, third_mb.id: 3}, rel=0.01
+    )
+    assert await refresh_trending_scores() == 0
+    await Like.create(author=user, moodboard=third_mb)
+    assert await refresh_trending_scores() == 1
+    score = await MoodboardScore.get(moodboard=third_mb)
+    assert score.score == pytest.approx(4, rel=0.01)
+
+
+async def test_trending_scores_rescale(
+    user,
+    moodboards,
+    trending_without_margin
+):
+    first_mb, second_mb, *_ = moodboards
+    await Like.create(author=user, moodboard=first_mb)
+    await refresh_trending_scores()
+    await TrendingState.filter(id=1).update(
+        landmark=timezone.now() - timedelta(seconds=TRENDING_HALF_LIFE * 33)
+    )
+    await Like.create(author=user, moodboard=second_mb)
+    await refresh_trending_scores()
+    scores = dict(
+        await MoodboardScore.all().values_list('moodboard_id', 'score')
+    )
+    assert scores == pytest.approx({second_mb.id: 1}, rel=0.01)
+
+
+async def test_trending_scores_relike(
+    user_client,
+    moodboard,
+    trending_without_margin
+):
+    for _ in range(3):
+        await user_client.post(f'/moodboard/{moodboard.id}/like')
+        await refresh_trending_scores()
+        await user_client.delete(f'/moodboard/{moodboard.id}/like')
+        await refresh_trending_scores()
+    await user_client.post(f'/moodboard/{moodboard.id}/fav')
+    await user_client.delete(f'/moodboard/{moodboard.id}/fav')
+    await user_client.post(f'/moodboard/{moodboard.id}/like')
+    await refresh_trending_scores()
+    score = await MoodboardScore.get(moodboard=moodboard)
+    assert score.score == pytest.approx(1, rel=0.01)
+
+
+async def test_trending_scores_settle_margin(user, moodboard, monkeypatch):
+    await refresh_trending_scores()
+    # a transaction that started before the last refresh commits late
+    await Like.create(
+        author=user,
+        moodboard=moodboard,
+        created_at=timezone.now() - timedelta(seconds=1)
+    )
+    assert await refresh_trending_scores() == 0
+    monkeypatch.setattr(trending, 'TRENDING_SETTLE_MARGIN', 0)
+    assert await refresh_trending_scores() == 1
+
+
+async def test_list_moodboard_trending(
+    user_client,
+    user,
+    moodboards,
+    trending_without_margin
+):
+    first_mb, second_mb, third_mb, fourth_mb = moodboards
+    await Like.create(author=user, moodboard=first_mb)
+    await FavMoodboard.create(user=user, moodboard=third_mb)
+    await refresh_trending_scores()
+    response = await user_client.get('/moodboard?sort=trending&limit=1')
+    assert response.status_code == 200
+    assert [item.get('id') for item in response.json().get('items')] == [
+        third_mb.id
+    ]
+    cursor = response.json().get('next_cursor')
+    response = await user_client.get(
+        f'/moodboard?sort=trending&limit=1&cursor={cursor}'
+    )
+    assert response.status_code == 200
+    assert [item.get('id') for item in response.json().get('items')] == [
+        first_mb.id
+    ]
+    assert response.json().get('next_cursor') is None
+
+
+async def test_list_moodboard_trending_private(
+    user_client,
+    author,
+    moodboard,
+    private_moodboard,
+    trending_without_margin
+):
+    await Like.create(author=author, moodboard=moodboard)
+    await Like.create(author=author, moodboard=private_moodboard)
+    await refresh_trending_scores()
+    response = await user_client.get('/moodboard?sort=trending')
+    assert response.status_code == 200
+    assert [item.get('id') for item in response.json().get('items')] == [
+        moodboard.id
+    ]
+    response = await user_client.get(
+        '/moodboard', params={'sort': 'trending', 'search': 'private'}
+    )
+    assert response.status_code == 200
+    assert response.json().get('items') == []
+    response = await user_client.get(
+        '/moodboard', params={'sort': 'trending', 'search': 'moodboard'}
+    )
+    assert [item.get('id') for item in response.json().get('items')] == [
+        moodboard.id
+    ]
+
+
+async def test_list_moodboard_trending_headline(
+    user_client,
+    author,
+    moodboard,
+    trending_without_margin,
+    monkeypatch
+):
+    search_queryset = moodboard_services.search_queryset
+
+    def headline_queryset(queryset, search, headline=False, ranked=True):
+        queryset = search_queryset(queryset, search, ranked=ranked)
+        if headline:
+            queryset = queryset.annotate(search_headline=F('name'))
+        return queryset
+
+    monkeypatch.setattr(
+        moodboard_services, 'search_queryset', headline_queryset
+    )
+    await Like.create(author=author, moodboard=moodboard)
+    await refresh_trending_scores()
+    params = {'sort': 'trending', 'search': 'moodboard'}
+    response = await user_client.get('/moodboard', params=params)
+    assert response.json().get('items')[0].get('headline') is None
+    response = await user_client.get(
+        '/moodboard', params={**params, 'headline': True}
+    )
+    assert response.status_code == 200
+    assert [
+        (item.get('id'), item.get('headline'))
+        for item in response.json().get('items')
+    ] == [(moodboard.id, moodboard.name)]
+
+
 async def test_user_moodboards(user_client, author, moodboards):
     first_mb, second_mb, third_mb, fourth_mb = moodboards
     response = await user_client.get(f'/user/{author.id}/moodboard')
@@ -276,9 +457,52 @@ async def test_sub_moodboards(user_sub_author, user_client):
     assert len(response.json().get('items')) == 4
 
 
+async def test_sub_moodboards_flags(user_sub_author, user_client):
+    user, author, moodboards = user_sub_author
+    liked, favorite, *_ = moodboards
+    await Like.create(author=user, moodboard=liked)
+    await Like.create(author=author, moodboard=favorite)
+    await FavMoodboard.create(user=user, moodboard=favorite)
+    response = await user_client.get('/sub/moodboard')
+    assert response.status_code == 200
+    flags = {
+        entry.get('id'): (entry.get('is_liked'), entry.get('is_in_favorite'))
+        for entry in response.json().get('items')
+    }
+    assert flags.pop(liked.id) == (True, False)
+    assert flags.pop(favorite.id) == (False, True)
+    assert set(flags.values()) == {(False, False)}
+
+
 async def test_user_chaotic(user_with_chaotic, user_client):
     user, chaotic, item = user_with_chaotic
     response = await user_client.get('/chaotic')
     assert response.status_code == 200
     assert len(response.json().get('items')) == 1
     assert response.json().get('items')[0].get('id') == chaotic.id
+
+
+async def test_list_moodboard_by_likes_with_cursor(user_client, moodboards):
+    first_mb, second_mb, third_mb, fourth_mb = moodboards
+    response = await user_client.get('/moodboard?sort=likes&limit=1')
+    cursor = response.json().get('next_cursor')
+    response = await user_client.get(
+        f'/moodboard?sort=likes&limit=2&cursor={cursor}')
+    assert response.status_code == 200
+    assert [item.get('id') for item in response.json().get('items')] == [
+        third_mb.id,
+        fourth_mb.id
+    ]
+    assert response.json().get('next_cursor') is None
+
+
+async def test_list_moodboard_with_total(user_client, moodboards):
+    response = await user_client.get('/moodboard?limit=1&with_total=exact')
+    assert response.status_code == 200
+    assert response.json().get('total') == 3
+    assert response.json().get('amount') == 1
+
+
+async def test_list_moodboard_with_invalid_total(user_client, moodboards):
+    response = await user_client.get('/moodboard?with_total=all')
+    assert response.status_code == 422
@@ -1,6 +1,14 @@
 from pprint import pprint
 
+from datetime import timedelta
+import asyncio
+
 import pytest
+from tortoise import timezone
+
+from moodboards.models import Moodboard
+from reactions import services
+from reactions.models import Like
 
 
 pytestmark = pytest.mark.asyncio
@@ -129,3 +137,71 @@ async def test_like(user_client, moodboard):
     response = await user_client.get(f'/moodboard/{moodboard.id}')
     assert response.json().get('likes') == 0
     assert response.json().get('is_liked') is False
+
+
+async def test_concurrent_likes(moodboard, user, author):
+    await asyncio.gather(
+        services.like_moodboard(user, moodboard.id),
+        services.like_moodboard(author, moodboard.id),
+    )
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 2
+    await asyncio.gather(
+        services.dislike_moodboard(user, moodboard.id),
+        services.dislike_moodboard(author, moodboard.id),
+    )
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 0
+
+
+async def test_like_404(user_client, moodboard):
+    response = await user_client.post(f'/moodboard/{moodboard.id + 1}/like')
+    assert response.status_code == 404
+
+
+async def test_like_write_behind(user_client, moodboard, monkeypatch):
+    monkeypatch.setattr(services, 'LIKE_WRITE_BEHIND', True)
+    response = await user_client.post(f'/moodboard/{moodboard.id}/like')
+    assert response.status_code == 204
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 0
+    assert services.like_buffer.get(moodboard.id) == 1
+    assert await services.like_buffer.flush() == 1
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 1
+    assert services.like_buffer.get(moodboard.id) == 0
+
+
+async def test_reconcile_moodboard_likes(moodboard, user):
+    await Like.create(
+        author=user,
+        moodboard=moodboard,
+        created_at=timezone.now() - timedelta(hours=1)
+    )
+    await Moodboard.filter(id=moodboard.id).update(likes=5)
+    assert await services.reconcile_moodboard_likes() == 1
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 1
+    assert await services.reconcile_moodboard_likes() == 0
+
+
+async def test_reconcile_skips_recent_likes(moodboard, user):
+    await services.like_moodboard(user, moodboard.id)
+    assert await services.reconcile_moodboard_likes() == 0
+    assert await services.reconcile_moodboard_likes(timedelta()) == 0
+
+    await services.dislike_moodboard(user, moodboard.id)
+    await Moodboard.filter(id=moodboard.id).update(likes=3)
+    assert await services.reconcile_moodboard_likes() == 0
+    assert await services.reconcile_moodboard_likes(timedelta()) == 1
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 0
+
+
+async def test_reconcile_keeps_buffered_likes(moodboard, user, monkeypatch):
+    monkeypatch.setattr(services, 'LIKE_WRITE_BEHIND', True)
+    await services.like_moodboard(user, moodboard.id)
+    assert await services.reconcile_moodboard_likes() == 0
+    await services.like_buffer.flush()
+    await moodboard.refresh_from_db()
+    assert moodboard.likes == 1
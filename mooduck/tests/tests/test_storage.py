@@ -0,0 +1,508 @@
+from datetime import timedelta
+from pprint import pprint
+
+import pytest
+
+from config import (
+    MEDIA_MAX_PER_REQUEST,
+    MEDIA_DERIVATIVE_WIDTHS,
+    REQUEST_MAX_SIZE,
+)
+from storage.backends import StorageBackend
+from storage.models import Media
+from storage.services import collect_media_garbage
+from storage.utils import get_derivative_filenames
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_upload_media(user_client, image_bytes):
+    response = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    pprint(response.json())
+    assert response.status_code == 200
+    assert response.json().get('size') == len(image_bytes)
+    assert response.json().get('url').endswith('.jpeg')
+
+
+async def test_upload_same_media_twice(user_client, image_bytes):
+    first = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    second = await user_client.post(
+        '/media',
+        files={'file': ('copy.jpg', image_bytes, 'image/jpeg')}
+    )
+    assert first.json().get('id') == second.json().get('id')
+
+
+async def test_upload_media_415(user_client):
+    response = await user_client.post(
+        '/media',
+        files={'file': ('text.txt', b'not an image', 'text/plain')}
+    )
+    assert response.status_code == 415
+
+
+async def test_upload_media_401(client, image_bytes):
+    response = await client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    assert response.status_code == 401
+
+
+async def test_create_item_with_media_id(author_client, moodboard, media):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [{
+            'name': 'item',
+            'item_type': 'anime',
+            'media_ids': [media.id]
+        }]}
+    )
+    pprint(response.json())
+    assert response.status_code == 200
+    assert response.json()[0].get('media') == [
+        f'http://127.0.0.1:8000/media/{media.filename}'
+    ]
+
+
+async def test_create_item_with_unknown_media_id(
+    author_client,
+    moodboard,
+    media
+):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [{
+            'name': 'item',
+            'item_type': 'anime',
+            'media_ids': [media.id + 1]
+        }]}
+    )
+    assert response.status_code == 404
+
+
+async def test_create_moodboard_with_cover_id(user_client, media):
+    response = await user_client.post(
+        '/moodboard',
+        json={'name': 'moodboard', 'cover_id': media.id}
+    )
+    assert response.status_code == 200
+    assert response.json().get('cover').endswith(media.filename)
+
+
+async def test_patch_moodboard_cover_id(author_client, moodboard, media):
+    response = await author_client.patch(
+        f'/moodboard/{moodboard.id}',
+        json={'cover_id': media.id}
+    )
+    assert response.status_code == 200
+    assert response.json().get('cover').endswith(media.filename)
+
+
+async def test_media_base_url_change(
+    author_client,
+    moodboard,
+    media,
+    monkeypatch
+):
+    await author_client.patch(
+        f'/moodboard/{moodboard.id}',
+        json={'cover_id': media.id}
+    )
+    monkeypatch.setattr(
+        'extra.utils.MEDIA_BASE_URL', 'https://cdn.example.com'
+    )
+    response = await author_client.get(f'/moodboard/{moodboard.id}')
+    assert response.json().get('cover') == (
+        f'https://cdn.example.com/{media.filename}'
+    )
+    response = await author_client.get('/user/me/moodboard')
+    assert response.json().get('items')[0].get('cover') == (
+        f'https://cdn.example.com/{media.filename}'
+    )
+
+
+async def test_patch_item_media_ids(author_client, item, media):
+    response = await author_client.patch(
+        f'/item/{item.id}',
+        json={'media_ids': [media.id, media.id]}
+    )
+    assert response.status_code == 200
+    assert len(response.json().get('media')) == 2
+
+
+async def test_media_reference_counts(
+    author_client,
+    moodboard,
+    item_creation_data
+):
+    for _ in range(2):
+        response = await author_client.post(
+            f'/moodboard/{moodboard.id}/item',
+            json={'items': [item_creation_data]}
+        )
+        assert response.status_code == 200
+    media = await Media.get()
+    assert media.ref_count == 2
+    assert await Media.all().count() == 1
+
+    await author_client.patch(
+        f'/item/{response.json()[0].get("id")}',
+        json={'name': 'patched', 'media': []}
+    )
+    await media.refresh_from_db()
+    assert media.ref_count == 1
+
+
+async def test_replace_media_releases_reference(
+    author_client,
+    moodboard,
+    item,
+    media
+):
+    response = await author_client.patch(
+        f'/moodboard/{moodboard.id}',
+        json={'cover_id': media.id}
+    )
+    assert response.status_code == 200
+    await media.refresh_from_db()
+    assert media.ref_count == 1
+
+    response = await author_client.delete(f'/moodboard/{moodboard.id}')
+    assert response.status_code == 204
+    await media.refresh_from_db()
+    assert media.ref_count == 0
+
+
+async def test_collect_media_garbage(
+    user_client,
+    image_bytes,
+    media,
+    media_root
+):
+    response = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    uploaded = await Media.get(id=response.json().get('id'))
+    await Media.filter(id=media.id).update(ref_count=1)
+    assert (media_root / uploaded.filename).exists()
+
+    assert await collect_media_garbage() == 0
+    assert await collect_media_garbage(grace=timedelta(0)) == 1
+    assert not (media_root / uploaded.filename).exists()
+    for filename in get_derivative_filenames(uploaded.hash):
+        assert not (media_root / filename).exists()
+    assert await Media.filter(id=media.id).exists()
+
+
+async def test_collect_media_garbage_skips_referenced(
+    author_client,
+    moodboard,
+    item,
+    media
+):
+    await author_client.patch(
+        f'/item/{item.id}',
+        json={'media_ids': [media.id]}
+    )
+    await author_client.patch(
+        f'/moodboard/{moodboard.id}',
+        json={'cover_id': media.id}
+    )
+    await Media.filter(id=media.id).update(ref_count=0)
+    assert await collect_media_garbage(grace=timedelta(0)) == 0
+    assert await Media.filter(id=media.id).exists()
+    await author_client.patch(f'/item/{item.id}', json={'media_ids': []})
+    assert await collect_media_garbage(grace=timedelta(0)) == 0
+
+
+async def test_bulk_items_media(author_client, moodboard, base64):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [
+            {'name': 'first', 'item_type': 'anime', 'media': [base64]},
+            {'name': 'second', 'item_type': 'anime'},
+            {'name': 'third', 'item_type': 'anime', 'media': [base64] * 2},
+        ]}
+    )
+    assert response.status_code == 200
+    assert [len(item.get('media')) for item in response.json()] == [1, 0, 2]
+    assert (await Media.get()).ref_count == 3
+
+
+async def test_too_many_media(author_client, moodboard, base64):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [{
+            'name': 'first',
+            'item_type': 'anime',
+            'media': [base64] * (MEDIA_MAX_PER_REQUEST + 1)
+        }]}
+    )
+    assert response.status_code == 400
+
+
+async def test_media_derivatives(
+    author_client,
+    moodboard,
+    wide_base64,
+    media_root
+):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [
+            {'name': 'first', 'item_type': 'anime', 'media': [wide_base64]},
+        ]}
+    )
+    pprint(response.json())
+    assert response.status_code == 200
+    media_srcset = response.json()[0].get('media_srcset')
+    assert len(media_srcset) == 1
+    assert media_srcset[0].get('original') == response.json()[0].get(
+        'media'
+    )[0]
+    assert [
+        source.get('width') for source in media_srcset[0].get('sources')
+    ] == [width for width in MEDIA_DERIVATIVE_WIDTHS if width <= 700]
+    response = await author_client.get(f'/moodboard/{moodboard.id}/item')
+    assert response.json().get('items')[0].get('media_srcset') == (
+        media_srcset
+    )
+
+    media = await Media.get()
+    for filename in get_derivative_filenames(media.hash):
+        assert (media_root / filename).read_bytes()[8:12] == b'WEBP'
+
+
+async def test_moodboard_cover_srcset(user_client, wide_base64):
+    response = await user_client.post(
+        '/moodboard',
+        json={'name': 'moodboard', 'cover': wide_base64}
+    )
+    assert response.status_code == 200
+    cover_srcset = response.json().get('cover_srcset')
+    assert cover_srcset.get('original') == response.json().get('cover')
+    assert cover_srcset.get('srcset').endswith('_w640.webp 640w')
+
+    response = await user_client.get('/user/me/moodboard')
+    assert response.json().get('items')[0].get('cover_srcset') == (
+        cover_srcset
+    )
+
+
+async def test_small_media_srcset(author_client, moodboard, base64):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [
+            {'name': 'first', 'item_type': 'anime', 'media': [base64]},
+        ]}
+    )
+    assert len(response.json()[0].get('media')) == 1
+    assert response.json()[0].get('media_srcset') == []
+    response = await author_client.patch(
+        f'/moodboard/{moodboard.id}',
+        json={'cover': base64}
+    )
+    assert response.json().get('cover')
+    assert response.json().get('cover_srcset') is None
+
+
+async def test_serve_media(user_client, image_bytes):
+    response = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    media = await Media.get(id=response.json().get('id'))
+    response = await user_client.get(f'/media/{media.filename}')
+    assert response.status_code == 200
+    assert response.content == image_bytes
+    assert response.headers.get('etag') == f'"{media.hash}"'
+    assert response.headers.get('content-type') == 'image/jpeg'
+    assert 'immutable' in response.headers.get('cache-control')
+
+    response = await user_client.get(
+        f'/media/{media.filename}',
+        headers={'If-None-Match': f'"{media.hash}"'}
+    )
+    assert response.status_code == 304
+    assert not response.content
+
+
+async def test_serve_media_range(user_client, image_bytes):
+    response = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    url = f'/media/{(await Media.get()).filename}'
+    response = await user_client.get(url, headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.content == image_bytes[:10]
+    assert response.headers.get('content-range') == (
+        f'bytes 0-9/{len(image_bytes)}'
+    )
+
+    response = await user_client.get(url, headers={'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.content == image_bytes[-5:]
+
+    response = await user_client.get(
+        url,
+        headers={'Range': f'bytes={len(image_bytes)}-'}
+    )
+    assert response.status_code == 416
+
+    response = await user_client.get(
+        url,
+        headers={'Range': 'bytes=0-9', 'If-Range': '"outdated"'}
+    )
+    assert response.status_code == 200
+    assert response.content == image_bytes
+
+
+async def test_serve_media_lazy_derivative(
+    user_client,
+    image_bytes,
+    media_root
+):
+    await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    filename = get_derivative_filenames((await Media.get()).hash)[0]
+    (media_root / filename).unlink()
+
+    response = await user_client.get(f'/media/{filename}')
+    assert response.status_code == 200
+    assert response.headers.get('content-type') == 'image/webp'
+    assert (media_root / filename).exists()
+
+
+async def test_serve_media_404(client, media):
+    for filename in (
+        f'{"b" * 64}.jpeg',
+        f'{media.hash}_w1.webp',
+        '..%2Fconfig.py',
+    ):
+        response = await client.get(f'/media/{filename}')
+        assert response.status_code == 404
+
+
+async def test_incomplete_storage_backend():
+    class ReadOnlyStorage(StorageBackend):
+        async def exists(self, name: str) -> bool:
+            return False
+
+        async def read(self, name: str) -> bytes:
+            return b''
+
+    with pytest.raises(TypeError):
+        ReadOnlyStorage()
+
+
+async def test_s3_storage(s3_storage, s3_server, image_bytes):
+    await s3_storage.save('image.jpeg', image_bytes)
+    assert await s3_storage.exists('image.jpeg')
+    assert await s3_storage.read('image.jpeg') == image_bytes
+
+    await s3_storage.delete('image.jpeg')
+    assert not await s3_storage.exists('image.jpeg')
+    assert not s3_server.objects
+
+
+async def test_s3_storage_multipart(s3_storage, s3_server, tmp_path):
+    data = bytes(range(256)) * 15
+    path = tmp_path / 'upload'
+    path.write_bytes(data)
+
+    await s3_storage.save('large.png', path)
+    assert s3_server.objects['large.png'] == data
+
+
+async def test_upload_media_to_s3(
+    user_client,
+    s3_storage,
+    s3_server,
+    image_bytes,
+    monkeypatch
+):
+    monkeypatch.setattr('storage.services.media_storage', s3_storage)
+    response = await user_client.post(
+        '/media',
+        files={'file': ('image.jpg', image_bytes, 'image/jpeg')}
+    )
+    assert response.status_code == 200
+    media = await Media.get()
+    assert s3_server.objects[media.filename] == image_bytes
+    for filename in get_derivative_filenames(media.hash):
+        assert s3_server.objects[filename][8:12] == b'WEBP'
+
+    response = await user_client.get(f'/media/{media.filename}')
+    assert response.status_code == 307
+
+
+@pytest.mark.parametrize('cover', [
+    'not a data uri',
+    'data:image/svg+xml;base64,PHN2Zz48L3N2Zz4=',
+    'data:image/png;base64,/9j/4gxYSUNDX1BST0ZJTEUAAQEAAAxI',
+    'data:image/jpeg;base64,!!!!',
+])
+async def test_invalid_base64_image(user_client, cover):
+    response = await user_client.post(
+        '/moodboard',
+        json={'name': 'moodboard', 'cover': cover}
+    )
+    assert response.status_code == 422
+
+
+async def test_patch_item_invalid_media(author_client, item):
+    response = await author_client.patch(
+        f'/item/{item.id}',
+        json={'media': ['not a data uri']}
+    )
+    assert response.status_code == 422
+
+
+async def test_request_too_large(client):
+    response = await client.post(
+        '/user',
+        json={'username': 'user', 'bio': 'a' * REQUEST_MAX_SIZE}
+    )
+    assert response.status_code == 413
+
+
+async def test_streamed_request_too_large(client):
+    async def body():
+        for _ in range(REQUEST_MAX_SIZE // 1024 + 1):
+            yield b' ' * 1024
+
+    response = await client.post(
+        '/user',
+        content=body(),
+        headers={'Content-Type': 'application/json'}
+    )
+    assert response.status_code == 413
+
+
+async def test_media_route_accepts_large_request(
+    author_client,
+    moodboard,
+    base64
+):
+    response = await author_client.post(
+        f'/moodboard/{moodboard.id}/item',
+        json={'items': [{
+            'name': 'item',
+            'item_type': 'anime',
+            'description': 'a' * REQUEST_MAX_SIZE,
+            'media': [base64]
+        }]}
+    )
+    assert response.status_code == 200
@@ -1,5 +1,15 @@
+import asyncio
+
 import pytest
 
+from extra import search
+from extra.cache import principal_cache
+from extra.dependencies import is_authenticated
+from extra.passwords import PasswordHasher, password_hasher
+from users.models import User
+from users.services import get_all_users
+from users.utils import UserRecord
+
 
 @pytest.mark.asyncio
 async def test_user_creation(client, user_data):
@@ -48,3 +58,131 @@ async def test_auth(user, client):
         }
     )
     assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_users_me_after_update(user_client, user):
+    response = await user_client.get('/user/me')
+    assert response.json().get('bio') == 'test bio'
+    user.bio = 'updated bio'
+    await user.save()
+    response = await user_client.get('/user/me')
+    assert response.status_code == 200
+    assert response.json().get('bio') == 'updated bio'
+
+
+@pytest.mark.asyncio
+async def test_users_me_after_delete(user_client, user):
+    response = await user_client.get('/user/me')
+    assert response.status_code == 200
+    await user.delete()
+    response = await user_client.get('/user/me')
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_auth_wrong_password(user, client):
+    response = await client.post(
+        url='/auth',
+        data={
+            'username': user.username,
+            'password': 'wrong_password'
+        }
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_auth_overloaded(user, client, blocked_hasher):
+    hasher, release = blocked_hasher
+    data = {'username': user.username, 'password': 'test_password'}
+    requests = [
+        asyncio.create_task(client.post(url='/auth', data=data))
+        for _ in range(2)
+    ]
+    while hasher.pending < 1:
+        await asyncio.sleep(0.01)
+    response = await client.post(url='/auth', data=data)
+    assert response.status_code == 503
+    release.set()
+    assert [
+        response.status_code for response in await asyncio.gather(*requests)
+    ] == [200, 200]
+    assert hasher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_stats(user, client, blocked_hasher):
+    hasher, release = blocked_hasher
+    release.set()
+    data = {'username': user.username, 'password': 'test_password'}
+    await client.post(url='/auth', data=data)
+    hasher.max_pending = 0
+    response = await client.post(url='/auth', data=data)
+    assert response.status_code == 503
+    assert hasher.stats() == {
+        'workers': 1,
+        'pending': 0,
+        'running': 0,
+        'completed': 1,
+        'rejected': 1,
+        'max_pending_seen': 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_stats_endpoint(user_client, user):
+    response = await user_client.get('/auth/stats')
+    assert response.status_code == 401
+    await User.filter(id=user.id).update(role='admin')
+    principal_cache.clear()
+    response = await user_client.get('/auth/stats')
+    assert response.status_code == 200
+    assert response.json().get('workers') == password_hasher.workers
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_shutdown():
+    hasher = PasswordHasher(workers=1, rounds=4)
+    hashed = await hasher.hash('password')
+    hasher.shutdown()
+    assert hasher._executor is None
+    assert await hasher.check('password', hashed)
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_principal_without_password(user, auth_token):
+    fetched = await is_authenticated(auth_token)
+    cached = await is_authenticated(auth_token)
+    assert 'password' not in principal_cache.get(auth_token)._fields
+    for principal in (fetched, cached):
+        assert principal.username == user.username
+        assert not hasattr(principal, 'password')
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_user_search_fallback(user_client, author):
+    response = await user_client.get(
+        '/user',
+        params={'search': 'AUTH', 'fuzzy': True}
+    )
+    assert response.status_code == 200
+    assert [
+        user.get('username') for user in response.json().get('items')
+    ] == ['author']
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_user_search_query(monkeypatch):
+    monkeypatch.setattr(
+        search, 'is_full_text_search_supported', lambda queryset: True
+    )
+    queryset = get_all_users('jo_n', fuzzy=True)
+    record = search.get_search_record(queryset, UserRecord)
+    assert record._fields[-1] == 'search_rank'
+    sql = queryset.values_list(*record._fields).sql()
+    assert '"username" % \'jo_n\'' in sql
+    assert 'similarity("name",\'jo_n\'))>=0.3' in sql
+    assert 'WHEN "username" ILIKE \'jo\\_n\' OR' in sql
+    assert 'ORDER BY CASE WHEN' in sql
@@ -1,10 +1,13 @@
 import re
+from typing import NamedTuple
 
 from tortoise.models import Model
 from tortoise import fields
+from tortoise.signals import post_save, post_delete
 from tortoise.validators import RegexValidator
 
 from config import SLUG_PATTERN, EMAIL_PATTERN, ROLE_CHOICES_PATTERN
+from extra.cache import principal_cache
 
 
 class User(Model):
@@ -32,27 +35,13 @@ class User(Model):
     )
     bio = fields.TextField(null=True)
 
-    async def get_liked_moodboard_ids(self):
-        return await self.all(
-        ).select_related(
-            'like'
-        ).filter(
-            like__author=self
-        ).values_list('like__moodboard_id', flat=True)
-
     async def is_moodboard_liked(self, moodboard_id: int) -> bool:
-        return moodboard_id in await self.get_liked_moodboard_ids()
-
-    async def get_favorite_moodboard_ids(self):
-        return await self.all(
-        ).select_related(
-            'fav_moodboard'
-        ).filter(
-            fav_moodboard__user=self
-        ).values_list('fav_moodboard__moodboard_id', flat=True)
+        return await self.like.filter(moodboard_id=moodboard_id).exists()
 
     async def is_moodboard_in_fav(self, moodboard_id: int) -> bool:
-        return moodboard_id in await self.get_favorite_moodboard_ids()
+        return await self.fav_moodboard.filter(
+            moodboard_id=moodboard_id
+        ).exists()
 
     def __str__(self) -> str:
         return self.username
@@ -68,3 +57,37 @@ class Subscription(Model):
         'models.User',
         related_name='subscribed_for'
     )
+
+
+class Principal(NamedTuple):
+    id: int
+    username: str
+    email: str
+    name: str | None
+    role: str
+    bio: str | None
+
+    @classmethod
+    def from_user(cls, user: User) -> 'Principal':
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            name=user.name,
+            role=user.role,
+            bio=user.bio,
+        )
+
+    def to_user(self) -> User:
+        return User._init_from_db(**self._asdict())
+
+
+@post_save(User)
+@post_delete(User)
+async def invalidate_principal(sender, instance: User, *args, **kwargs):
+    principal_cache.invalidate(
+        lambda principal: (
+            principal.id == instance.id
+            or principal.username == instance.username
+        )
+    )
@@ -2,7 +2,6 @@ from typing import Annotated
 
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi import APIRouter, Depends
-import bcrypt
 
 from users.schemas import UserCreate, UserGet, PaginatedUser
 from users.models import User
@@ -13,24 +12,29 @@ from users.services import (
     get_all_users
 )
 from users.exceptions import WrongLoginOrPassword
+from extra.exceptions import UnAuthorized
+from users.utils import get_user_record_response, UserRecord
 from moodboards.models import Moodboard
 from extra.services import create_instance_by_kwargs, get_instance_or_404
-from extra.utils import get_password_hash, create_access_token
+from extra.utils import create_access_token
+from extra.passwords import password_hasher
 from extra.dependencies import is_authenticated, pagination
+from extra.routing import LimitedRoute
+from extra.search import get_search_record
 
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedRoute)
 oauth_scheme = OAuth2PasswordBearer('auth', auto_error=True)
 
 
 @router.post('/user')
 async def create_new_user(user_data: UserCreate) -> UserGet:
-    password = get_password_hash(user_data.password)
+    password = await password_hasher.hash(user_data.password)
     user: User = await create_instance_by_kwargs(
         User,
         username=user_data.username,
         email=user_data.email,
-        password=password.decode(),
+        password=password,
         name=user_data.name,
         bio=user_data.bio
     )
@@ -49,9 +53,16 @@ async def create_new_user(user_data: UserCreate) -> UserGet:
 async def list_user(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination),
-    search: str | None = None
+    search: str | None = None,
+    fuzzy: bool = False
 ) -> PaginatedUser:
-    return await paginator(get_all_users(search), UserGet)
+    queryset = get_all_users(search, fuzzy)
+    return await paginator(
+        queryset,
+        UserGet,
+        get_user_record_response,
+        get_search_record(queryset, UserRecord)
+    )
 
 
 @router.post('/auth')
@@ -59,7 +70,7 @@ async def auth_user(
     user_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> str:
     user: User = await get_instance_or_404(User, username=user_data.username)
-    if not bcrypt.checkpw(user_data.password.encode(), user.password.encode()):
+    if not await password_hasher.check(user_data.password, user.password):
         raise WrongLoginOrPassword
     token = create_access_token(
         data={'sub': user_data.username}
@@ -67,6 +78,15 @@ async def auth_user(
     return token
 
 
+@router.get('/auth/stats')
+async def get_password_hasher_stats(
+    user: Annotated[User, Depends(is_authenticated)]
+) -> dict[str, int]:
+    if user.role != 'admin':
+        raise UnAuthorized
+    return password_hasher.stats()
+
+
 @router.get('/user/me')
 async def get_current_user(
     user: Annotated[User, Depends(is_authenticated)]
@@ -102,4 +122,9 @@ async def list_subs(
     user: Annotated[User, Depends(is_authenticated)],
     paginator=Depends(pagination),
 ) -> PaginatedUser:
-    return await paginator(get_user_subs(user), UserGet)
+    return await paginator(
+        get_user_subs(user),
+        UserGet,
+        get_user_record_response,
+        UserRecord
+    )
@@ -2,6 +2,7 @@ from tortoise.expressions import Q
 from tortoise.queryset import QuerySet
 
 from users.models import User, Subscription
+from extra.search import fuzzy_search_queryset
 from extra.services import get_instance_or_404
 from extra.exceptions import AlreadyExists
 
@@ -34,9 +35,11 @@ async def delete_user_from_subs(user: User, sub_for_id: int) -> None:
     return
 
 
-def get_all_users(search: str) -> QuerySet[User]:
+def get_all_users(search: str, fuzzy: bool = False) -> QuerySet[User]:
     users = User.all()
-    if search:
+    if search and fuzzy:
+        users = fuzzy_search_queryset(users, search, ('username', 'name'))
+    elif search:
         users = users.filter(
             Q(username__icontains=search) | Q(name__icontains=search))
     return users
@@ -0,0 +1,34 @@
+from typing import NamedTuple
+
+from users.schemas import UserGet
+
+
+class UserRecord(NamedTuple):
+    id: int
+    username: str
+    email: str
+    name: str | None
+    role: str
+    bio: str | None
+
+
+def get_user_record_response(record: UserRecord) -> UserGet:
+    return UserGet.model_construct(
+        id=record.id,
+        username=record.username,
+        email=record.email,
+        name=record.name,
+        role=record.role,
+        bio=record.bio,
+    )
+
+
+def get_author_record_response(record: NamedTuple) -> UserGet:
+    return UserGet.model_construct(
+        id=record.author__id,
+        username=record.author__username,
+        email=record.author__email,
+        name=record.author__name,
+        role=record.author__role,
+        bio=record.author__bio,
+    )